@@ -1,20 +1,38 @@
-from fastapi import FastAPI, APIRouter, HTTPException, Depends, status, UploadFile, File, Form, WebSocket, WebSocketDisconnect, Query
+from fastapi import FastAPI, APIRouter, HTTPException, Depends, status, UploadFile, File, Form, WebSocket, WebSocketDisconnect, Query, Response, Request
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from fastapi.responses import StreamingResponse
+from fastapi.encoders import jsonable_encoder
 from dotenv import load_dotenv
 from starlette.middleware.cors import CORSMiddleware
 from motor.motor_asyncio import AsyncIOMotorClient, AsyncIOMotorGridFSBucket
+from pymongo import IndexModel, ASCENDING, DESCENDING, ReturnDocument, InsertOne, UpdateOne, UpdateMany, ReplaceOne, DeleteOne
+from pymongo.errors import OperationFailure, DuplicateKeyError, BulkWriteError
+from bson import ObjectId
+from bson.errors import InvalidId
+from gridfs.errors import NoFile
 import os
 import logging
 from pathlib import Path
-from pydantic import BaseModel, Field, EmailStr, ConfigDict
-from typing import List, Optional, Dict
+from pydantic import BaseModel, Field, EmailStr, ConfigDict, ValidationError, TypeAdapter
+from typing import List, Optional, Dict, Callable, Set, Awaitable, Tuple
 import uuid
+import asyncio
+from collections import defaultdict
 from datetime import datetime, timezone, timedelta
+from email.utils import format_datetime, parsedate_to_datetime
+import hashlib
+import time
+from collections import OrderedDict
 import bcrypt
 import jwt
 import base64
+import json
 from io import BytesIO
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+import multiprocessing
+import re
+import unicodedata
+import tempfile
 from PIL import Image
 
 ROOT_DIR = Path(__file__).parent
@@ -35,29 +53,287 @@ JWT_EXPIRATION = timedelta(days=30)
 
 security = HTTPBearer()
 
-# WebSocket connection manager
-class ConnectionManager:
+# bcrypt cost factor; existing hashes with a different cost are upgraded on login
+BCRYPT_ROUNDS = int(os.environ.get('BCRYPT_ROUNDS', 12))
+
+# bcrypt releases the GIL, so hashing in threads uses every core without
+# blocking the event loop
+auth_executor = ThreadPoolExecutor(
+    max_workers=int(os.environ.get('AUTH_WORKERS', os.cpu_count() or 1)),
+    thread_name_prefix="bcrypt"
+)
+
+# WebSocket fan-out. Every worker subscribes to the same pub/sub channel
+# and delivers events to the sockets it holds, so a message published by
+# any worker reaches the recipient wherever they are connected.
+WS_PUBSUB_BACKEND = os.environ.get('WS_PUBSUB_BACKEND', 'memory')
+WS_EVENTS_TTL_SECONDS = 60
+
+EventHandler = Callable[[dict], Awaitable[None]]
+
+class InMemoryPubSub:
+    """Delivers events within this process only; for single-worker deployments"""
     def __init__(self):
-        self.active_connections: Dict[str, WebSocket] = {}
+        self._handler: Optional[EventHandler] = None
+
+    async def start(self, handler: EventHandler):
+        self._handler = handler
+
+    async def stop(self):
+        self._handler = None
+
+    async def publish(self, event: dict):
+        if self._handler:
+            await self._handler(event)
+
+class MongoPubSub:
+    """Delivers events to every worker through a change stream on `ws_events`.
+
+    Change streams need a replica set (Atlas, or a single-node replica set
+    locally). Event documents expire through a TTL index.
+    """
+    def __init__(self, collection):
+        self.collection = collection
+        self._task: Optional[asyncio.Task] = None
+
+    async def start(self, handler: EventHandler):
+        self._task = asyncio.create_task(self._listen(handler))
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            self._task = None
 
-    async def connect(self, user_id: str, websocket: WebSocket):
+    async def publish(self, event: dict):
+        await self.collection.insert_one({"event": event, "created_at": datetime.now(timezone.utc)})
+
+    async def _listen(self, handler: EventHandler):
+        resume_token = None
+        while True:
+            try:
+                async with self.collection.watch(
+                    [{"$match": {"operationType": "insert"}}],
+                    resume_after=resume_token
+                ) as stream:
+                    async for change in stream:
+                        resume_token = stream.resume_token
+                        try:
+                            await handler(change["fullDocument"]["event"])
+                        except Exception:
+                            logger.exception("WebSocket event handler failed")
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("WebSocket change stream interrupted, reconnecting")
+                await asyncio.sleep(1)
+
+def create_pubsub():
+    if WS_PUBSUB_BACKEND == 'mongo':
+        return MongoPubSub(db.ws_events)
+    if WS_PUBSUB_BACKEND != 'memory':
+        raise ValueError(f"Unknown WS_PUBSUB_BACKEND: {WS_PUBSUB_BACKEND}")
+    return InMemoryPubSub()
+
+# Outbound frames buffered per socket before it counts as a slow consumer
+WS_QUEUE_SIZE = int(os.environ.get('WS_QUEUE_SIZE', 256))
+# Server pings after this many idle seconds, and drops sockets silent for WS_IDLE_TIMEOUT
+WS_HEARTBEAT_INTERVAL = float(os.environ.get('WS_HEARTBEAT_INTERVAL', 25))
+WS_IDLE_TIMEOUT = float(os.environ.get('WS_IDLE_TIMEOUT', 75))
+# Most messages a resuming client is sent; larger gaps need a full resync.
+# Kept to half the outbound queue so a replay never fills it.
+WS_REPLAY_LIMIT = min(int(os.environ.get('WS_REPLAY_LIMIT', 128)), WS_QUEUE_SIZE // 2)
+
+class Connection:
+    """One client socket with a bounded outbound queue drained by its own writer task"""
+    def __init__(self, user_id: str, websocket: WebSocket, on_close: Callable[["Connection"], None]):
+        self.user_id = user_id
+        self.websocket = websocket
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=WS_QUEUE_SIZE)
+        self.closing = False
+        self._on_close = on_close
+        self._writer = asyncio.create_task(self._write())
+
+    def offer(self, text: str) -> bool:
+        """Queue a frame without waiting; False if the client is not keeping up"""
+        try:
+            self.queue.put_nowait(text)
+            return True
+        except asyncio.QueueFull:
+            return False
+
+    async def _write(self):
+        try:
+            while True:
+                text = await self.queue.get()
+                await self.websocket.send_text(text)
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            self._on_close(self)
+
+    async def close(self, code: int = 1000):
+        self.closing = True
+        self._writer.cancel()
+        try:
+            await self.websocket.close(code=code)
+        except Exception:
+            pass
+
+class ConnectionManager:
+    def __init__(self, pubsub):
+        # A user can hold several sockets at once (phone and laptop)
+        self.active_connections: Dict[str, Set[Connection]] = defaultdict(set)
+        self.pubsub = pubsub
+        self.dropped_messages = 0
+        self.evicted_connections = 0
+        # Close tasks for evicted sockets, kept so they aren't collected mid-flight
+        self.closing: Set[asyncio.Task] = set()
+        # Other cross-worker events (cache invalidations) by type
+        self.event_handlers: Dict[str, Callable[[dict], None]] = {}
+
+    def on(self, event_type: str, handler: Callable[[dict], None]):
+        self.event_handlers[event_type] = handler
+
+    async def publish(self, event: dict):
+        """Send a non-delivery event to every worker, this one included"""
+        try:
+            await self.pubsub.publish(event)
+        except Exception:
+            logger.exception("Failed to publish %s event", event.get("type"))
+
+    async def start(self):
+        await self.pubsub.start(self.handle_event)
+
+    async def stop(self):
+        await self.pubsub.stop()
+
+    async def connect(self, user_id: str, websocket: WebSocket) -> Connection:
         await websocket.accept()
-        self.active_connections[user_id] = websocket
+        connection = Connection(user_id, websocket, self.disconnect)
+        self.active_connections[user_id].add(connection)
+        return connection
 
-    def disconnect(self, user_id: str):
-        if user_id in self.active_connections:
-            del self.active_connections[user_id]
+    def disconnect(self, connection: Connection):
+        sockets = self.active_connections.get(connection.user_id)
+        if sockets is not None:
+            sockets.discard(connection)
+            if not sockets:
+                del self.active_connections[connection.user_id]
 
     async def send_personal_message(self, message: dict, user_id: str):
-        if user_id in self.active_connections:
-            await self.active_connections[user_id].send_json(message)
+        await self.broadcast(message, [user_id])
+
+    async def notify(self, event: dict, users: List[str]):
+        """Publish a transient event (typing, receipts) that is never replayed"""
+        await self.notify_many([(event, users)])
+
+    async def notify_many(self, deliveries: List[Tuple[dict, List[str]]]):
+        """Publish several frames, each with its recipients, as one event;
+        never fails the caller's request"""
+        event = {"type": "deliver", "deliveries": [
+            {"message": message, "users": list(dict.fromkeys(users))}
+            for message, users in deliveries if users
+        ]}
+        if not event["deliveries"]:
+            return
+        try:
+            await self.pubsub.publish(event)
+        except Exception:
+            logger.exception("Failed to publish WebSocket event")
 
     async def broadcast(self, message: dict, users: List[str]):
+        await self.broadcast_many([(message, users)])
+
+    async def broadcast_many(self, deliveries: List[Tuple[dict, List[str]]]):
+        """Publish stored messages to their recipients.
+
+        Nothing is written per recipient: a reconnecting client resumes
+        from the `seq` of the last message it saw, and `replay` reads what
+        it missed back out of `messages`.
+        """
+        await self.notify_many([
+            ({k: v for k, v in message.items() if k != "_id"}, users)
+            for message, users in deliveries
+        ])
+
+    async def handle_event(self, event: dict):
+        if event.get("type") == "deliver":
+            for delivery in event["deliveries"]:
+                self.deliver_local(delivery["message"], delivery["users"])
+        elif event.get("type") in self.event_handlers:
+            self.event_handlers[event["type"]](event)
+
+    def deliver_local(self, message: dict, users: List[str]):
+        """Queue a message on every local socket of the recipients.
+
+        The message is serialised once. Queuing never blocks, and each
+        socket's writer task sends concurrently with the others. A socket
+        whose queue is full is evicted so one slow client can't hold up
+        the rest.
+        """
+        text = json.dumps(message)
         for user_id in users:
-            if user_id in self.active_connections:
-                await self.active_connections[user_id].send_json(message)
+            for connection in list(self.active_connections.get(user_id, ())):
+                self.send(connection, text)
+
+    def send(self, connection: Connection, text: str):
+        if connection.closing:
+            return
+        if not connection.offer(text):
+            self.dropped_messages += 1
+            self.evict(connection)
 
-manager = ConnectionManager()
+    async def replay(self, connection: Connection, last_seq: int):
+        """Resend the messages numbered after `last_seq`, or ask for a resync
+        if there are more than fit in the socket's queue.
+
+        Direct and group messages are read through their own `receiver_seq`
+        and `group_seq` indexes and merged.
+        """
+        queries = [{"receiver_id": connection.user_id}]
+        group_ids = [group["id"] for group in await group_index.for_user(connection.user_id)]
+        if group_ids:
+            queries.append({"receiver_id": "", "group_id": {"$in": group_ids}})
+        results = await asyncio.gather(*[
+            db.messages.find({**query, "seq": {"$gt": last_seq}}, {"_id": 0})
+            .sort("seq", ASCENDING).limit(WS_REPLAY_LIMIT + 1).to_list(WS_REPLAY_LIMIT + 1)
+            for query in queries
+        ])
+        missed = sorted((message for messages in results for message in messages), key=lambda message: message["seq"])
+        room = connection.queue.maxsize - connection.queue.qsize() - 1
+        if len(missed) > min(WS_REPLAY_LIMIT, room):
+            self.send(connection, json.dumps({"type": "resync", "seq": await read_version(MESSAGE_SEQ)}))
+            return
+        for message in missed:
+            self.send(connection, json.dumps(message))
+        self.send(connection, json.dumps({"type": "resumed", "seq": missed[-1]["seq"] if missed else last_seq}))
+
+    def evict(self, connection: Connection):
+        if connection.closing:
+            return
+        connection.closing = True
+        self.evicted_connections += 1
+        self.disconnect(connection)
+        # 1013: try again later; the client reconnects and resumes
+        task = asyncio.create_task(connection.close(code=1013))
+        self.closing.add(task)
+        task.add_done_callback(self.closing.discard)
+
+    def metrics(self) -> dict:
+        depths = [connection.queue.qsize()
+                  for connections in self.active_connections.values()
+                  for connection in connections]
+        return {
+            "connected_users": len(self.active_connections),
+            "connections": len(depths),
+            "queued_frames": sum(depths),
+            "max_queue_depth": max(depths, default=0),
+            "queue_capacity": WS_QUEUE_SIZE,
+            "dropped_messages": self.dropped_messages,
+            "evicted_connections": self.evicted_connections
+        }
+
+manager = ConnectionManager(create_pubsub())
 
 # Create the main app
 app = FastAPI()
@@ -132,14 +408,26 @@ class PhotoUpdate(BaseModel):
     caption: Optional[str] = None
     tags: Optional[List[str]] = None
 
+class CommentPreview(BaseModel):
+    id: str
+    user_id: str
+    user_name: str = ""
+    comment: str
+    created_at: str
+
 class Photo(BaseModel):
     id: str
     user_id: str
     url: str
+    file_id: Optional[str] = None
+    thumb_url: Optional[str] = None
     caption: Optional[str] = None
     album_id: Optional[str] = None
     tags: List[str] = []
     likes: List[str] = []
+    like_count: int = 0
+    comment_count: int = 0
+    latest_comments: List[CommentPreview] = []
     created_at: str
 
 class CommentCreate(BaseModel):
@@ -176,6 +464,7 @@ class Message(BaseModel):
     message: str
     created_at: str
     read: bool = False
+    seq: Optional[int] = None
 
 class GroupCreate(BaseModel):
     name: str
@@ -202,6 +491,7 @@ class Event(BaseModel):
     date: str
     location: Optional[str] = None
     attendees: List[str] = []
+    attendee_count: int = 0
     created_at: str
 
 class PostCreate(BaseModel):
@@ -214,14 +504,149 @@ class Post(BaseModel):
     content: str
     media: List[str] = []
     likes: List[str] = []
+    like_count: int = 0
+    comment_count: int = 0
+    latest_comments: List[CommentPreview] = []
     created_at: str
 
+# Bodies for the content sections (see CONTENT TYPES). Defaults match what
+# the old dict-based handlers filled in for missing keys.
+class ContentCreate(BaseModel):
+    model_config = ConfigDict(coerce_numbers_to_str=True)
+
+class CookingTipCreate(ContentCreate):
+    title: Optional[str] = None
+    category: str = "general"
+    ingredients: str = ""
+    instructions: Optional[str] = None
+    cooking_time: str = ""
+
+class KolamTipCreate(ContentCreate):
+    title: Optional[str] = None
+    difficulty: str = "easy"
+    description: Optional[str] = None
+    dots_pattern: str = ""
+    image_url: str = ""
+
+class UtsavamCreate(ContentCreate):
+    name: Optional[str] = None
+    date: Optional[str] = None
+    place: Optional[str] = None
+    time: str = ""
+    links: List[str] = []
+    description: str = ""
+
+class BookReviewCreate(ContentCreate):
+    book_title: Optional[str] = None
+    author: Optional[str] = None
+    rating: int = 5
+    review: Optional[str] = None
+    genre: str = ""
+
+class HobbyCreate(ContentCreate):
+    title: Optional[str] = None
+    category: str = "general"
+    description: Optional[str] = None
+    skill_level: str = "beginner"
+
+class GamingPostCreate(ContentCreate):
+    game_name: Optional[str] = None
+    content: Optional[str] = None
+    score: str = ""
+    game_type: str = "online"
+
+class TournamentCreate(ContentCreate):
+    name: Optional[str] = None
+    game: Optional[str] = None
+    start_date: Optional[str] = None
+    participants: List[str] = []
+    winner: str = ""
+    status: str = "upcoming"
+
+class TournamentUpdate(ContentCreate):
+    name: Optional[str] = None
+    game: Optional[str] = None
+    start_date: Optional[str] = None
+    participants: Optional[List[str]] = None
+    winner: Optional[str] = None
+    status: Optional[str] = None
+
+class AchievementCreate(ContentCreate):
+    title: Optional[str] = None
+    description: Optional[str] = None
+    category: str = "personal"
+    date: Optional[str] = None
+
 # Helper functions
-def hash_password(password: str) -> str:
-    return bcrypt.hashpw(password.encode(), bcrypt.gensalt()).decode()
+def _hash_password(password: str) -> str:
+    return bcrypt.hashpw(password.encode(), bcrypt.gensalt(BCRYPT_ROUNDS)).decode()
 
-def verify_password(password: str, hashed: str) -> bool:
-    return bcrypt.checkpw(password.encode(), hashed.encode())
+def _verify_password(password: str, hashed: str) -> bool:
+    try:
+        return bcrypt.checkpw(password.encode(), hashed.encode())
+    except ValueError:
+        return False
+
+async def hash_password(password: str) -> str:
+    return await asyncio.get_running_loop().run_in_executor(auth_executor, _hash_password, password)
+
+async def verify_password(password: str, hashed: str) -> bool:
+    # Placeholder relatives are stored without a password and can't log in
+    if not hashed:
+        return False
+    return await asyncio.get_running_loop().run_in_executor(auth_executor, _verify_password, password, hashed)
+
+def needs_rehash(hashed: str) -> bool:
+    """Whether a stored hash was made with a cost other than BCRYPT_ROUNDS"""
+    try:
+        return int(hashed.split("$")[2]) != BCRYPT_ROUNDS
+    except (IndexError, ValueError):
+        return True
+
+class TTLCache:
+    """Bounded LRU mapping whose entries expire after a time-to-live"""
+    def __init__(self, maxsize: int, ttl: float):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data: OrderedDict = OrderedDict()
+
+    def get(self, key, default=None):
+        entry = self._data.get(key)
+        if entry is None:
+            return default
+        value, expires_at = entry
+        if expires_at <= time.monotonic():
+            del self._data[key]
+            return default
+        self._data.move_to_end(key)
+        return value
+
+    def set(self, key, value, ttl: Optional[float] = None):
+        ttl = self.ttl if ttl is None else min(ttl, self.ttl)
+        self._data[key] = (value, time.monotonic() + ttl)
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    def pop(self, key):
+        self._data.pop(key, None)
+
+    def clear(self):
+        self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+# Verified tokens -> user id, so repeat requests skip JWT decoding
+token_cache = TTLCache(
+    maxsize=int(os.environ.get('TOKEN_CACHE_SIZE', 10000)),
+    ttl=float(os.environ.get('TOKEN_CACHE_TTL', 300))
+)
+# User id -> public profile fields used to denormalise author names
+user_cache = TTLCache(
+    maxsize=int(os.environ.get('USER_CACHE_SIZE', 10000)),
+    ttl=float(os.environ.get('USER_CACHE_TTL', 60))
+)
 
 def create_token(user_id: str) -> str:
     payload = {
@@ -231,15 +656,820 @@ def create_token(user_id: str) -> str:
     return jwt.encode(payload, JWT_SECRET, algorithm=JWT_ALGORITHM)
 
 def verify_token(token: str) -> str:
+    user_id = token_cache.get(token)
+    if user_id:
+        return user_id
     try:
         payload = jwt.decode(token, JWT_SECRET, algorithms=[JWT_ALGORITHM])
-        return payload['user_id']
+        user_id = payload['user_id']
     except Exception:
         raise HTTPException(status_code=401, detail="Invalid token")
+    # Never cache a token past its own expiry
+    if 'exp' in payload:
+        token_cache.set(token, user_id, ttl=payload['exp'] - time.time())
+    else:
+        token_cache.set(token, user_id)
+    return user_id
 
 async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(security)) -> str:
     return verify_token(credentials.credentials)
 
+async def get_user_profile(user_id: str) -> Optional[dict]:
+    """Public profile fields for a user, served from user_cache when possible"""
+    profile = user_cache.get(user_id)
+    if profile is None:
+        profile = await db.users.find_one({"id": user_id}, {"_id": 0, "id": 1, "name": 1, "avatar": 1})
+        if profile:
+            user_cache.set(user_id, profile)
+    return profile
+
+def invalidate_user(user_id: str):
+    user_cache.pop(user_id)
+
+class GroupIndex:
+    """In-memory copy of every chat group and who belongs to it.
+
+    Loaded on first use and reloaded every GROUP_CACHE_TTL seconds. Group
+    writes publish a "group" event so every worker updates its copy at
+    once; a group id missing from the cache is read through once in case
+    that event hasn't arrived yet.
+    """
+    def __init__(self, ttl: float):
+        self.ttl = ttl
+        self.groups: Dict[str, dict] = {}
+        self.by_user: Dict[str, Set[str]] = defaultdict(set)
+        self.loaded_at: Optional[float] = None
+        self._lock = asyncio.Lock()
+
+    async def load(self):
+        async with self._lock:
+            if self.loaded_at is not None and time.monotonic() - self.loaded_at < self.ttl:
+                return
+            groups = await db.groups.find({}, {"_id": 0}).to_list(None)
+            self.groups, self.by_user = {}, defaultdict(set)
+            for group in groups:
+                self.add(group)
+            self.loaded_at = time.monotonic()
+
+    def add(self, group: dict):
+        self.remove(group["id"])
+        self.groups[group["id"]] = group
+        for member in group["members"]:
+            self.by_user[member].add(group["id"])
+
+    def remove(self, group_id: str):
+        group = self.groups.pop(group_id, None)
+        for member in group["members"] if group else ():
+            self.by_user[member].discard(group_id)
+
+    def handle_event(self, event: dict):
+        if event.get("group"):
+            self.add(event["group"])
+        else:
+            self.remove(event["group_id"])
+
+    async def get(self, group_id: str) -> Optional[dict]:
+        await self.load()
+        group = self.groups.get(group_id)
+        if group is None:
+            group = await db.groups.find_one({"id": group_id}, {"_id": 0})
+            if group:
+                self.add(group)
+        return group
+
+    async def members(self, group_id: str) -> List[str]:
+        group = await self.get(group_id)
+        return group["members"] if group else []
+
+    async def is_member(self, group_id: str, user_id: str) -> bool:
+        return user_id in await self.members(group_id)
+
+    async def for_user(self, user_id: str) -> List[dict]:
+        await self.load()
+        groups = [self.groups[group_id] for group_id in self.by_user.get(user_id, ())]
+        return sorted(groups, key=lambda group: group["created_at"])
+
+    async def changed(self, group: dict):
+        """Apply a group write here and on every other worker"""
+        self.add(group)
+        await manager.publish({"type": "group", "group": group})
+
+group_index = GroupIndex(ttl=float(os.environ.get('GROUP_CACHE_TTL', 300)))
+manager.on("group", group_index.handle_event)
+
+async def get_current_user_name(user_id: str = Depends(get_current_user)) -> str:
+    """Display name of the authenticated user, for denormalising onto documents"""
+    profile = await get_user_profile(user_id)
+    return profile.get("name", "Unknown") if profile else "Unknown"
+
+def placeholder_email(name: str, suffix: str = "") -> str:
+    """Synthetic login email for relatives added on someone else's behalf"""
+    local = name.lower().replace(' ', '')
+    if suffix:
+        local = f"{local}.{suffix}"
+    return f"{local}@kulikarai.family"
+
+async def insert_placeholder_user(user_doc: dict):
+    """Insert a placeholder user, disambiguating the email if the name is taken"""
+    try:
+        await db.users.insert_one(user_doc)
+    except DuplicateKeyError:
+        user_doc.pop("_id", None)
+        user_doc["email"] = placeholder_email(user_doc["name"], user_doc["id"][:8])
+        await db.users.insert_one(user_doc)
+    await index_for_search("user", user_doc)
+
+# ==================== DATABASE INDEXES ====================
+
+# Declared indexes per collection. Every handler looks documents up by `id`
+# and lists them by a sort key, so each of those paths needs a matching index.
+# Content sections register their own indexes (see CONTENT TYPES).
+INDEX_SPECS: Dict[str, List[IndexModel]] = {
+    "users": [
+        IndexModel([("id", ASCENDING)], name="id_unique", unique=True),
+        IndexModel([("email", ASCENDING)], name="email_unique", unique=True),
+        IndexModel([("name", ASCENDING)], name="name"),
+    ],
+    "family_members": [
+        IndexModel([("id", ASCENDING)], name="id_unique", unique=True),
+        IndexModel([("name_key", ASCENDING)], name="name_key"),
+        IndexModel([("father_id", ASCENDING)], name="father_id"),
+        IndexModel([("mother_id", ASCENDING)], name="mother_id"),
+        IndexModel([("spouse_id", ASCENDING)], name="spouse_id"),
+        IndexModel([("created_at", ASCENDING), ("id", ASCENDING)], name="created_at_id"),
+    ],
+    "photos": [
+        IndexModel([("id", ASCENDING)], name="id_unique", unique=True),
+        IndexModel([("created_at", DESCENDING), ("id", DESCENDING)], name="created_at_id"),
+        IndexModel([("album_id", ASCENDING), ("created_at", DESCENDING), ("id", DESCENDING)], name="album_created_at_id"),
+    ],
+    "photo_comments": [
+        IndexModel([("photo_id", ASCENDING), ("created_at", ASCENDING)], name="photo_created_at"),
+    ],
+    "posts": [
+        IndexModel([("id", ASCENDING)], name="id_unique", unique=True),
+        IndexModel([("created_at", DESCENDING), ("id", DESCENDING)], name="created_at_id"),
+    ],
+    "post_comments": [
+        IndexModel([("post_id", ASCENDING), ("created_at", ASCENDING)], name="post_created_at"),
+    ],
+    "albums": [
+        IndexModel([("id", ASCENDING)], name="id_unique", unique=True),
+        IndexModel([("created_at", DESCENDING)], name="created_at"),
+    ],
+    "messages": [
+        IndexModel([("id", ASCENDING)], name="id_unique", unique=True),
+        IndexModel([("sender_id", ASCENDING), ("receiver_id", ASCENDING), ("created_at", ASCENDING), ("id", ASCENDING)], name="sender_receiver_created_at_id"),
+        IndexModel([("receiver_id", ASCENDING), ("created_at", ASCENDING)], name="receiver_created_at"),
+        IndexModel([("group_id", ASCENDING), ("created_at", ASCENDING), ("id", ASCENDING)], name="group_created_at_id"),
+        IndexModel([("receiver_id", ASCENDING), ("seq", ASCENDING)], name="receiver_seq"),
+        IndexModel([("group_id", ASCENDING), ("seq", ASCENDING)], name="group_seq"),
+    ],
+    "conversations": [
+        IndexModel([("id", ASCENDING)], name="id_unique", unique=True),
+        IndexModel([("user_id", ASCENDING), ("last_message_at", DESCENDING), ("id", DESCENDING)], name="user_last_message_at_id"),
+    ],
+    "groups": [
+        IndexModel([("id", ASCENDING)], name="id_unique", unique=True),
+        IndexModel([("members", ASCENDING)], name="members"),
+    ],
+    "events": [
+        IndexModel([("id", ASCENDING)], name="id_unique", unique=True),
+        IndexModel([("date", ASCENDING), ("id", ASCENDING)], name="date_id"),
+    ],
+    "well_done": [
+        IndexModel([("id", ASCENDING)], name="id_unique", unique=True),
+        IndexModel([("created_at", DESCENDING), ("id", DESCENDING)], name="created_at_id"),
+    ],
+    # GridFS creates the first fs.files index and the fs.chunks one on the
+    # first upload; they are declared under the driver's names so the drift
+    # report doesn't flag them
+    "fs.files": [
+        IndexModel([("filename", ASCENDING), ("uploadDate", ASCENDING)], name="filename_1_uploadDate_1"),
+        IndexModel([("metadata.parent_id", ASCENDING), ("metadata.variant", ASCENDING)], name="parent_variant"),
+    ],
+    "fs.chunks": [
+        IndexModel([("files_id", ASCENDING), ("n", ASCENDING)], name="files_id_1_n_1", unique=True),
+    ],
+    "ws_events": [
+        IndexModel([("created_at", ASCENDING)], name="created_at_ttl", expireAfterSeconds=WS_EVENTS_TTL_SECONDS),
+    ],
+    "import_jobs": [
+        IndexModel([("id", ASCENDING)], name="id_unique", unique=True),
+    ],
+    "likes": [
+        IndexModel([("target", ASCENDING), ("user_id", ASCENDING)], name="target_user", unique=True),
+    ],
+    "search_index": [
+        IndexModel([("id", ASCENDING)], name="id_unique", unique=True),
+        IndexModel([("terms", ASCENDING), ("kind", ASCENDING)], name="terms_kind"),
+    ],
+    "timeline": [
+        IndexModel([("id", ASCENDING)], name="id_unique", unique=True),
+        IndexModel([("created_at", DESCENDING), ("id", DESCENDING)], name="created_at_id"),
+        IndexModel([("kind", ASCENDING), ("created_at", DESCENDING), ("id", DESCENDING)], name="kind_created_at_id"),
+    ],
+}
+
+def _normalize_key(key) -> List[tuple]:
+    return [(field, int(direction) if isinstance(direction, (int, float)) else direction)
+            for field, direction in (key.items() if isinstance(key, dict) else key)]
+
+async def check_index_drift() -> Dict[str, Dict[str, List[str]]]:
+    """Compare declared indexes with the ones that actually exist.
+
+    Returns a report per collection listing missing indexes, undeclared extra
+    indexes and indexes whose key or uniqueness differ from the declaration.
+    Collections without drift are omitted.
+    """
+    report = {}
+    for collection, models in INDEX_SPECS.items():
+        actual = await db[collection].index_information()
+        actual.pop("_id_", None)
+        missing, mismatched = [], []
+        for model in models:
+            spec = model.document
+            existing = actual.pop(spec["name"], None)
+            if existing is None:
+                missing.append(spec["name"])
+            elif (_normalize_key(existing["key"]) != _normalize_key(spec["key"])
+                  or bool(existing.get("unique")) != bool(spec.get("unique"))):
+                mismatched.append(spec["name"])
+        extra = sorted(actual)
+        if missing or mismatched or extra:
+            report[collection] = {"missing": missing, "mismatched": mismatched, "extra": extra}
+    return report
+
+async def ensure_indexes():
+    """Create declared indexes and log any remaining drift.
+
+    Creation failures (for example a unique index over existing duplicate
+    data) are logged instead of aborting startup, and show up in the drift
+    report until the data is fixed.
+    """
+    for collection, models in INDEX_SPECS.items():
+        for model in models:
+            try:
+                await db[collection].create_indexes([model])
+            except OperationFailure as e:
+                logger.error("Could not create index %s.%s: %s", collection, model.document["name"], e)
+    drift = await check_index_drift()
+    for collection, problems in drift.items():
+        logger.warning("Index drift on %s: %s", collection, problems)
+    return drift
+
+# ==================== PAGINATION ====================
+
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 1000
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+def encode_cursor(doc: dict, sort_field: str) -> str:
+    raw = json.dumps([doc.get(sort_field), doc.get("id")]).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+def decode_cursor(cursor: str) -> tuple:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        value, last_id = json.loads(raw)
+        return value, last_id
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+def after_cursor(sort_field: str, direction: int, value, last_id: str) -> dict:
+    """Filter for documents strictly after (value, last_id) in sort order.
+
+    Missing or null sort values sort before everything else, and range
+    operators never match them, so they are handled explicitly.
+    """
+    op = "$gt" if direction == ASCENDING else "$lt"
+    clauses = [{sort_field: value, "id": {op: last_id}}]
+    if value is None:
+        if direction == ASCENDING:
+            clauses.append({sort_field: {"$ne": None}})
+    else:
+        clauses.append({sort_field: {op: value}})
+        if direction == DESCENDING:
+            clauses.append({sort_field: None})
+    return {"$or": clauses}
+
+class Page:
+    """Keyset page request over (sort field, id).
+
+    The opaque cursor for the following page is returned in the
+    X-Next-Cursor response header so list bodies keep their shape.
+    """
+    def __init__(self, cursor: Optional[str], limit: int, response: Response):
+        self.cursor = cursor
+        self.limit = limit
+        self.response = response
+
+    async def fetch(self, collection, query: dict, sort_field: str = "created_at",
+                    direction: int = DESCENDING, projection: Optional[dict] = None) -> List[dict]:
+        if self.cursor:
+            value, last_id = decode_cursor(self.cursor)
+            query = {"$and": [query, after_cursor(sort_field, direction, value, last_id)]}
+        docs = await collection.find(query, projection or {"_id": 0}).sort(
+            [(sort_field, direction), ("id", direction)]
+        ).limit(self.limit + 1).to_list(self.limit + 1)
+        if len(docs) > self.limit:
+            docs = docs[:self.limit]
+            self.response.headers[NEXT_CURSOR_HEADER] = encode_cursor(docs[-1], sort_field)
+        return docs
+
+def page_params(default_limit: int = DEFAULT_PAGE_SIZE):
+    """Dependency factory for `cursor`/`limit` query parameters"""
+    def dependency(
+        response: Response,
+        cursor: Optional[str] = Query(None),
+        limit: int = Query(default_limit, ge=1, le=MAX_PAGE_SIZE)
+    ) -> Page:
+        return Page(cursor, limit, response)
+    return dependency
+
+# ==================== RESPONSE CACHE ====================
+
+class ResponseCache:
+    """Serialised list responses, keyed by path and query string.
+
+    Each entry remembers the version of every collection it was built
+    from. Writes call `bump()`, which moves the local version on at once
+    and tells the other workers through the WebSocket pub/sub, so a stale
+    entry is never served after a write. Entries also expire after
+    RESPONSE_CACHE_TTL in case an event is lost.
+
+    Bodies are kept as JSON bytes with a content hash ETag, so a hit is a
+    dictionary lookup and a matching If-None-Match gets a bare 304.
+    """
+    def __init__(self, maxsize: int, ttl: float):
+        self.entries = TTLCache(maxsize=maxsize, ttl=ttl)
+        self.versions: Dict[str, int] = defaultdict(int)
+        self.hits = 0
+        self.misses = 0
+
+    def invalidate(self, collection: str):
+        self.versions[collection] += 1
+
+    def handle_event(self, event: dict):
+        self.invalidate(event["collection"])
+
+    async def bump(self, collection: str):
+        self.invalidate(collection)
+        await manager.publish({"type": "collection_changed", "collection": collection})
+
+    async def serve(self, request: Request, response: Response, collections: tuple,
+                    build: Callable[[], Awaitable], model=None) -> Response:
+        """Return the cached response for this request, building it on a miss.
+
+        `response` is the endpoint's injected Response; headers the build
+        sets on it (the pagination cursor) are cached with the body.
+        """
+        key = request.url.path + "?" + "&".join(f"{k}={v}" for k, v in sorted(request.query_params.multi_items()))
+        # Read versions before building so a write during the build
+        # leaves the entry already stale
+        versions = tuple(self.versions[collection] for collection in collections)
+        entry = self.entries.get(key)
+        if entry is None or entry["versions"] != versions:
+            self.misses += 1
+            data = await build()
+            if model is not None:
+                adapter = TypeAdapter(model)
+                body = adapter.dump_json(adapter.validate_python(data))
+            else:
+                body = json.dumps(jsonable_encoder(data)).encode()
+            headers = {"ETag": f'"{hashlib.md5(body).hexdigest()}"', "Cache-Control": "private, no-cache"}
+            if NEXT_CURSOR_HEADER in response.headers:
+                headers[NEXT_CURSOR_HEADER] = response.headers[NEXT_CURSOR_HEADER]
+            entry = {"versions": versions, "body": body, "headers": headers}
+            self.entries.set(key, entry)
+        else:
+            self.hits += 1
+        if_none_match = request.headers.get("if-none-match")
+        if if_none_match and etag_matches(if_none_match, entry["headers"]["ETag"]):
+            return Response(status_code=304, headers=entry["headers"])
+        return Response(content=entry["body"], media_type="application/json", headers=entry["headers"])
+
+response_cache = ResponseCache(
+    maxsize=int(os.environ.get('RESPONSE_CACHE_SIZE', 1000)),
+    ttl=float(os.environ.get('RESPONSE_CACHE_TTL', 300))
+)
+manager.on("collection_changed", response_cache.handle_event)
+
+# ==================== MIGRATIONS ====================
+
+# One-off backfills, run in registration order after startup. Each one is
+# claimed through a marker document in `migrations`; delete the marker to
+# run it again.
+MIGRATIONS: Dict[str, Callable] = {}
+
+def migration(name: str):
+    def register(fn):
+        MIGRATIONS[name] = fn
+        return fn
+    return register
+
+async def run_migrations():
+    for name, fn in MIGRATIONS.items():
+        try:
+            await db.migrations.insert_one({
+                "_id": name,
+                "status": "running",
+                "started_at": datetime.now(timezone.utc).isoformat()
+            })
+        except DuplicateKeyError:
+            continue
+        try:
+            await fn()
+        except Exception:
+            logger.exception("Migration %s failed", name)
+            await db.migrations.delete_one({"_id": name})
+            continue
+        await db.migrations.update_one(
+            {"_id": name},
+            {"$set": {"status": "done", "finished_at": datetime.now(timezone.utc).isoformat()}}
+        )
+        logger.info("Migration %s finished", name)
+
+# ==================== TIMELINE ====================
+
+# The home feed reads one materialised `timeline` collection holding a
+# compact card per item, written whenever an item is created or deleted,
+# instead of merging full documents from every content collection.
+TIMELINE_TEXT_LENGTH = 280
+
+# Card kind -> source collection and the fields its card is built from
+TIMELINE_SOURCES: Dict[str, dict] = {
+    "post": {"collection": "posts", "text": "content", "image": "media"},
+    "photo": {"collection": "photos", "text": "caption", "image": "url"},
+    "well_done": {"collection": "well_done", "title": "title", "text": "description"},
+    "event": {"collection": "events", "title": "title", "text": "description"},
+    "cooking_tip": {"collection": "cooking_tips", "title": "title", "text": "instructions"},
+    "kolam_tip": {"collection": "kolam_tips", "title": "title", "text": "description", "image": "image_url"},
+    "book_review": {"collection": "book_reviews", "title": "book_title", "text": "review"},
+    "hobby": {"collection": "hobbies", "title": "title", "text": "description"},
+    "gaming": {"collection": "gaming_space", "title": "game_name", "text": "content"},
+    "achievement": {"collection": "achievements", "title": "title", "text": "description"},
+}
+
+class TimelineCard(BaseModel):
+    id: str
+    kind: str
+    item_id: str
+    user_id: str
+    user_name: str = ""
+    title: str = ""
+    text: str = ""
+    image: str = ""
+    created_at: str
+
+def card_image(doc: dict, field: Optional[str]) -> str:
+    """Thumbnail URL for a card; inline base64 images are left out of the feed"""
+    if doc.get("file_id"):
+        return f"/api/photos/file/{doc['file_id']}?size=thumb"
+    value = doc.get(field) if field else None
+    if isinstance(value, list):
+        value = value[0] if value else None
+    if not isinstance(value, str) or value.startswith("data:"):
+        return ""
+    return value
+
+async def timeline_card(kind: str, doc: dict) -> dict:
+    source = TIMELINE_SOURCES[kind]
+    user_name = doc.get("user_name")
+    if not user_name:
+        profile = await get_user_profile(doc["user_id"])
+        user_name = profile.get("name", "") if profile else ""
+    return {
+        "id": f"{kind}:{doc['id']}",
+        "kind": kind,
+        "item_id": doc["id"],
+        "user_id": doc["user_id"],
+        "user_name": user_name or "",
+        "title": (doc.get(source["title"]) or "") if "title" in source else "",
+        "text": (doc.get(source["text"]) or "")[:TIMELINE_TEXT_LENGTH],
+        "image": card_image(doc, source.get("image")),
+        "created_at": doc["created_at"]
+    }
+
+async def add_to_timeline(kind: str, doc: dict):
+    """Write (or rewrite) the card for a created or edited item"""
+    card = await timeline_card(kind, doc)
+    await db.timeline.replace_one({"id": card["id"]}, card, upsert=True)
+
+async def remove_from_timeline(kind: str, item_id: str):
+    await db.timeline.delete_one({"id": f"{kind}:{item_id}"})
+
+@migration("timeline_backfill")
+async def backfill_timeline():
+    """Build cards for everything created before the timeline existed"""
+    for kind, source in TIMELINE_SOURCES.items():
+        batch = []
+        async for doc in db[source["collection"]].find({}, {"_id": 0}):
+            card = await timeline_card(kind, doc)
+            batch.append(ReplaceOne({"id": card["id"]}, card, upsert=True))
+            if len(batch) >= 500:
+                await db.timeline.bulk_write(batch, ordered=False)
+                batch = []
+        if batch:
+            await db.timeline.bulk_write(batch, ordered=False)
+
+# ==================== LIKES ====================
+
+# Likes live inline in the item's `likes` array until it reaches
+# LIKES_INLINE_LIMIT. The item is then flagged `likes_overflow`, its likers
+# are copied to the `likes` collection, and further toggles go there; the
+# inline array is left as is and `like_count` stays the total.
+LIKES_INLINE_LIMIT = int(os.environ.get('LIKES_INLINE_LIMIT', 500))
+
+def toggle_pipeline(field: str, count_field: str, user_id: str, limit: Optional[int]) -> List[dict]:
+    """Update pipeline that adds user_id to `field` or removes it if present"""
+    members = {"$ifNull": [f"${field}", []]}
+    present = {"$in": [user_id, members]}
+    added = {"$concatArrays": [members, [user_id]]}
+    changes = {}
+    if limit is not None:
+        full = {"$gte": [{"$size": members}, limit]}
+        added = {"$cond": [full, members, added]}
+        changes["likes_overflow"] = {"$cond": [present, False, full]}
+    changes[field] = {"$cond": [present, {"$filter": {"input": members, "cond": {"$ne": ["$$this", user_id]}}}, added]}
+    return [{"$set": changes}, {"$set": {count_field: {"$size": f"${field}"}}}]
+
+async def toggle_membership(collection, item_id: str, user_id: str, field: str,
+                            count_field: str, limit: Optional[int] = None) -> Optional[dict]:
+    """Atomically toggle user_id in an array field and return the new state.
+
+    Returns {"added", "count"}, or None if the item doesn't exist (or has
+    overflowed, when `limit` is given). When this toggle is the one that
+    overflowed the item, returns {"overflowed": True} instead.
+    """
+    query = {"id": item_id}
+    if limit is not None:
+        query["likes_overflow"] = {"$ne": True}
+    doc = await collection.find_one_and_update(
+        query,
+        toggle_pipeline(field, count_field, user_id, limit),
+        projection={"_id": 0, count_field: 1, "likes_overflow": 1, field: {"$elemMatch": {"$eq": user_id}}},
+        return_document=ReturnDocument.AFTER
+    )
+    if doc is None:
+        return None
+    if doc.get("likes_overflow"):
+        return {"overflowed": True}
+    return {"added": bool(doc.get(field)), "count": doc.get(count_field, 0)}
+
+async def toggle_like(collection_name: str, item_id: str, user_id: str) -> Optional[dict]:
+    """Like or unlike an item; returns None if it doesn't exist"""
+    collection = db[collection_name]
+    state = await toggle_membership(collection, item_id, user_id, "likes", "like_count", LIKES_INLINE_LIMIT)
+    if state is not None and not state.get("overflowed"):
+        return state
+    target = f"{collection_name}:{item_id}"
+    if state is None:
+        if not await collection.find_one({"id": item_id, "likes_overflow": True}, {"_id": 1}):
+            return None
+    else:
+        # This toggle filled the inline array: move its likers over first
+        item = await collection.find_one({"id": item_id}, {"_id": 0, "likes": 1})
+        await db.likes.bulk_write([
+            UpdateOne({"target": target, "user_id": liker},
+                      {"$setOnInsert": {"created_at": datetime.now(timezone.utc).isoformat()}}, upsert=True)
+            for liker in item["likes"]
+        ], ordered=False)
+
+    removed = await db.likes.delete_one({"target": target, "user_id": user_id})
+    if removed.deleted_count:
+        added, inc = False, -1
+    else:
+        try:
+            await db.likes.insert_one({"target": target, "user_id": user_id,
+                                       "created_at": datetime.now(timezone.utc).isoformat()})
+            added, inc = True, 1
+        except DuplicateKeyError:
+            # A concurrent request liked it first
+            added, inc = True, 0
+    item = await collection.find_one_and_update(
+        {"id": item_id}, {"$inc": {"like_count": inc}},
+        projection={"_id": 0, "like_count": 1}, return_document=ReturnDocument.AFTER
+    )
+    return {"added": added, "count": item["like_count"] if item else 0}
+
+@migration("like_counts")
+async def backfill_like_counts():
+    for collection in ("photos", "posts"):
+        await db[collection].update_many(
+            {"like_count": {"$exists": False}},
+            [{"$set": {"like_count": {"$size": {"$ifNull": ["$likes", []]}}}}]
+        )
+    await db.events.update_many(
+        {"attendee_count": {"$exists": False}},
+        [{"$set": {"attendee_count": {"$size": {"$ifNull": ["$attendees", []]}}}}]
+    )
+
+# ==================== COMMENTS ====================
+
+# Posts and photos carry their comment_count and the last few comments, so
+# a feed page renders without a comments request per item.
+COMMENT_PREVIEW_SIZE = 3
+
+def viewer_projection(model: type, user_id: str) -> dict:
+    """Projection for listing liked items: every model field, but `likes`
+    narrowed to the viewer's own entry so the arrays aren't shipped.
+    Pass the results through `resolve_viewer_likes`."""
+    projection = {"_id": 0, **{field: 1 for field in model.model_fields}}
+    projection["likes"] = {"$elemMatch": {"$eq": user_id}}
+    projection["likes_overflow"] = 1
+    return projection
+
+async def resolve_viewer_likes(collection_name: str, items: List[dict], user_id: str) -> List[dict]:
+    """Set `likes` from the `likes` collection on overflowed items, whose
+    inline array no longer changes"""
+    overflowed = [item for item in items if item.pop("likes_overflow", False)]
+    if overflowed:
+        targets = [f"{collection_name}:{item['id']}" for item in overflowed]
+        liked = {like["target"] async for like in db.likes.find(
+            {"target": {"$in": targets}, "user_id": user_id}, {"_id": 0, "target": 1}
+        )}
+        for item, target in zip(overflowed, targets):
+            item["likes"] = [user_id] if target in liked else []
+    return items
+
+async def comment_preview(comment_doc: dict) -> dict:
+    profile = await get_user_profile(comment_doc["user_id"])
+    return {
+        "id": comment_doc["id"],
+        "user_id": comment_doc["user_id"],
+        "user_name": profile.get("name", "") if profile else "",
+        "comment": comment_doc["comment"],
+        "created_at": comment_doc["created_at"]
+    }
+
+async def record_comment(collection, item_id: str, comment_doc: dict) -> bool:
+    """Count a new comment on its item; False if the item doesn't exist"""
+    result = await collection.update_one(
+        {"id": item_id},
+        {
+            "$inc": {"comment_count": 1},
+            "$push": {"latest_comments": {"$each": [await comment_preview(comment_doc)], "$slice": -COMMENT_PREVIEW_SIZE}}
+        }
+    )
+    return result.matched_count > 0
+
+async def repair_counters(collection_name: str, comments_collection: str, item_field: str):
+    """Recompute like_count, comment_count and latest_comments for every item"""
+    collection = db[collection_name]
+    comments = {}
+    async for group in db[comments_collection].aggregate([
+        {"$sort": {"created_at": 1}},
+        {"$group": {"_id": f"${item_field}", "count": {"$sum": 1}, "comments": {"$push": "$$ROOT"}}},
+        {"$project": {"count": 1, "comments": {"$slice": ["$comments", -COMMENT_PREVIEW_SIZE]}}}
+    ], allowDiskUse=True):
+        comments[group["_id"]] = group
+
+    overflow_counts = {}
+    async for group in db.likes.aggregate([
+        {"$match": {"target": {"$regex": f"^{collection_name}:"}}},
+        {"$group": {"_id": "$target", "count": {"$sum": 1}}}
+    ]):
+        overflow_counts[group["_id"].split(":", 1)[1]] = group["count"]
+
+    batch = []
+    async for item in collection.find({}, {"_id": 0, "id": 1, "likes": 1, "likes_overflow": 1}):
+        group = comments.get(item["id"], {"count": 0, "comments": []})
+        like_count = (overflow_counts.get(item["id"], 0) if item.get("likes_overflow")
+                      else len(item.get("likes") or []))
+        batch.append(UpdateOne({"id": item["id"]}, {"$set": {
+            "like_count": like_count,
+            "comment_count": group["count"],
+            "latest_comments": [await comment_preview(comment) for comment in group["comments"]]
+        }}))
+        if len(batch) >= 500:
+            await collection.bulk_write(batch, ordered=False)
+            batch = []
+    if batch:
+        await collection.bulk_write(batch, ordered=False)
+
+@migration("comment_counters")
+async def backfill_comment_counters():
+    await repair_counters("posts", "post_comments", "post_id")
+    await repair_counters("photos", "photo_comments", "photo_id")
+
+# ==================== SEARCH ====================
+
+# Typeahead search reads one `search_index` collection: an entry per
+# searchable item with its folded words in `terms`. Each query word is
+# matched as an anchored prefix, which MongoDB answers from the `terms`
+# index; candidates are then ranked in Python.
+SEARCH_MAX_TERMS = 40
+SEARCH_CANDIDATES = 100
+
+# Entry kind -> source collection, the field shown as the title, and how
+# strongly a match of that kind ranks
+SEARCH_SOURCES: Dict[str, dict] = {
+    "user": {"collection": "users", "title": "name", "weight": 3},
+    "member": {"collection": "family_members", "title": "name", "subtitle": "birth_date", "weight": 3},
+    "post": {"collection": "posts", "title": "content", "weight": 0},
+    "cooking_tip": {"collection": "cooking_tips", "title": "title", "subtitle": "category", "weight": 1},
+    "kolam_tip": {"collection": "kolam_tips", "title": "title", "subtitle": "difficulty", "weight": 1},
+}
+
+def fold(text: str) -> str:
+    """Lowercase, strip accents from Latin letters and turn punctuation into spaces"""
+    kept = []
+    base = ""
+    for char in unicodedata.normalize("NFKD", text or "").lower():
+        if unicodedata.category(char).startswith("M"):
+            # Accents on ASCII letters go; vowel signs and viramas in
+            # scripts such as Tamil are part of the word and stay
+            if base and not base.isascii():
+                kept.append(char)
+            continue
+        base = char if char.isalnum() else ""
+        kept.append(char if base else " ")
+    return " ".join(unicodedata.normalize("NFC", "".join(kept)).split())
+
+def search_entry(kind: str, doc: dict) -> dict:
+    source = SEARCH_SOURCES[kind]
+    title = doc.get(source["title"]) or ""
+    terms = list(dict.fromkeys(fold(title).split()))[:SEARCH_MAX_TERMS]
+    return {
+        "id": f"{kind}:{doc['id']}",
+        "kind": kind,
+        "item_id": doc["id"],
+        "title": title[:120],
+        "subtitle": doc.get(source.get("subtitle", "")) or "",
+        "key": " ".join(terms),
+        "terms": terms
+    }
+
+def search_upsert(kind: str, doc: dict) -> ReplaceOne:
+    entry = search_entry(kind, doc)
+    return ReplaceOne({"id": entry["id"]}, entry, upsert=True)
+
+async def index_for_search(kind: str, doc: dict):
+    entry = search_entry(kind, doc)
+    await db.search_index.replace_one({"id": entry["id"]}, entry, upsert=True)
+
+async def remove_from_search(kind: str, item_id: str):
+    await db.search_index.delete_one({"id": f"{kind}:{item_id}"})
+
+def rank_entry(entry: dict, query: str, words: List[str]) -> float:
+    key = entry["key"]
+    terms = set(entry["terms"])
+    score = 0.0
+    if key == query:
+        score += 100
+    elif key.startswith(query):
+        score += 50
+    score += sum(10 if word in terms else 5 for word in words)
+    score += SEARCH_SOURCES[entry["kind"]]["weight"]
+    # Prefer shorter titles among equal matches
+    return score - len(key) / 100
+
+async def search_entries(query: str, kinds: Optional[List[str]] = None, limit: int = 10) -> List[dict]:
+    query = fold(query)
+    words = list(dict.fromkeys(query.split()))
+    if not words:
+        return []
+    # Longest word first: it is the most selective one for the index scan
+    ordered = sorted(words, key=len, reverse=True)
+    scope = {"kind": {"$in": kinds}} if kinds else {}
+    # Entries holding every word exactly rank highest, so they are fetched
+    # first; a common prefix alone can match far more than SEARCH_CANDIDATES
+    candidates = await db.search_index.find(
+        {"$and": [{"terms": word} for word in ordered], **scope}, {"_id": 0}
+    ).limit(SEARCH_CANDIDATES).to_list(SEARCH_CANDIDATES)
+    if len(candidates) < SEARCH_CANDIDATES:
+        remaining = SEARCH_CANDIDATES - len(candidates)
+        candidates += await db.search_index.find(
+            {"$and": [{"terms": re.compile("^" + re.escape(word))} for word in ordered],
+             "id": {"$nin": [entry["id"] for entry in candidates]}, **scope},
+            {"_id": 0}
+        ).limit(remaining).to_list(remaining)
+    ranked = sorted(candidates, key=lambda entry: (-rank_entry(entry, query, words), entry["key"]))
+    return [{"kind": entry["kind"], "id": entry["item_id"], "title": entry["title"], "subtitle": entry["subtitle"]}
+            for entry in ranked[:limit]]
+
+@migration("search_backfill")
+async def backfill_search_index():
+    """Index everything created before search existed, and add name_key to members"""
+    for kind, source in SEARCH_SOURCES.items():
+        batch = []
+        async for doc in db[source["collection"]].find({}, {"_id": 0}):
+            batch.append(search_upsert(kind, doc))
+            if len(batch) >= 500:
+                await db.search_index.bulk_write(batch, ordered=False)
+                batch = []
+        if batch:
+            await db.search_index.bulk_write(batch, ordered=False)
+    batch = []
+    async for member in db.family_members.find({"name_key": {"$exists": False}}, {"_id": 0, "id": 1, "name": 1}):
+        batch.append(UpdateOne({"id": member["id"]}, {"$set": {"name_key": name_key(member["name"])}}))
+        if len(batch) >= 500:
+            await db.family_members.bulk_write(batch, ordered=False)
+            batch = []
+    if batch:
+        await db.family_members.bulk_write(batch, ordered=False)
+
 # Auth endpoints
 @api_router.post("/auth/register")
 async def register(user: UserRegister):
@@ -251,7 +1481,7 @@ async def register(user: UserRegister):
     user_doc = {
         "id": user_id,
         "email": user.email,
-        "password": hash_password(user.password),
+        "password": await hash_password(user.password),
         "name": user.name,
         "bio": "",
         "avatar": "",
@@ -259,16 +1489,27 @@ async def register(user: UserRegister):
         "relationships": [],
         "created_at": datetime.now(timezone.utc).isoformat()
     }
-    await db.users.insert_one(user_doc)
+    try:
+        await db.users.insert_one(user_doc)
+    except DuplicateKeyError:
+        raise HTTPException(status_code=400, detail="Email already registered")
+    await response_cache.bump("users")
+    await index_for_search("user", user_doc)
     token = create_token(user_id)
     return {"token": token, "user_id": user_id}
 
 @api_router.post("/auth/login")
 async def login(user: UserLogin):
     db_user = await db.users.find_one({"email": user.email}, {"_id": 0})
-    if not db_user or not verify_password(user.password, db_user['password']):
+    if not db_user or not await verify_password(user.password, db_user.get('password', '')):
         raise HTTPException(status_code=401, detail="Invalid credentials")
     
+    if needs_rehash(db_user['password']):
+        await db.users.update_one(
+            {"id": db_user['id'], "password": db_user['password']},
+            {"$set": {"password": await hash_password(user.password)}}
+        )
+    
     token = create_token(db_user['id'])
     return {"token": token, "user_id": db_user['id']}
 
@@ -285,13 +1526,18 @@ async def update_user(update: UserUpdate, user_id: str = Depends(get_current_use
     update_data = {k: v for k, v in update.model_dump().items() if v is not None}
     if update_data:
         await db.users.update_one({"id": user_id}, {"$set": update_data})
+        invalidate_user(user_id)
+        await response_cache.bump("users")
     user = await db.users.find_one({"id": user_id}, {"_id": 0, "password": 0})
+    if "name" in update_data:
+        await index_for_search("user", user)
     return user
 
 @api_router.post("/users/relationships")
 async def add_relationship(rel: RelationshipAdd, user_id: str = Depends(get_current_user)):
     relationship = {"user_id": rel.user_id, "relation_type": rel.relation_type}
     await db.users.update_one({"id": user_id}, {"$push": {"relationships": relationship}})
+    await response_cache.bump("users")
     return {"message": "Relationship added"}
 
 @api_router.post("/users/add-parent")
@@ -310,8 +1556,8 @@ async def add_parent(parent_data: dict, user_id: str = Depends(get_current_user)
         parent_id = str(uuid.uuid4())
         parent_doc = {
             "id": parent_id,
-            "email": f"{parent_name.lower().replace(' ', '')}@kulikarai.family",
-            "password": hash_password("changeme123"),
+            "email": placeholder_email(parent_name),
+            "password": "",
             "name": parent_name,
             "bio": "",
             "avatar": "",
@@ -322,11 +1568,12 @@ async def add_parent(parent_data: dict, user_id: str = Depends(get_current_user)
             }],
             "created_at": datetime.now(timezone.utc).isoformat()
         }
-        await db.users.insert_one(parent_doc)
+        await insert_placeholder_user(parent_doc)
     
     # Add relationship to current user
     relationship = {"user_id": parent_id, "relation_type": relation}
     await db.users.update_one({"id": user_id}, {"$push": {"relationships": relationship}})
+    await response_cache.bump("users")
     
     return {"message": "Parent added", "parent_id": parent_id}
 
@@ -342,8 +1589,8 @@ async def add_family_member(member_data: dict, user_id: str = Depends(get_curren
     member_id = str(uuid.uuid4())
     member_doc = {
         "id": member_id,
-        "email": f"{name.lower().replace(' ', '')}@kulikarai.family",
-        "password": hash_password("changeme123"),
+        "email": placeholder_email(name),
+        "password": "",
         "name": name,
         "bio": "",
         "avatar": "",
@@ -363,7 +1610,7 @@ async def add_family_member(member_data: dict, user_id: str = Depends(get_curren
             {"$push": {"relationships": {"user_id": member_id, "relation_type": relation}}}
         )
     
-    await db.users.insert_one(member_doc)
+    await insert_placeholder_user(member_doc)
     
     # Add parents if provided
     parent_ids = []
@@ -376,8 +1623,8 @@ async def add_family_member(member_data: dict, user_id: str = Depends(get_curren
                 parent_id = str(uuid.uuid4())
                 parent_doc = {
                     "id": parent_id,
-                    "email": f"{parent_name.lower().replace(' ', '')}@kulikarai.family",
-                    "password": hash_password("changeme123"),
+                    "email": placeholder_email(parent_name),
+                    "password": "",
                     "name": parent_name,
                     "bio": "",
                     "avatar": "",
@@ -388,7 +1635,7 @@ async def add_family_member(member_data: dict, user_id: str = Depends(get_curren
                     }],
                     "created_at": datetime.now(timezone.utc).isoformat()
                 }
-                await db.users.insert_one(parent_doc)
+                await insert_placeholder_user(parent_doc)
             
             # Add parent relationship to member
             await db.users.update_one(
@@ -396,6 +1643,7 @@ async def add_family_member(member_data: dict, user_id: str = Depends(get_curren
                 {"$push": {"relationships": {"user_id": parent_id, "relation_type": parent_relation}}}
             )
             parent_ids.append(parent_id)
+    await response_cache.bump("users")
     
     return {"message": "Family member added", "member_id": member_id, "parent_ids": parent_ids}
 
@@ -414,37 +1662,1567 @@ async def delete_relationship(user_id: str, relation_user_id: str, current_user:
         {"id": relation_user_id},
         {"$pull": {"relationships": {"user_id": user_id}}}
     )
+    await response_cache.bump("users")
     
     return {"message": "Relationship deleted"}
 
-@api_router.get("/users/family-tree")
-async def get_family_tree(user_id: str = Depends(get_current_user)):
-    users = await db.users.find({}, {"_id": 0, "password": 0, "email": 0}).to_list(1000)
-    return {"users": users}
+@api_router.get("/users/family-tree")
+async def get_family_tree(request: Request, response: Response, user_id: str = Depends(get_current_user)):
+    async def build():
+        users = await db.users.find({}, {"_id": 0, "password": 0, "email": 0}).to_list(1000)
+        return {"users": users}
+    return await response_cache.serve(request, response, ("users",), build)
+
+# ==================== INDUSTRY-STANDARD FAMILY TREE APIs ====================
+
+async def bump_version(name: str, by: int = 1) -> int:
+    """Increment and return a named version counter shared by all workers"""
+    counter = await db.counters.find_one_and_update(
+        {"_id": name},
+        {"$inc": {"version": by}},
+        upsert=True,
+        return_document=ReturnDocument.AFTER
+    )
+    return counter["version"]
+
+async def read_version(name: str) -> int:
+    counter = await db.counters.find_one({"_id": name})
+    return counter["version"] if counter else 0
+
+SNAPSHOT_ENCODE_SLICE = 1000
+
+def encode_snapshot(snapshot: dict) -> bytes:
+    """JSON for a tree snapshot. Long lists are encoded a slice at a time so
+    a builder thread never holds the GIL for the whole payload."""
+    parts = []
+    for key, value in snapshot.items():
+        if isinstance(value, list):
+            slices = (json.dumps(value[start:start + SNAPSHOT_ENCODE_SLICE])[1:-1]
+                      for start in range(0, len(value), SNAPSHOT_ENCODE_SLICE))
+            parts.append(f"{json.dumps(key)}:[{','.join(slices)}]")
+        else:
+            parts.append(f"{json.dumps(key)}:{json.dumps(value)}")
+    return ("{" + ",".join(parts) + "}").encode()
+
+class FamilyGraph:
+    """In-memory adjacency graph of `family_members`.
+
+    The graph is loaded once and then patched by the family tree write
+    handlers. It is kept in sync with other workers through the
+    `family_members` version counter: a mismatch on read triggers a reload.
+    """
+    COUNTER = "family_members"
+
+    def __init__(self):
+        self.members: Dict[str, dict] = {}
+        # Children per parent, as insertion-ordered dicts used as sets
+        self.children: Dict[str, Dict[str, None]] = defaultdict(dict)
+        self.version: Optional[int] = None
+        self._ancestry: "OrderedDict[str, Dict[str, tuple]]" = OrderedDict()
+        self._lock = asyncio.Lock()
+        # The tree snapshot is built in a thread from a frozen copy of the
+        # graph (`_view`). The previous one is served until its successor is
+        # ready; `_edits` counts local changes so a stale one is detected.
+        self._edits = 0
+        self._snapshot: Optional[dict] = None
+        self._snapshot_body = b""
+        self._snapshot_edits = -1
+        self._snapshot_index: dict = {}
+        self._view: Optional["FamilyGraph"] = None
+        self._build_lock = asyncio.Lock()
+        # Layout blocks by subtree fingerprint; these outlive reloads since
+        # the fingerprint covers everything a block depends on
+        self._layouts: Dict[int, dict] = {}
+
+    def load(self, members: List[dict], version: int = 0):
+        self.members = {}
+        self.children = defaultdict(dict)
+        for member in members:
+            self.upsert(member)
+        self.version = version
+        self._changed()
+
+    @classmethod
+    def frozen(cls, members: List[dict], version: Optional[int]) -> "FamilyGraph":
+        """A read-only graph sharing the given member dicts instead of copying them"""
+        graph = cls()
+        graph.members = {member["id"]: member for member in members}
+        for member in members:
+            graph._link(member)
+        graph.version = version
+        return graph
+
+    def _changed(self):
+        self._edits += 1
+        self._ancestry.clear()
+
+    def _link(self, member: dict):
+        for key in ("father_id", "mother_id"):
+            if member.get(key):
+                self.children[member[key]][member["id"]] = None
+
+    def _unlink(self, member: dict):
+        for key in ("father_id", "mother_id"):
+            parent_id = member.get(key)
+            if parent_id and parent_id in self.children:
+                self.children[parent_id].pop(member["id"], None)
+
+    def upsert(self, member: dict):
+        member = {k: v for k, v in member.items() if k != "_id"}
+        old = self.members.get(member["id"])
+        if old:
+            self._unlink(old)
+        self.members[member["id"]] = member
+        self._link(member)
+        self._changed()
+
+    def patch(self, member_id: str, fields: dict):
+        member = self.members.get(member_id)
+        if member:
+            self.upsert({**member, **fields})
+
+    def remove(self, member_id: str):
+        """Drop a member and clear references to it, mirroring delete_family_member"""
+        member = self.members.pop(member_id, None)
+        if not member:
+            return
+        self._unlink(member)
+        # Member dicts are replaced rather than edited, since a snapshot
+        # build may be reading them from another thread
+        for child_id in list(self.children.pop(member_id, ())):
+            child = self.members.get(child_id)
+            if child:
+                self.patch(child_id, {key: "" for key in ("father_id", "mother_id") if child.get(key) == member_id})
+        spouse = self.members.get(member.get("spouse_id"))
+        if spouse and spouse.get("spouse_id") == member_id:
+            self.patch(spouse["id"], {"spouse_id": ""})
+        self._changed()
+
+    def summary(self, member_id: str) -> Optional[dict]:
+        member = self.members.get(member_id)
+        if not member:
+            return None
+        return {"id": member["id"], "name": member["name"], "gender": member.get("gender")}
+
+    def parent_ids(self, member_id: str) -> List[str]:
+        member = self.members.get(member_id, {})
+        return [parent_id for parent_id in (member.get("father_id"), member.get("mother_id"))
+                if parent_id in self.members]
+
+    def derived_relations(self, member_id: str) -> dict:
+        member = self.members[member_id]
+        sibling_ids = {}
+        for parent_id in (member.get("father_id"), member.get("mother_id")):
+            if parent_id:
+                sibling_ids.update(self.children.get(parent_id, {}))
+        sibling_ids.pop(member_id, None)
+        return {
+            "father": self.summary(member.get("father_id")),
+            "mother": self.summary(member.get("mother_id")),
+            "spouse": self.summary(member.get("spouse_id")),
+            "children": [self.summary(child_id) for child_id in self.children.get(member_id, {})],
+            "siblings": [self.summary(sibling_id) for sibling_id in sibling_ids if sibling_id in self.members]
+        }
+
+    def _walk(self, member_id: str, depth: int, neighbours: Callable[[str], List[str]]) -> List[dict]:
+        """Breadth-first walk up to `depth` steps, each relative listed once"""
+        seen = {member_id}
+        frontier = [member_id]
+        found = []
+        for level in range(1, depth + 1):
+            next_frontier = []
+            for current in frontier:
+                for relative_id in neighbours(current):
+                    if relative_id in seen or relative_id not in self.members:
+                        continue
+                    seen.add(relative_id)
+                    next_frontier.append(relative_id)
+                    found.append({**self.summary(relative_id), "depth": level})
+            if not next_frontier:
+                break
+            frontier = next_frontier
+        return found
+
+    def ancestors(self, member_id: str, depth: int) -> List[dict]:
+        return self._walk(member_id, depth, self.parent_ids)
+
+    def descendants(self, member_id: str, depth: int) -> List[dict]:
+        return self._walk(member_id, depth, lambda current: list(self.children.get(current, {})))
+
+    def ancestry(self, member_id: str) -> Dict[str, tuple]:
+        """Every ancestor of a member as {id: (generations up, child on the way down)}.
+
+        The member itself is included at depth 0. Maps are cached until the
+        graph next changes, so repeated relation queries skip the walk.
+        """
+        cached = self._ancestry.get(member_id)
+        if cached is not None:
+            self._ancestry.move_to_end(member_id)
+            return cached
+        found = {member_id: (0, None)}
+        frontier = [member_id]
+        depth = 0
+        while frontier:
+            depth += 1
+            next_frontier = []
+            for current in frontier:
+                for parent_id in self.parent_ids(current):
+                    if parent_id not in found:
+                        found[parent_id] = (depth, current)
+                        next_frontier.append(parent_id)
+            frontier = next_frontier
+        self._ancestry[member_id] = found
+        if len(self._ancestry) > ANCESTRY_CACHE_SIZE:
+            self._ancestry.popitem(last=False)
+        return found
+
+    def common_ancestor(self, member_id: str, other_id: str) -> Optional[tuple]:
+        """Closest shared ancestor as (id, generations up from each member)"""
+        up, other_up = self.ancestry(member_id), self.ancestry(other_id)
+        if len(up) > len(other_up):
+            shared = (ancestor_id for ancestor_id in other_up if ancestor_id in up)
+        else:
+            shared = (ancestor_id for ancestor_id in up if ancestor_id in other_up)
+        best = min(((up[ancestor_id][0] + other_up[ancestor_id][0], ancestor_id) for ancestor_id in shared),
+                   default=None)
+        if best is None:
+            return None
+        ancestor_id = best[1]
+        return ancestor_id, up[ancestor_id][0], other_up[ancestor_id][0]
+
+    def line_down(self, member_id: str, ancestor_id: str) -> List[str]:
+        """Ids from an ancestor down to the member, both included"""
+        up = self.ancestry(member_id)
+        line = [ancestor_id]
+        while line[-1] != member_id:
+            line.append(up[line[-1]][1])
+        return line
+
+    def neighbours(self, member_id: str) -> List[str]:
+        member = self.members[member_id]
+        found = self.parent_ids(member_id) + [child_id for child_id in self.children.get(member_id, {})
+                                              if child_id in self.members]
+        if member.get("spouse_id") in self.members:
+            found.append(member["spouse_id"])
+        return found
+
+    def shortest_path(self, member_id: str, other_id: str) -> Optional[List[str]]:
+        """Shortest chain of parent, child and spouse links, searched from both ends"""
+        if member_id == other_id:
+            return [member_id]
+        came_from = [{member_id: None}, {other_id: None}]
+        frontiers = [[member_id], [other_id]]
+        while frontiers[0] and frontiers[1]:
+            # Grow the smaller side; stop at the first id both sides reached
+            side = 0 if len(frontiers[0]) <= len(frontiers[1]) else 1
+            seen, opposite = came_from[side], came_from[1 - side]
+            next_frontier = []
+            for current in frontiers[side]:
+                for relative_id in self.neighbours(current):
+                    if relative_id in seen:
+                        continue
+                    seen[relative_id] = current
+                    if relative_id in opposite:
+                        forward, backward = [], []
+                        node = relative_id
+                        while node is not None:
+                            forward.append(node)
+                            node = came_from[0][node]
+                        node = came_from[1][relative_id]
+                        while node is not None:
+                            backward.append(node)
+                            node = came_from[1][node]
+                        return forward[::-1] + backward
+                    next_frontier.append(relative_id)
+            frontiers[side] = next_frontier
+        return None
+
+    async def refresh(self):
+        """Reload from MongoDB if another writer has moved the version on"""
+        current = await read_version(self.COUNTER)
+        if current == self.version:
+            return
+        async with self._lock:
+            current = await read_version(self.COUNTER)
+            if current == self.version:
+                return
+            # Version is read before the documents, so the loaded state is
+            # never older than the version it is tagged with.
+            members = await db.family_members.find({}, {"_id": 0}).to_list(None)
+            self.load(members, current)
+
+    async def apply(self, mutate: Callable[["FamilyGraph"], Optional[bool]]):
+        """Record a write that has already been applied to MongoDB.
+
+        The local copy is patched only if no other writer bumped the version
+        in the meantime; otherwise it is reloaded on the next read. So is
+        one whose `mutate` returns False because it found the copy out of
+        step with the write.
+        """
+        version = await bump_version(self.COUNTER)
+        if self.version is not None and version == self.version + 1 and mutate(self) is not False:
+            self.version = version
+        else:
+            self.version = None
+        self._changed()
+
+    async def invalidate(self):
+        """Record a bulk write; every worker reloads on its next read"""
+        await bump_version(self.COUNTER)
+        self.version = None
+        self._changed()
+
+    def generations(self) -> Dict[str, int]:
+        """Generation of every member: one more than its deepest parent"""
+        generation: Dict[str, int] = {}
+        for start in self.members:
+            if start in generation:
+                continue
+            stack = [start]
+            visiting = set()
+            while stack:
+                member_id = stack[-1]
+                member = self.members[member_id]
+                visiting.add(member_id)
+                pending = [parent_id for parent_id in (member.get("father_id"), member.get("mother_id"))
+                           if parent_id in self.members and parent_id not in generation
+                           and parent_id not in visiting]
+                if pending:
+                    stack.extend(pending)
+                    continue
+                stack.pop()
+                visiting.discard(member_id)
+                parent_gens = [generation.get(parent_id, -1)
+                               for parent_id in (member.get("father_id"), member.get("mother_id"))
+                               if parent_id in self.members]
+                generation[member_id] = max(parent_gens, default=-1) + 1
+        return generation
+
+    def build_snapshot(self, layouts: Dict[int, dict]) -> tuple:
+        """Nodes, edges, generations and layout for react-flow.
+
+        Meant to run in a thread on a frozen copy of the graph; returns the
+        snapshot and the layout blocks to reuse next time.
+        """
+        member_generations = self.generations()
+        layout, layouts = tree_layout(self, layouts)
+        positions = layout.pop("positions")
+
+        nodes = []
+        edges = []
+        edges_by_member: Dict[str, List[dict]] = {}
+        processed_couples = set()
+        for member in self.members.values():
+            edge_count = len(edges)
+            nodes.append({
+                "id": member["id"],
+                "position": positions[member["id"]],
+                "data": {
+                    "name": member["name"],
+                    "gender": member.get("gender", "unknown"),
+                    "birth_date": member.get("birth_date", ""),
+                    "death_date": member.get("death_date", ""),
+                    "photo_url": member.get("photo_url", ""),
+                    "spouse_id": member.get("spouse_id", ""),
+                    "father_id": member.get("father_id", ""),
+                    "mother_id": member.get("mother_id", "")
+                }
+            })
+
+            if member.get("father_id"):
+                edges.append({
+                    "id": f"father-{member['father_id']}-{member['id']}",
+                    "source": member["father_id"],
+                    "target": member["id"],
+                    "type": "parent-child",
+                    "label": "Father"
+                })
+
+            if member.get("mother_id"):
+                edges.append({
+                    "id": f"mother-{member['mother_id']}-{member['id']}",
+                    "source": member["mother_id"],
+                    "target": member["id"],
+                    "type": "parent-child",
+                    "label": "Mother"
+                })
+
+            # Create spouse edges (only once per couple)
+            if member.get("spouse_id"):
+                couple_key = tuple(sorted([member["id"], member["spouse_id"]]))
+                if couple_key not in processed_couples:
+                    processed_couples.add(couple_key)
+                    edges.append({
+                        "id": f"spouse-{member['id']}-{member['spouse_id']}",
+                        "source": member["id"],
+                        "target": member["spouse_id"],
+                        "type": "spouse",
+                        "label": "Spouse"
+                    })
+            edges_by_member[member["id"]] = edges[edge_count:]
+
+        generations = {}
+        for member_id in self.members:
+            generations.setdefault(member_generations[member_id], []).append(member_id)
+
+        snapshot = {
+            "nodes": nodes,
+            "edges": edges,
+            "generations": generations,
+            "root_members": [m["id"] for m in self.members.values()
+                             if not m.get("father_id") and not m.get("mother_id")],
+            "total_members": len(self.members),
+            "layout": layout,
+            "version": self.version
+        }
+        self._snapshot_index = {
+            "nodes": {node["id"]: node for node in nodes},
+            "edges": edges_by_member,
+            "generations": member_generations
+        }
+        return snapshot, layouts
+
+    async def snapshot(self) -> dict:
+        """The tree snapshot for the current state, built off the event loop"""
+        async with self._build_lock:
+            if self._snapshot is not None and self._snapshot_edits == self._edits:
+                return self._snapshot
+            edits = self._edits
+            # Member dicts are never edited in place, so a shallow copy is
+            # a consistent picture for the builder thread
+            members = list(self.members.values())
+            version = self.version
+
+            def build():
+                view = FamilyGraph.frozen(members, version)
+                snapshot, layouts = view.build_snapshot(self._layouts)
+                return view, snapshot, encode_snapshot(snapshot), layouts
+            self._view, self._snapshot, self._snapshot_body, self._layouts = await asyncio.to_thread(build)
+            self._snapshot_edits = edits
+            return self._snapshot
+
+    async def snapshot_body(self) -> bytes:
+        """The snapshot as JSON, so large trees are not re-encoded on the event loop per request"""
+        await self.snapshot()
+        return self._snapshot_body
+
+    def focus(self, root_id: str, up: int, down: int) -> List[str]:
+        """A member, its ancestors and descendants, and the spouses of all of them"""
+        found = [root_id] + [relative["id"] for relative in self.ancestors(root_id, up)]
+        found += [relative["id"] for relative in self.descendants(root_id, down)]
+        with_spouses = []
+        for member_id in found:
+            with_spouses.append(member_id)
+            spouse_id = self.members[member_id].get("spouse_id")
+            if spouse_id in self.members:
+                with_spouses.append(spouse_id)
+        return list(dict.fromkeys(with_spouses))
+
+    async def subgraph(self, root_id: Optional[str], up: int, down: int,
+                       bbox: Optional[tuple], limit: int) -> Optional[dict]:
+        """Part of the snapshot around `root_id` and/or inside a layout bounding box.
+
+        Nodes carry `has_more` flags for parents, children or a spouse left
+        out, so the client can expand them with a follow-up query. Returns
+        None if `root_id` is not in the tree.
+        """
+        snapshot = await self.snapshot()
+        view = self._view
+        return view.select(snapshot, root_id, up, down, bbox, limit)
+
+    def select(self, snapshot: dict, root_id: Optional[str], up: int, down: int,
+               bbox: Optional[tuple], limit: int) -> Optional[dict]:
+        if root_id is not None and root_id not in self.members:
+            return None
+        index = self._snapshot_index
+        member_ids = self.focus(root_id, up, down) if root_id else list(self.members)
+        if bbox:
+            x0, y0, x1, y1 = bbox
+            width, height = snapshot["layout"]["node_width"], snapshot["layout"]["node_height"]
+            member_ids = [member_id for member_id in member_ids
+                          if x0 <= index["nodes"][member_id]["position"]["x"] + width
+                          and index["nodes"][member_id]["position"]["x"] <= x1
+                          and y0 <= index["nodes"][member_id]["position"]["y"] + height
+                          and index["nodes"][member_id]["position"]["y"] <= y1]
+        truncated = len(member_ids) > limit
+        included = dict.fromkeys(member_ids[:limit])
+
+        nodes = []
+        edges = []
+        generations = {}
+        for member_id in included:
+            member = self.members[member_id]
+            spouse_id = member.get("spouse_id")
+            nodes.append({**index["nodes"][member_id], "has_more": {
+                "parents": any(parent_id not in included for parent_id in self.parent_ids(member_id)),
+                "children": any(child_id in self.members and child_id not in included
+                                for child_id in self.children.get(member_id, {})),
+                "spouse": spouse_id in self.members and spouse_id not in included
+            }})
+            edges.extend(edge for edge in index["edges"][member_id]
+                         if edge["source"] in included and edge["target"] in included)
+            generations.setdefault(index["generations"][member_id], []).append(member_id)
+        return {
+            "nodes": nodes,
+            "edges": edges,
+            "generations": generations,
+            "total_members": len(self.members),
+            "truncated": truncated,
+            "layout": snapshot["layout"],
+            "version": self.version
+        }
+
+family_graph = FamilyGraph()
+
+# ==================== KINSHIP ====================
+
+# Relations are named from the closest common ancestor: the generations
+# up from each member give sibling, cousin and "removed" degrees. When
+# there is no blood line, a spouse on either side gives in-law and step
+# relations, and anything else is reported as a relation by marriage
+# along the shortest connecting path.
+ANCESTRY_CACHE_SIZE = 10000
+
+KIN_WORDS = {
+    "child": ("son", "daughter", "child"),
+    "grandchild": ("grandson", "granddaughter", "grandchild"),
+    "parent": ("father", "mother", "parent"),
+    "grandparent": ("grandfather", "grandmother", "grandparent"),
+    "sibling": ("brother", "sister", "sibling"),
+    "nibling": ("nephew", "niece", "nephew or niece"),
+    "pibling": ("uncle", "aunt", "uncle or aunt"),
+    "spouse": ("husband", "wife", "spouse"),
+    "step_parent": ("stepfather", "stepmother", "step-parent"),
+    "step_child": ("stepson", "stepdaughter", "stepchild"),
+    "parent_in_law": ("father-in-law", "mother-in-law", "parent-in-law"),
+    "child_in_law": ("son-in-law", "daughter-in-law", "child-in-law"),
+    "sibling_in_law": ("brother-in-law", "sister-in-law", "sibling-in-law"),
+}
+ORDINALS = ["first", "second", "third", "fourth", "fifth", "sixth", "seventh", "eighth", "ninth", "tenth"]
+REMOVED = {1: "once", 2: "twice", 3: "thrice"}
+
+def kin_word(kind: str, gender: Optional[str]) -> str:
+    male, female, neutral = KIN_WORDS[kind]
+    return {"male": male, "female": female}.get(gender, neutral)
+
+def ordinal(n: int) -> str:
+    if n <= len(ORDINALS):
+        return ORDINALS[n - 1]
+    suffix = "th" if n % 100 in (11, 12, 13) else {1: "st", 2: "nd", 3: "rd"}.get(n % 10, "th")
+    return f"{n}{suffix}"
+
+def blood_relation(up: int, down: int, gender: Optional[str], half: bool = False) -> str:
+    """Name for someone `down` generations below the common ancestor, as seen
+    from someone `up` generations below it"""
+    if up == 0 and down == 0:
+        return "self"
+    if up == 0:
+        if down == 1:
+            return kin_word("child", gender)
+        return "great-" * (down - 2) + kin_word("grandchild", gender)
+    if down == 0:
+        if up == 1:
+            return kin_word("parent", gender)
+        return "great-" * (up - 2) + kin_word("grandparent", gender)
+    prefix = "half-" if half else ""
+    if up == 1 and down == 1:
+        return prefix + kin_word("sibling", gender)
+    if up == 1:
+        return prefix + "great-" * (down - 2) + kin_word("nibling", gender)
+    if down == 1:
+        return prefix + "great-" * (up - 2) + kin_word("pibling", gender)
+    removed = abs(up - down)
+    name = f"{prefix}{ordinal(min(up, down) - 1)} cousin"
+    if removed:
+        name += f" {REMOVED.get(removed, f'{removed} times')} removed"
+    return name
+
+def is_half_line(graph: FamilyGraph, member_id: str, other_id: str, ancestor_id: str) -> bool:
+    """Whether the two lines leave the common ancestor through children of
+    different couples. Unknown parents are not counted as different."""
+    branches = [graph.line_down(member_id, ancestor_id)[1], graph.line_down(other_id, ancestor_id)[1]]
+    parents = [set(graph.parent_ids(branch)) for branch in branches]
+    return all(len(found) == 2 for found in parents) and parents[0] != parents[1]
+
+def blood_kinship(graph: FamilyGraph, member_id: str, other_id: str) -> Optional[dict]:
+    found = graph.common_ancestor(member_id, other_id)
+    if not found:
+        return None
+    ancestor_id, up, down = found
+    half = bool(up and down) and is_half_line(graph, member_id, other_id, ancestor_id)
+    gender = graph.members[other_id].get("gender")
+    return {
+        "relation": blood_relation(up, down, gender, half),
+        "generations": [up, down],
+        "common_ancestor": graph.summary(ancestor_id),
+        "path": graph.line_down(member_id, ancestor_id)[::-1] + graph.line_down(other_id, ancestor_id)[1:]
+    }
+
+def in_law_kinship(graph: FamilyGraph, member_id: str, other_id: str) -> Optional[dict]:
+    member, other = graph.members[member_id], graph.members[other_id]
+    gender = other.get("gender")
+    if member.get("spouse_id") == other_id:
+        return {"relation": kin_word("spouse", gender), "path": [member_id, other_id]}
+
+    # Blood relatives of the member's spouse
+    spouse_id = member.get("spouse_id")
+    found = blood_kinship(graph, spouse_id, other_id) if spouse_id in graph.members else None
+    if found:
+        relation = {(1, 0): "parent_in_law", (1, 1): "sibling_in_law", (0, 1): "step_child"}.get(
+            tuple(found["generations"]))
+        spouse_word = kin_word("spouse", graph.members[spouse_id].get("gender"))
+        found["relation"] = kin_word(relation, gender) if relation else f"{spouse_word}'s {found['relation']}"
+        found["path"] = [member_id] + found["path"]
+        return found
+
+    # Spouses of the member's blood relatives
+    spouse_id = other.get("spouse_id")
+    found = blood_kinship(graph, member_id, spouse_id) if spouse_id in graph.members else None
+    if found:
+        relation = {(0, 1): "child_in_law", (1, 1): "sibling_in_law", (1, 0): "step_parent",
+                    (2, 1): "pibling"}.get(
+            tuple(found["generations"]))
+        found["relation"] = kin_word(relation, gender) if relation else f"{found['relation']}'s {kin_word('spouse', gender)}"
+        found["path"] = found["path"] + [other_id]
+        return found
+    return None
+
+def step_label(graph: FamilyGraph, previous_id: str, member_id: str) -> str:
+    """How a member on a path relates to the one before it"""
+    gender = graph.members[member_id].get("gender")
+    if member_id in graph.parent_ids(previous_id):
+        return kin_word("parent", gender)
+    if previous_id in graph.parent_ids(member_id):
+        return kin_word("child", gender)
+    return kin_word("spouse", gender)
+
+def kinship(graph: FamilyGraph, member_id: str, other_id: str) -> dict:
+    """How `other_id` is related to `member_id`, with the connecting path"""
+    found = blood_kinship(graph, member_id, other_id) or in_law_kinship(graph, member_id, other_id)
+    if not found:
+        path = graph.shortest_path(member_id, other_id)
+        found = {"relation": "relative by marriage" if path else "not related", "path": path or []}
+    path = found["path"]
+    steps = [{**graph.summary(path[0]), "step": "self"}] if path else []
+    steps += [{**graph.summary(current), "step": step_label(graph, previous, current)}
+              for previous, current in zip(path, path[1:])]
+    member, other = graph.members[member_id], graph.members[other_id]
+    if found["relation"] == "not related":
+        description = f"{other['name']} and {member['name']} are not related"
+    elif member_id == other_id:
+        description = f"{member['name']} is the same person"
+    else:
+        description = f"{other['name']} is {member['name']}'s {found['relation']}"
+    return {
+        "relation": found["relation"],
+        "description": description,
+        "common_ancestor": found.get("common_ancestor"),
+        "path": steps
+    }
+
+# ==================== FAMILY TREE LAYOUT ====================
+
+# Node positions for the tree page, in React Flow's top-left coordinates.
+# Couples are grouped into units and every unit hangs below the unit of
+# its first known parent, so the units form a forest; an in-law's
+# parents start a tree of their own. Each unit's subtree is a block
+# whose size and child offsets depend only on that subtree, and blocks
+# are cached by a fingerprint of it. After an edit, only the blocks on
+# the path from the edited unit up to its root are recomputed; the rest
+# of the tree is reused and only shifted into place.
+#
+# Edges along the tree never cross. Links it doesn't follow (a second
+# parent in another unit, an in-law's parents) can, so a few barycentre
+# sweeps reorder siblings and trees towards the relatives they link to,
+# starting from birth order.
+LAYOUT_NODE_WIDTH = 180
+LAYOUT_NODE_HEIGHT = 140
+LAYOUT_NODE_GAP = 60
+LAYOUT_RANK_GAP = 120
+LAYOUT_FAMILY_GAP = 240
+LAYOUT_MAX_ROUNDS = 20
+LAYOUT_ORDER_SWEEPS = 4
+
+def layout_block(unit_size: int, child_blocks: List[dict]) -> dict:
+    """A unit centred over its children's blocks laid side by side"""
+    unit_width = unit_size * (LAYOUT_NODE_WIDTH + LAYOUT_NODE_GAP) - LAYOUT_NODE_GAP
+    offsets = []
+    cursor = 0.0
+    for block in child_blocks:
+        offsets.append(cursor)
+        cursor += block["width"] + LAYOUT_NODE_GAP
+    children_width = cursor - LAYOUT_NODE_GAP if child_blocks else 0.0
+    width = max(unit_width, children_width)
+    shift = (width - children_width) / 2
+    return {
+        "width": width,
+        "unit_x": (width - unit_width) / 2,
+        "offsets": [offset + shift for offset in offsets],
+        "rows": 1 + max((block["rows"] for block in child_blocks), default=0),
+        "size": unit_size + sum(block["size"] for block in child_blocks)
+    }
+
+def tree_layout(graph: FamilyGraph, blocks: Dict[int, dict]) -> tuple:
+    """Positions for every member, reusing cached subtree blocks.
+
+    Returns the layout and the blocks of the subtrees in use, which the
+    caller passes back in on the next build.
+    """
+    # Couples become one unit, husband on the left
+    units: List[tuple] = []
+    unit_of: Dict[str, int] = {}
+    for member_id, member in graph.members.items():
+        if member_id in unit_of:
+            continue
+        unit = [member_id]
+        spouse_id = member.get("spouse_id")
+        if spouse_id in graph.members and spouse_id != member_id and spouse_id not in unit_of:
+            unit.append(spouse_id)
+            unit.sort(key=lambda unit_member: graph.members[unit_member].get("gender") != "male")
+        for unit_member in unit:
+            unit_of[unit_member] = len(units)
+        units.append(tuple(unit))
+
+    # Each unit hangs below the unit of its first member's first parent;
+    # siblings are ordered by birth date, then name
+    count = len(units)
+    children: List[List[int]] = [[] for _ in units]
+    tree_parent: List[Optional[int]] = [None] * count
+    sort_key: List[tuple] = []
+    for index, unit in enumerate(units):
+        link_id = unit[0]
+        for unit_member in unit:
+            parents = graph.parent_ids(unit_member)
+            if parents and unit_of[parents[0]] != index:
+                link_id = unit_member
+                tree_parent[index] = unit_of[parents[0]]
+                children[tree_parent[index]].append(index)
+                break
+        link = graph.members[link_id]
+        sort_key.append((link.get("birth_date") or "", link["name"], link_id))
+    for siblings in children:
+        siblings.sort(key=sort_key.__getitem__)
+
+    # Post-order walk from the roots. Units on a parent cycle are never
+    # reached that way; each is cut from its parent and becomes a root.
+    order: List[int] = []
+    visited = [False] * count
+
+    def walk(root: int):
+        visited[root] = True
+        stack = [(root, 0)]
+        while stack:
+            unit_index, next_child = stack[-1]
+            if next_child < len(children[unit_index]):
+                stack[-1] = (unit_index, next_child + 1)
+                child = children[unit_index][next_child]
+                if not visited[child]:
+                    visited[child] = True
+                    stack.append((child, 0))
+            else:
+                stack.pop()
+                order.append(unit_index)
+
+    roots = [index for index in range(count) if tree_parent[index] is None]
+    for root in roots:
+        walk(root)
+    for index in range(count):
+        if not visited[index]:
+            children[tree_parent[index]].remove(index)
+            tree_parent[index] = None
+            roots.append(index)
+            walk(index)
+
+    # A subtree's fingerprint covers its units and their order, which is
+    # everything its block depends on
+    fingerprint = [0] * count
+    used: Dict[int, dict] = {}
+
+    def build_blocks():
+        used.clear()
+        for index in order:
+            key = hash((units[index], tuple(fingerprint[child] for child in children[index])))
+            fingerprint[index] = key
+            if key not in used:
+                used[key] = blocks.get(key) or layout_block(
+                    len(units[index]), [used[fingerprint[child]] for child in children[index]])
+
+    unit_x = [0.0] * count
+    unit_row = [0] * count
+    root_of = [0] * count
+
+    def place() -> float:
+        x_offset = 0.0
+        for root in roots:
+            stack = [(root, x_offset, 0)]
+            while stack:
+                index, left, row = stack.pop()
+                block = used[fingerprint[index]]
+                unit_x[index] = left + block["unit_x"]
+                unit_row[index] = row
+                root_of[index] = root
+                stack.extend((child, left + offset, row + 1)
+                             for child, offset in zip(children[index], block["offsets"]))
+            x_offset += used[fingerprint[root]]["width"] + LAYOUT_FAMILY_GAP
+        return x_offset
+
+    # Largest trees first, left to right
+    build_blocks()
+    roots.sort(key=lambda root: (-used[fingerprint[root]]["size"], root))
+    x_offset = place()
+
+    # Parent links between units that aren't tree parent and child
+    extra_links: List[List[int]] = [[] for _ in units]
+    for index, unit in enumerate(units):
+        for unit_member in unit:
+            for parent_id in graph.parent_ids(unit_member):
+                parent_unit = unit_of[parent_id]
+                if parent_unit != index and parent_unit != tree_parent[index]:
+                    extra_links[index].append(parent_unit)
+                    extra_links[parent_unit].append(index)
+    groups = [roots, *(siblings for siblings in children if len(siblings) > 1)]
+
+    def link_length() -> float:
+        return sum(abs(unit_x[index] - unit_x[other]) for index in range(count) for other in extra_links[index])
+
+    def reorder(phase: List[List[int]]) -> bool:
+        """Sort each group by the mean x its subtrees' links pull towards"""
+        pull_sum = [0.0] * count
+        pull_count = [0] * count
+        for index in order:
+            pull_sum[index] = sum(unit_x[other] for other in extra_links[index]) + sum(
+                pull_sum[child] for child in children[index])
+            pull_count[index] = len(extra_links[index]) + sum(pull_count[child] for child in children[index])
+
+        def barycentre(index: int) -> tuple:
+            centre = pull_sum[index] / pull_count[index] if pull_count[index] else unit_x[index]
+            return centre, sort_key[index]
+        changed = False
+        for group in phase:
+            reordered = sorted(group, key=barycentre)
+            if reordered != group:
+                group[:] = reordered
+                changed = True
+        return changed
+
+    # Trees first, then siblings against the new tree order; the order
+    # with the shortest total link length wins
+    best_length, best_order = link_length(), [list(group) for group in groups]
+    for _ in range(LAYOUT_ORDER_SWEEPS if any(extra_links) else 0):
+        changed = False
+        for phase in (groups[:1], groups[1:]):
+            if reorder(phase):
+                changed = True
+                build_blocks()
+                x_offset = place()
+        if not changed:
+            break
+        length = link_length()
+        if length >= best_length:
+            for group, saved in zip(groups, best_order):
+                group[:] = saved
+            build_blocks()
+            x_offset = place()
+            break
+        best_length, best_order = length, [list(group) for group in groups]
+
+    # An in-law tree starts one row above the children it married into
+    foreign = {}
+    for root in roots:
+        linked = [unit_of[child_id] for unit_member in units[root]
+                  for child_id in graph.children.get(unit_member, {})
+                  if child_id in unit_of and root_of[unit_of[child_id]] != root]
+        if linked:
+            foreign[root] = linked
+    root_row = dict.fromkeys(roots, 0)
+    for _ in range(LAYOUT_MAX_ROUNDS):
+        changed = False
+        for root, linked in foreign.items():
+            wanted = max(0, min(root_row[root_of[index]] + unit_row[index] for index in linked) - 1)
+            if wanted != root_row[root]:
+                root_row[root] = wanted
+                changed = True
+        if not changed:
+            break
+
+    positions = {}
+    rows = 0
+    for index, unit in enumerate(units):
+        row = root_row[root_of[index]] + unit_row[index]
+        rows = max(rows, row + 1)
+        for offset, member_id in enumerate(unit):
+            positions[member_id] = {"x": unit_x[index] + offset * (LAYOUT_NODE_WIDTH + LAYOUT_NODE_GAP),
+                                    "y": row * (LAYOUT_NODE_HEIGHT + LAYOUT_RANK_GAP)}
+    layout = {
+        "positions": positions,
+        "width": max(x_offset - LAYOUT_FAMILY_GAP, 0),
+        "height": max(rows * (LAYOUT_NODE_HEIGHT + LAYOUT_RANK_GAP) - LAYOUT_RANK_GAP, 0),
+        "node_width": LAYOUT_NODE_WIDTH,
+        "node_height": LAYOUT_NODE_HEIGHT
+    }
+    return layout, used
+
+# ==================== FAMILY MUTATIONS ====================
+
+# Family tree writes touch several members at once (both spouses, every
+# child of a deleted parent). FamilyMutation collects them and writes
+# them as one ordered bulk_write, inside a transaction when the
+# deployment supports one. Updates that depend on another member's
+# current state carry that state in their filter, so a concurrent edit
+# makes them match nothing rather than overwrite it. The periodic
+# consistency check repairs whatever a failed write on a standalone
+# server leaves behind.
+FAMILY_CHECK_INTERVAL = float(os.environ.get('FAMILY_CHECK_INTERVAL', 3600))
+FAMILY_CHECK_LEASE = "family_check"
+
+class FamilyMutation:
+    """A batch of related `family_members` writes, mirrored onto the graph.
+
+    Each mirror step returns how many documents its write should have
+    matched. When MongoDB matched a different number, the graph had drifted
+    from the collection and is reloaded instead of patched.
+    """
+    transactions: Optional[bool] = None
+
+    def __init__(self, graph: FamilyGraph):
+        self.graph = graph
+        self.ops: list = []
+        self.steps: List[Callable[[FamilyGraph], int]] = []
+
+    @classmethod
+    async def supports_transactions(cls) -> bool:
+        """Replica sets and sharded clusters run transactions; standalone servers do not"""
+        if cls.transactions is None:
+            try:
+                hello = await client.admin.command("hello")
+                cls.transactions = "setName" in hello or hello.get("msg") == "isdbgrid"
+            except Exception:
+                cls.transactions = False
+        return cls.transactions
+
+    def require(self, member_id: str):
+        if member_id not in self.graph.members:
+            raise HTTPException(status_code=400, detail=f"Unknown family member: {member_id}")
+
+    def check_parent(self, member_id: str, parent_id: str):
+        """Reject missing parents and links that would make a member its own ancestor"""
+        self.require(parent_id)
+        if parent_id == member_id or member_id in self.graph.ancestry(parent_id):
+            raise HTTPException(status_code=400, detail="A member cannot be their own ancestor")
+
+    def insert(self, doc: dict):
+        self.ops.append(InsertOne(doc))
+
+        def step(graph: FamilyGraph) -> int:
+            graph.upsert(doc)
+            return 0
+        self.steps.append(step)
+
+    def set(self, member_id: str, fields: dict, expect: Optional[dict] = None):
+        """Set fields on a member, only while it still has the `expect` values.
+        An expected "" also matches a missing or null field."""
+        expect = expect or {}
+        self.ops.append(UpdateOne(
+            {"id": member_id, **{key: value or {"$in": ["", None]} for key, value in expect.items()}},
+            {"$set": fields}
+        ))
+
+        def step(graph: FamilyGraph) -> int:
+            member = graph.members.get(member_id)
+            if not member or any((member.get(key) or "") != value for key, value in expect.items()):
+                return 0
+            graph.patch(member_id, fields)
+            return 1
+        self.steps.append(step)
+
+    def divorce(self, member_id: str):
+        """Clear a member's spouse link on both sides"""
+        spouse_id = self.graph.members[member_id].get("spouse_id")
+        if spouse_id:
+            self.set(spouse_id, {"spouse_id": ""}, expect={"spouse_id": member_id})
+            self.set(member_id, {"spouse_id": ""})
+
+    def marry(self, member_id: str, spouse_id: str):
+        """Link two members as spouses, releasing any previous partners"""
+        self.require(member_id)
+        self.require(spouse_id)
+        if member_id == spouse_id:
+            raise HTTPException(status_code=400, detail="A member cannot be their own spouse")
+        for one, other in ((member_id, spouse_id), (spouse_id, member_id)):
+            previous = self.graph.members[one].get("spouse_id")
+            if previous and previous != other:
+                self.set(previous, {"spouse_id": ""}, expect={"spouse_id": one})
+        self.set(member_id, {"spouse_id": spouse_id})
+        self.set(spouse_id, {"spouse_id": member_id})
+
+    def delete(self, member_id: str):
+        """Delete a member and every reference to it"""
+        for key in ("father_id", "mother_id", "spouse_id"):
+            self.ops.append(UpdateMany({key: member_id}, {"$set": {key: ""}}))
+        self.ops.append(DeleteOne({"id": member_id}))
+
+        def step(graph: FamilyGraph) -> int:
+            member = graph.members.get(member_id)
+            if not member:
+                return 0
+            references = sum(graph.members[child_id].get(key) == member_id
+                             for child_id in graph.children.get(member_id, ()) if child_id in graph.members
+                             for key in ("father_id", "mother_id"))
+            spouse = graph.members.get(member.get("spouse_id"))
+            references += bool(spouse and spouse.get("spouse_id") == member_id)
+            graph.remove(member_id)
+            return references
+        self.steps.append(step)
+
+    async def commit(self):
+        if not self.ops:
+            return
+        if await self.supports_transactions():
+            async with await client.start_session() as session:
+                async def write(session):
+                    return await db.family_members.bulk_write(self.ops, ordered=True, session=session)
+                result = await session.with_transaction(write)
+        else:
+            result = await db.family_members.bulk_write(self.ops, ordered=True)
+
+        def mutate(graph: FamilyGraph) -> bool:
+            return sum(step(graph) for step in self.steps) == result.matched_count
+        await self.graph.apply(mutate)
+
+def find_family_repairs(members: Dict[str, dict]) -> tuple:
+    """Field fixes for dangling references, one-sided spouses and parent cycles.
+
+    Returns ({member_id: {field: new value}}, counts per kind of problem).
+    `members` is updated in place with the fixes.
+    """
+    fixes: Dict[str, dict] = defaultdict(dict)
+    counts = {"dangling": 0, "spouses": 0, "cycles": 0}
+
+    def fix(member_id: str, field: str, value: str, kind: str):
+        members[member_id][field] = value
+        fixes[member_id][field] = value
+        counts[kind] += 1
+
+    for member_id, member in members.items():
+        for field in ("father_id", "mother_id", "spouse_id"):
+            target = member.get(field) or ""
+            if target and (target not in members or target == member_id):
+                fix(member_id, field, "", "dangling")
+
+    for member_id, member in members.items():
+        spouse_id = member.get("spouse_id") or ""
+        if not spouse_id:
+            continue
+        partner = members[spouse_id].get("spouse_id") or ""
+        if partner == member_id:
+            continue
+        # Complete the link if the spouse is free, otherwise drop this side
+        if not partner:
+            fix(spouse_id, "spouse_id", member_id, "spouses")
+        else:
+            fix(member_id, "spouse_id", "", "spouses")
+
+    # Depth-first over parent links; a parent still on the stack closes a cycle
+    state: Dict[str, int] = {}
+    for start in members:
+        if start in state:
+            continue
+        stack = [(start, iter(("father_id", "mother_id")))]
+        state[start] = 1
+        while stack:
+            member_id, fields = stack[-1]
+            field = next(fields, None)
+            if field is None:
+                state[member_id] = 2
+                stack.pop()
+                continue
+            parent_id = members[member_id].get(field) or ""
+            if not parent_id:
+                continue
+            if state.get(parent_id) == 1:
+                fix(member_id, field, "", "cycles")
+            elif parent_id not in state:
+                state[parent_id] = 1
+                stack.append((parent_id, iter(("father_id", "mother_id"))))
+    return dict(fixes), counts
+
+async def check_family_consistency() -> dict:
+    """Find and repair broken references across the whole family tree"""
+    projection = {"_id": 0, "id": 1, "father_id": 1, "mother_id": 1, "spouse_id": 1}
+    members = {member["id"]: member async for member in db.family_members.find({}, projection)}
+    original = {member_id: dict(member) for member_id, member in members.items()}
+    fixes, counts = find_family_repairs(members)
+    # Each fix only applies if the member still has the value it was judged on
+    ops = [UpdateOne({"id": member_id, **{field: original[member_id].get(field) or {"$in": ["", None]}
+                                          for field in fields}},
+                     {"$set": fields})
+           for member_id, fields in fixes.items()]
+    repaired = 0
+    for start in range(0, len(ops), IMPORT_BATCH_SIZE):
+        result = await db.family_members.bulk_write(ops[start:start + IMPORT_BATCH_SIZE], ordered=False)
+        repaired += result.modified_count
+    if repaired:
+        await family_graph.invalidate()
+    report = {**counts, "repaired": repaired, "checked": len(members),
+              "checked_at": datetime.now(timezone.utc).isoformat()}
+    if ops:
+        logger.warning("Family consistency check repaired %s members: %s", repaired, counts)
+    return report
+
+async def claim_lease(name: str, seconds: float) -> bool:
+    """Whether this worker holds the named lease for the next `seconds`"""
+    now = datetime.now(timezone.utc)
+    try:
+        await db.counters.find_one_and_update(
+            {"_id": name, "$or": [{"lease_until": {"$lt": now}}, {"lease_until": {"$exists": False}}]},
+            {"$set": {"lease_until": now + timedelta(seconds=seconds)}},
+            upsert=True
+        )
+    except DuplicateKeyError:
+        # Another worker holds an unexpired lease
+        return False
+    return True
+
+async def family_check_loop():
+    while True:
+        await asyncio.sleep(FAMILY_CHECK_INTERVAL)
+        try:
+            if await claim_lease(FAMILY_CHECK_LEASE, FAMILY_CHECK_INTERVAL * 0.9):
+                await check_family_consistency()
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            logger.exception("Family consistency check failed")
+
+# ==================== FAMILY TREE IMPORT / EXPORT ====================
+
+# Imports are spooled to a temporary file and then read twice: the first
+# pass assigns ids and collects parent/spouse references, the second
+# builds documents with those references resolved and writes them in
+# ordered bulk_write batches. Only the reference maps are held in memory.
+IMPORT_BATCH_SIZE = int(os.environ.get('IMPORT_BATCH_SIZE', 1000))
+IMPORT_FORMATS = ("ndjson", "gedcom")
+MAX_IMPORT_ERRORS = 50
+
+def name_key(name: str) -> str:
+    return " ".join((name or "").split()).lower()
+
+def gedcom_records(lines):
+    """Yield (xref, tag, [(level, tag, value)]) for each level-0 GEDCOM record"""
+    record = None
+    for raw in lines:
+        parts = raw.strip().split(" ", 2)
+        if not parts[0].isdigit():
+            continue
+        level = int(parts[0])
+        if level == 0:
+            if record:
+                yield record
+            if len(parts) > 1 and parts[1].startswith("@"):
+                record = (parts[1].strip("@"), parts[2].strip() if len(parts) > 2 else "", [])
+            else:
+                record = (None, parts[1] if len(parts) > 1 else "", [])
+        elif record and len(parts) > 1:
+            record[2].append((level, parts[1], parts[2] if len(parts) > 2 else ""))
+    if record:
+        yield record
+
+GEDCOM_SEX = {"M": "male", "F": "female"}
+
+def gedcom_person(fields: List[tuple]) -> dict:
+    """FamilyMemberCreate fields from the lines of an INDI record"""
+    person = {"name": "", "gender": "unknown"}
+    event = None
+    for level, tag, value in fields:
+        if level == 1:
+            event = tag
+            if tag == "NAME" and not person["name"]:
+                person["name"] = " ".join(value.replace("/", " ").split())
+            elif tag == "SEX":
+                person["gender"] = GEDCOM_SEX.get(value.strip().upper()[:1], "unknown")
+            elif tag == "NOTE":
+                person["bio"] = value
+        elif level == 2 and tag == "DATE" and event in ("BIRT", "DEAT"):
+            person["birth_date" if event == "BIRT" else "death_date"] = value
+        elif level == 2 and tag == "FILE" and event == "OBJE":
+            person["photo_url"] = value
+        elif level == 2 and tag in ("CONC", "CONT") and event == "NOTE":
+            person["bio"] = person.get("bio", "") + ("\n" if tag == "CONT" else "") + value
+    return person
+
+def read_import_records(path: str, fmt: str):
+    """Yield (ref, fields, error) per person; GEDCOM families as ("FAM", record)"""
+    with open(path, encoding="utf-8-sig", errors="replace") as f:
+        if fmt == "ndjson":
+            for line_number, line in enumerate(f, 1):
+                if not line.strip():
+                    continue
+                try:
+                    record = json.loads(line)
+                    if not isinstance(record, dict):
+                        raise ValueError("not an object")
+                except ValueError as e:
+                    yield f"line:{line_number}", None, f"line {line_number}: {e}"
+                    continue
+                yield str(record.get("id") or f"line:{line_number}"), record, None
+        else:
+            for xref, tag, fields in gedcom_records(f):
+                if tag == "INDI" and xref:
+                    yield xref, gedcom_person(fields), None
+                elif tag == "FAM":
+                    yield "FAM", fields, None
+
+class FamilyImport:
+    """One bulk import of family members, with its progress in `import_jobs`"""
+    def __init__(self, job_id: str, path: str, fmt: str, user_id: str):
+        self.job_id = job_id
+        self.path = path
+        self.fmt = fmt
+        self.user_id = user_id
+        self.ids: Dict[str, str] = {}        # file ref -> member id
+        self.merged: Set[str] = set()        # refs matched to existing members
+        self.current: Dict[str, dict] = {}   # merged member id -> its links before the import
+        self.parents: Dict[str, tuple] = {}  # GEDCOM child ref -> (father ref, mother ref)
+        self.spouses: Dict[str, str] = {}    # ref -> spouse ref
+        self.errors: List[str] = []
+        self.error_count = 0
+        self.unresolved = 0
+
+    def error(self, message: str):
+        self.error_count += 1
+        if len(self.errors) < MAX_IMPORT_ERRORS:
+            self.errors.append(message)
+
+    def resolve(self, ref: Optional[str]) -> str:
+        if not ref:
+            return ""
+        ref = str(ref)
+        if ref in self.ids:
+            return self.ids[ref]
+        if ref in family_graph.members:
+            return ref
+        self.unresolved += 1
+        return ""
+
+    def scan_family(self, fields: List[tuple]):
+        roles = {tag: value.strip("@ ") for _, tag, value in fields if tag in ("HUSB", "WIFE")}
+        husband, wife = roles.get("HUSB"), roles.get("WIFE")
+        if husband and wife:
+            self.spouses.setdefault(husband, wife)
+            self.spouses.setdefault(wife, husband)
+        for _, tag, value in fields:
+            if tag == "CHIL":
+                self.parents[value.strip("@ ")] = (husband, wife)
+
+    def scan(self, existing: Dict[str, str]):
+        """First pass: ids for every person, and the reference maps.
+
+        `existing` maps name keys of members already in the tree to their ids.
+        """
+        for ref, fields, error in read_import_records(self.path, self.fmt):
+            if error:
+                continue
+            if ref == "FAM":
+                self.scan_family(fields)
+                continue
+            if ref in self.ids:
+                # Repeated id: the first record wins, the rest are reported
+                continue
+            match = existing.get(name_key(fields.get("name", "")))
+            if match:
+                self.ids[ref] = match
+                self.merged.add(ref)
+            else:
+                self.ids[ref] = str(uuid.uuid4())
+            spouse = fields.get("spouse_id")
+            if spouse:
+                self.spouses.setdefault(ref, str(spouse))
+                self.spouses.setdefault(str(spouse), ref)
+
+    def links(self, ref: str, fields: dict) -> Dict[str, str]:
+        if self.fmt == "gedcom":
+            father, mother = self.parents.get(ref, (None, None))
+        else:
+            father, mother = fields.get("father_id"), fields.get("mother_id")
+        return {
+            "father_id": self.resolve(father),
+            "mother_id": self.resolve(mother),
+            "spouse_id": self.resolve(self.spouses.get(ref))
+        }
+
+    def link_existing(self, ref: str, fields: dict) -> List[UpdateOne]:
+        """Links a record brings to the member it was merged into. They fill
+        empty fields; one that disagrees with a link already set is counted
+        as unresolved."""
+        member_id = self.ids[ref]
+        current = self.current.get(member_id, {})
+        updates = []
+        for field, value in self.links(ref, fields).items():
+            if not value or value == member_id or current.get(field) == value:
+                continue
+            if current.get(field):
+                self.unresolved += 1
+                continue
+            updates.append(UpdateOne({"id": member_id, field: {"$in": ["", None]}}, {"$set": {field: value}}))
+        return updates
+
+    def build(self, ref: str, fields: dict, now: str) -> dict:
+        member = FamilyMemberCreate(**{k: v for k, v in fields.items() if k in FamilyMemberCreate.model_fields
+                                       and k not in ("father_id", "mother_id", "spouse_id")})
+        if not member.name.strip():
+            raise ValueError("name is required")
+        return {
+            "id": self.ids[ref],
+            "name": member.name,
+            "name_key": name_key(member.name),
+            "gender": member.gender or "unknown",
+            "birth_date": member.birth_date or "",
+            "death_date": member.death_date or "",
+            **self.links(ref, fields),
+            "bio": member.bio or "",
+            "photo_url": member.photo_url or "",
+            "created_by": self.user_id,
+            "created_at": now
+        }
+
+    def read_batch(self, records, now: str, written: Set[str]) -> Tuple[List[dict], List[UpdateOne]]:
+        """Second pass, run in a worker thread like `scan`: up to
+        IMPORT_BATCH_SIZE new members, plus link updates for merged ones"""
+        docs, links = [], []
+        for ref, fields, error in records:
+            if error:
+                self.error(error)
+                continue
+            if ref == "FAM":
+                continue
+            if ref in written:
+                if ref not in self.merged:
+                    self.error(f"{ref}: duplicate id")
+                continue
+            written.add(ref)
+            if ref in self.merged:
+                links.extend(self.link_existing(ref, fields))
+                continue
+            try:
+                docs.append(self.build(ref, fields, now))
+            except ValidationError as e:
+                self.error(f"{ref}: {e.errors()[0]['loc'][0]}: {e.errors()[0]['msg']}")
+                continue
+            except ValueError as e:
+                self.error(f"{ref}: {e}")
+                continue
+            if len(docs) >= IMPORT_BATCH_SIZE:
+                break
+        return docs, links
+
+    async def write(self, docs: List[dict]):
+        entries = [search_upsert("member", doc) for doc in docs]
+        await db.family_members.bulk_write([InsertOne(doc) for doc in docs], ordered=True)
+        await db.search_index.bulk_write(entries, ordered=False)
+
+    async def progress(self, **fields):
+        await db.import_jobs.update_one({"id": self.job_id}, {"$set": fields})
+
+    async def run(self):
+        try:
+            await family_graph.refresh()
+            existing = {name_key(member["name"]): member_id for member_id, member in family_graph.members.items()}
+            await asyncio.to_thread(self.scan, existing)
+            self.current = {
+                self.ids[ref]: {field: family_graph.members[self.ids[ref]].get(field, "")
+                                for field in ("father_id", "mother_id", "spouse_id")}
+                for ref in self.merged if self.ids[ref] in family_graph.members
+            }
+            total = len(self.ids) - len(self.merged)
+            await self.progress(total=total, merged=len(self.merged))
+
+            imported = 0
+            merged_links = []
+            now = datetime.now(timezone.utc).isoformat()
+            written = set()
+            records = read_import_records(self.path, self.fmt)
+            while True:
+                batch, links = await asyncio.to_thread(self.read_batch, records, now, written)
+                merged_links.extend(links)
+                if batch:
+                    await self.write(batch)
+                    imported += len(batch)
+                    await self.progress(imported=imported, error_count=self.error_count)
+                if len(batch) < IMPORT_BATCH_SIZE:
+                    break
+            # Merged members are linked once everyone they may point at exists
+            if merged_links:
+                await db.family_members.bulk_write(merged_links, ordered=False)
+            await family_graph.invalidate()
+            await self.progress(
+                status="done", imported=imported, unresolved=self.unresolved,
+                errors=self.errors, error_count=self.error_count,
+                finished_at=datetime.now(timezone.utc).isoformat()
+            )
+        except Exception as e:
+            logger.exception("Family import %s failed", self.job_id)
+            await family_graph.invalidate()
+            await self.progress(status="failed", detail=str(e), errors=self.errors,
+                                finished_at=datetime.now(timezone.utc).isoformat())
+        finally:
+            os.unlink(self.path)
+
+# Running imports, kept referenced until they finish
+import_tasks: Set[asyncio.Task] = set()
+
+@api_router.post("/family-members/import", status_code=202)
+async def import_family_members(request: Request, format: str = Query("ndjson"), user_id: str = Depends(get_current_user)):
+    """Bulk-import family members from a GEDCOM or NDJSON request body.
+
+    NDJSON lines are FamilyMemberCreate objects with an optional `id`, and
+    father_id/mother_id/spouse_id may name other lines' ids or existing
+    members. People whose name matches an existing member are linked to
+    that member rather than duplicated. The import runs in the background;
+    poll the returned job for progress.
+    """
+    if format not in IMPORT_FORMATS:
+        raise HTTPException(status_code=400, detail=f"format must be one of {', '.join(IMPORT_FORMATS)}")
+    with tempfile.NamedTemporaryFile(prefix="family-import-", delete=False) as spool:
+        async for chunk in request.stream():
+            spool.write(chunk)
+    job = {
+        "id": str(uuid.uuid4()),
+        "format": format,
+        "status": "running",
+        "created_by": user_id,
+        "total": None,
+        "imported": 0,
+        "merged": 0,
+        "error_count": 0,
+        "started_at": datetime.now(timezone.utc).isoformat()
+    }
+    await db.import_jobs.insert_one(job)
+    job.pop("_id", None)
+    task = asyncio.create_task(FamilyImport(job["id"], spool.name, format, user_id).run())
+    import_tasks.add(task)
+    task.add_done_callback(import_tasks.discard)
+    return job
+
+@api_router.get("/family-members/import/{job_id}")
+async def get_import_job(job_id: str, user_id: str = Depends(get_current_user)):
+    """Progress of a bulk import"""
+    job = await db.import_jobs.find_one({"id": job_id}, {"_id": 0})
+    if not job:
+        raise HTTPException(status_code=404, detail="Import job not found")
+    return job
+
+def gedcom_lines(members: List[dict]):
+    """GEDCOM 5.5.1 records for the given members and their families"""
+    xrefs = {member["id"]: f"@I{index}@" for index, member in enumerate(members, 1)}
+    families: Dict[tuple, List[str]] = {}
+    for member in members:
+        parents = (xrefs.get(member.get("father_id")), xrefs.get(member.get("mother_id")))
+        if parents != (None, None):
+            families.setdefault(parents, []).append(xrefs[member["id"]])
+    for member in members:
+        spouse = xrefs.get(member.get("spouse_id"))
+        if spouse:
+            own = xrefs[member["id"]]
+            husband, wife = (spouse, own) if member.get("gender") == "female" else (own, spouse)
+            if (husband, wife) not in families and (wife, husband) not in families:
+                families[(husband, wife)] = []
 
-# ==================== INDUSTRY-STANDARD FAMILY TREE APIs ====================
+    yield "0 HEAD\n1 SOUR KULIKARAI\n1 GEDC\n2 VERS 5.5.1\n2 FORM LINEAGE-LINKED\n1 CHAR UTF-8\n"
+    spouse_families: Dict[str, List[str]] = defaultdict(list)
+    child_families: Dict[str, str] = {}
+    family_xrefs = {}
+    for index, (parents, children) in enumerate(families.items(), 1):
+        family_xrefs[parents] = f"@F{index}@"
+        for parent in parents:
+            if parent:
+                spouse_families[parent].append(family_xrefs[parents])
+        for child in children:
+            child_families[child] = family_xrefs[parents]
+    for member in members:
+        xref = xrefs[member["id"]]
+        lines = [f"0 {xref} INDI", f"1 NAME {member['name']}"]
+        sex = {"male": "M", "female": "F"}.get(member.get("gender"))
+        if sex:
+            lines.append(f"1 SEX {sex}")
+        if member.get("birth_date"):
+            lines += ["1 BIRT", f"2 DATE {member['birth_date']}"]
+        if member.get("death_date"):
+            lines += ["1 DEAT", f"2 DATE {member['death_date']}"]
+        if member.get("bio"):
+            bio_lines = member["bio"].splitlines() or [""]
+            lines.append(f"1 NOTE {bio_lines[0]}")
+            lines += [f"2 CONT {line}" for line in bio_lines[1:]]
+        if member.get("photo_url") and not member["photo_url"].startswith("data:"):
+            lines += ["1 OBJE", f"2 FILE {member['photo_url']}"]
+        if xref in child_families:
+            lines.append(f"1 FAMC {child_families[xref]}")
+        lines += [f"1 FAMS {family}" for family in spouse_families.get(xref, ())]
+        yield "\n".join(lines) + "\n"
+    for (husband, wife), children in families.items():
+        lines = [f"0 {family_xrefs[(husband, wife)]} FAM"]
+        if husband:
+            lines.append(f"1 HUSB {husband}")
+        if wife:
+            lines.append(f"1 WIFE {wife}")
+        lines += [f"1 CHIL {child}" for child in children]
+        yield "\n".join(lines) + "\n"
+    yield "0 TRLR\n"
+
+@api_router.get("/family-members/export")
+async def export_family_members(format: str = Query("ndjson"), user_id: str = Depends(get_current_user)):
+    """Stream the whole family tree as NDJSON or GEDCOM"""
+    if format not in IMPORT_FORMATS:
+        raise HTTPException(status_code=400, detail=f"format must be one of {', '.join(IMPORT_FORMATS)}")
+    await family_graph.refresh()
+    members = list(family_graph.members.values())
+
+    if format == "ndjson":
+        async def body():
+            for start in range(0, len(members), IMPORT_BATCH_SIZE):
+                yield "".join(json.dumps(member) + "\n" for member in members[start:start + IMPORT_BATCH_SIZE])
+        media_type, extension = "application/x-ndjson", "ndjson"
+    else:
+        async def body():
+            lines = []
+            for line in gedcom_lines(members):
+                lines.append(line)
+                if len(lines) >= IMPORT_BATCH_SIZE:
+                    yield "".join(lines)
+                    lines = []
+            yield "".join(lines)
+        media_type, extension = "text/x-gedcom", "ged"
+    return StreamingResponse(body(), media_type=media_type, headers={
+        "Content-Disposition": f'attachment; filename="family-tree.{extension}"'
+    })
 
 @api_router.get("/family-members")
-async def get_all_family_members(user_id: str = Depends(get_current_user)):
-    """Get all family members with proper hierarchical structure"""
-    members = await db.family_members.find({}, {"_id": 0}).to_list(1000)
+async def get_all_family_members(page: Page = Depends(page_params(MAX_PAGE_SIZE)), user_id: str = Depends(get_current_user)):
+    """Get family members in creation order, a page at a time"""
+    members = await page.fetch(db.family_members, {}, "created_at", ASCENDING)
     return {"members": members}
 
 @api_router.post("/family-members")
 async def create_family_member(member: FamilyMemberCreate, user_id: str = Depends(get_current_user)):
     """Create a new family member with proper parent/spouse IDs"""
     # Check for duplicate by name (case-insensitive)
-    existing = await db.family_members.find_one(
-        {"name": {"$regex": f"^{member.name}$", "$options": "i"}},
-        {"_id": 0}
-    )
+    existing = await db.family_members.find_one({"name_key": name_key(member.name)}, {"_id": 0, "id": 1})
     if existing:
         raise HTTPException(status_code=400, detail=f"A family member named '{member.name}' already exists")
     
+    await family_graph.refresh()
+    mutation = FamilyMutation(family_graph)
     member_id = str(uuid.uuid4())
+    for parent_id in (member.father_id, member.mother_id):
+        if parent_id:
+            mutation.require(parent_id)
+    if member.spouse_id:
+        mutation.require(member.spouse_id)
+        if family_graph.members[member.spouse_id].get("spouse_id"):
+            raise HTTPException(status_code=400, detail="The chosen spouse is already linked to someone else")
     member_doc = {
         "id": member_id,
         "name": member.name,
+        "name_key": name_key(member.name),
         "gender": member.gender or "unknown",
         "birth_date": member.birth_date or "",
         "death_date": member.death_date or "",
@@ -457,214 +3235,135 @@ async def create_family_member(member: FamilyMemberCreate, user_id: str = Depend
         "created_at": datetime.now(timezone.utc).isoformat()
     }
     
-    await db.family_members.insert_one(member_doc)
-    
-    # If spouse_id is set, update the spouse's spouse_id to this member
+    mutation.insert(member_doc)
     if member.spouse_id:
-        await db.family_members.update_one(
-            {"id": member.spouse_id, "spouse_id": ""},
-            {"$set": {"spouse_id": member_id}}
-        )
+        mutation.set(member.spouse_id, {"spouse_id": member_id}, expect={"spouse_id": ""})
+    await mutation.commit()
+    await index_for_search("member", member_doc)
     
     return {"message": "Family member created", "member": {k: v for k, v in member_doc.items() if k != "_id"}}
 
 @api_router.get("/family-members/{member_id}")
-async def get_family_member(member_id: str, user_id: str = Depends(get_current_user)):
-    """Get a specific family member with derived relationships"""
-    member = await db.family_members.find_one({"id": member_id}, {"_id": 0})
+async def get_family_member(
+    member_id: str,
+    depth: int = Query(0, ge=0, le=20),
+    user_id: str = Depends(get_current_user)
+):
+    """Get a specific family member with derived relationships.
+
+    With `depth`, ancestors and descendants up to that many generations away
+    are included as well.
+    """
+    await family_graph.refresh()
+    member = family_graph.members.get(member_id)
     if not member:
         raise HTTPException(status_code=404, detail="Family member not found")
     
-    # Get derived relationships
-    children = await db.family_members.find(
-        {"$or": [{"father_id": member_id}, {"mother_id": member_id}]},
-        {"_id": 0, "id": 1, "name": 1, "gender": 1}
-    ).to_list(100)
-    
-    siblings = []
-    if member.get("father_id") or member.get("mother_id"):
-        sibling_query = {"id": {"$ne": member_id}}
-        if member.get("father_id"):
-            sibling_query["$or"] = [{"father_id": member["father_id"]}]
-        if member.get("mother_id"):
-            if "$or" in sibling_query:
-                sibling_query["$or"].append({"mother_id": member["mother_id"]})
-            else:
-                sibling_query["$or"] = [{"mother_id": member["mother_id"]}]
-        siblings = await db.family_members.find(sibling_query, {"_id": 0, "id": 1, "name": 1, "gender": 1}).to_list(100)
-    
-    # Get parents
-    father = None
-    mother = None
-    spouse = None
-    if member.get("father_id"):
-        father = await db.family_members.find_one({"id": member["father_id"]}, {"_id": 0, "id": 1, "name": 1, "gender": 1})
-    if member.get("mother_id"):
-        mother = await db.family_members.find_one({"id": member["mother_id"]}, {"_id": 0, "id": 1, "name": 1, "gender": 1})
-    if member.get("spouse_id"):
-        spouse = await db.family_members.find_one({"id": member["spouse_id"]}, {"_id": 0, "id": 1, "name": 1, "gender": 1})
-    
-    member["derived_relations"] = {
-        "father": father,
-        "mother": mother,
-        "spouse": spouse,
-        "children": children,
-        "siblings": siblings
-    }
+    member = dict(member)
+    member["derived_relations"] = family_graph.derived_relations(member_id)
+    if depth:
+        member["ancestors"] = family_graph.ancestors(member_id, depth)
+        member["descendants"] = family_graph.descendants(member_id, depth)
     
     return member
 
+@api_router.get("/family-members/{member_id}/relation/{other_id}")
+async def get_relation(
+    member_id: str,
+    other_id: str,
+    response: Response,
+    user_id: str = Depends(get_current_user)
+):
+    """Name how `other_id` is related to `member_id` and the path between them"""
+    await family_graph.refresh()
+    for requested in (member_id, other_id):
+        if requested not in family_graph.members:
+            raise HTTPException(status_code=404, detail="Family member not found")
+    started = time.perf_counter()
+    result = kinship(family_graph, member_id, other_id)
+    response.headers["Server-Timing"] = f"kinship;dur={(time.perf_counter() - started) * 1000:.3f}"
+    return result
+
 @api_router.put("/family-members/{member_id}")
 async def update_family_member(member_id: str, update: FamilyMemberUpdate, user_id: str = Depends(get_current_user)):
     """Update a family member's information"""
-    member = await db.family_members.find_one({"id": member_id}, {"_id": 0})
+    await family_graph.refresh()
+    member = family_graph.members.get(member_id)
     if not member:
         raise HTTPException(status_code=404, detail="Family member not found")
+    member = dict(member)
     
     update_data = {k: v for k, v in update.model_dump().items() if v is not None}
+    if "name" in update_data:
+        update_data["name_key"] = name_key(update_data["name"])
     
+    mutation = FamilyMutation(family_graph)
+    for key in ("father_id", "mother_id"):
+        if update_data.get(key):
+            mutation.check_parent(member_id, update_data[key])
     # Handle spouse relationship bidirectionally
-    if "spouse_id" in update_data:
-        new_spouse_id = update_data["spouse_id"]
-        old_spouse_id = member.get("spouse_id")
-        
-        # Remove this member as spouse from old spouse
-        if old_spouse_id and old_spouse_id != new_spouse_id:
-            await db.family_members.update_one(
-                {"id": old_spouse_id},
-                {"$set": {"spouse_id": ""}}
-            )
-        
-        # Set this member as spouse of new spouse
+    new_spouse_id = update_data.pop("spouse_id", None)
+    if new_spouse_id is not None and new_spouse_id != member.get("spouse_id"):
         if new_spouse_id:
-            await db.family_members.update_one(
-                {"id": new_spouse_id},
-                {"$set": {"spouse_id": member_id}}
-            )
-    
+            mutation.marry(member_id, new_spouse_id)
+        else:
+            mutation.divorce(member_id)
     if update_data:
-        await db.family_members.update_one({"id": member_id}, {"$set": update_data})
+        mutation.set(member_id, update_data)
+    await mutation.commit()
+    if "name" in update_data or "birth_date" in update_data:
+        await index_for_search("member", {**member, **update_data})
     
     return {"message": "Family member updated"}
 
 @api_router.delete("/family-members/{member_id}")
 async def delete_family_member(member_id: str, user_id: str = Depends(get_current_user)):
     """Delete a family member and clean up references"""
-    member = await db.family_members.find_one({"id": member_id}, {"_id": 0})
-    if not member:
+    await family_graph.refresh()
+    if member_id not in family_graph.members:
         raise HTTPException(status_code=404, detail="Family member not found")
     
-    # Remove this member as parent from all children
-    await db.family_members.update_many(
-        {"father_id": member_id},
-        {"$set": {"father_id": ""}}
-    )
-    await db.family_members.update_many(
-        {"mother_id": member_id},
-        {"$set": {"mother_id": ""}}
-    )
-    
-    # Remove this member as spouse
-    if member.get("spouse_id"):
-        await db.family_members.update_one(
-            {"id": member["spouse_id"]},
-            {"$set": {"spouse_id": ""}}
-        )
-    
-    await db.family_members.delete_one({"id": member_id})
+    mutation = FamilyMutation(family_graph)
+    mutation.delete(member_id)
+    await mutation.commit()
+    await remove_from_search("member", member_id)
     return {"message": "Family member deleted"}
 
 @api_router.get("/family-tree-hierarchical")
-async def get_family_tree_hierarchical(user_id: str = Depends(get_current_user)):
-    """Get family tree in hierarchical format optimized for visualization"""
-    members = await db.family_members.find({}, {"_id": 0}).to_list(1000)
-    
-    # Create lookup maps
-    members_map = {m["id"]: m for m in members}
-    
-    # Find root members (those without parents in the tree)
-    root_members = [m for m in members if not m.get("father_id") and not m.get("mother_id")]
-    
-    # Build nodes and edges for react-flow
-    nodes = []
-    edges = []
-    processed_couples = set()
-    
-    for member in members:
-        # Create node for each member
-        nodes.append({
-            "id": member["id"],
-            "data": {
-                "name": member["name"],
-                "gender": member.get("gender", "unknown"),
-                "birth_date": member.get("birth_date", ""),
-                "death_date": member.get("death_date", ""),
-                "photo_url": member.get("photo_url", ""),
-                "spouse_id": member.get("spouse_id", ""),
-                "father_id": member.get("father_id", ""),
-                "mother_id": member.get("mother_id", "")
-            }
-        })
-        
-        # Create parent-child edges
-        if member.get("father_id"):
-            edges.append({
-                "id": f"father-{member['father_id']}-{member['id']}",
-                "source": member["father_id"],
-                "target": member["id"],
-                "type": "parent-child",
-                "label": "Father"
-            })
-        
-        if member.get("mother_id"):
-            edges.append({
-                "id": f"mother-{member['mother_id']}-{member['id']}",
-                "source": member["mother_id"],
-                "target": member["id"],
-                "type": "parent-child",
-                "label": "Mother"
-            })
-        
-        # Create spouse edges (only once per couple)
-        if member.get("spouse_id"):
-            couple_key = tuple(sorted([member["id"], member["spouse_id"]]))
-            if couple_key not in processed_couples:
-                processed_couples.add(couple_key)
-                edges.append({
-                    "id": f"spouse-{member['id']}-{member['spouse_id']}",
-                    "source": member["id"],
-                    "target": member["spouse_id"],
-                    "type": "spouse",
-                    "label": "Spouse"
-                })
-    
-    # Calculate generations
-    def get_generation(member_id, cache={}):
-        if member_id in cache:
-            return cache[member_id]
-        member = members_map.get(member_id)
-        if not member:
-            return 0
-        father_gen = get_generation(member.get("father_id"), cache) if member.get("father_id") else -1
-        mother_gen = get_generation(member.get("mother_id"), cache) if member.get("mother_id") else -1
-        gen = max(father_gen, mother_gen) + 1
-        cache[member_id] = gen
-        return gen
-    
-    generations = {}
-    for member in members:
-        gen = get_generation(member["id"])
-        if gen not in generations:
-            generations[gen] = []
-        generations[gen].append(member["id"])
-    
-    return {
-        "nodes": nodes,
-        "edges": edges,
-        "generations": generations,
-        "root_members": [m["id"] for m in root_members],
-        "total_members": len(members)
-    }
+async def get_family_tree_hierarchical(
+    root_id: Optional[str] = Query(None, description="Focus on this member and its relatives"),
+    up: int = Query(2, ge=0, le=50, description="Ancestor generations around root_id"),
+    down: int = Query(2, ge=0, le=50, description="Descendant generations around root_id"),
+    bbox: Optional[str] = Query(None, description="x0,y0,x1,y1 in layout coordinates"),
+    limit: int = Query(MAX_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    user_id: str = Depends(get_current_user)
+):
+    """Get family tree in hierarchical format optimized for visualization.
+
+    Without `root_id` or `bbox` the whole tree is returned. With either,
+    only that part is returned, and nodes carry `has_more` markers for
+    relatives that were left out.
+    """
+    await family_graph.refresh()
+    if root_id is None and bbox is None:
+        return Response(content=await family_graph.snapshot_body(), media_type="application/json")
+    box = None
+    if bbox is not None:
+        try:
+            box = tuple(float(value) for value in bbox.split(","))
+        except ValueError:
+            box = ()
+        if len(box) != 4 or box[0] > box[2] or box[1] > box[3]:
+            raise HTTPException(status_code=400, detail="bbox must be x0,y0,x1,y1")
+    subgraph = await family_graph.subgraph(root_id, up, down, box, limit)
+    if subgraph is None:
+        raise HTTPException(status_code=404, detail="Family member not found")
+    return subgraph
+
+@api_router.post("/family-members/check")
+async def run_family_check(user_id: str = Depends(get_current_user)):
+    """Run the consistency check now and report what it repaired"""
+    return await check_family_consistency()
 
 @api_router.post("/family-members/link-spouse")
 async def link_spouse(data: dict, user_id: str = Depends(get_current_user)):
@@ -675,15 +3374,13 @@ async def link_spouse(data: dict, user_id: str = Depends(get_current_user)):
     if not member1_id or not member2_id:
         raise HTTPException(status_code=400, detail="Both member IDs are required")
     
-    member1 = await db.family_members.find_one({"id": member1_id}, {"_id": 0})
-    member2 = await db.family_members.find_one({"id": member2_id}, {"_id": 0})
-    
-    if not member1 or not member2:
+    await family_graph.refresh()
+    if member1_id not in family_graph.members or member2_id not in family_graph.members:
         raise HTTPException(status_code=404, detail="One or both members not found")
     
-    # Update both members
-    await db.family_members.update_one({"id": member1_id}, {"$set": {"spouse_id": member2_id}})
-    await db.family_members.update_one({"id": member2_id}, {"$set": {"spouse_id": member1_id}})
+    mutation = FamilyMutation(family_graph)
+    mutation.marry(member1_id, member2_id)
+    await mutation.commit()
     
     return {"message": "Spouses linked successfully"}
 
@@ -697,32 +3394,34 @@ async def set_parents(data: dict, user_id: str = Depends(get_current_user)):
     if not member_id:
         raise HTTPException(status_code=400, detail="Member ID is required")
     
-    member = await db.family_members.find_one({"id": member_id}, {"_id": 0})
-    if not member:
+    await family_graph.refresh()
+    if member_id not in family_graph.members:
         raise HTTPException(status_code=404, detail="Member not found")
     
+    mutation = FamilyMutation(family_graph)
     update_data = {}
-    if father_id is not None:
-        update_data["father_id"] = father_id
-    if mother_id is not None:
-        update_data["mother_id"] = mother_id
+    for key, parent_id in (("father_id", father_id), ("mother_id", mother_id)):
+        if parent_id is not None:
+            if parent_id:
+                mutation.check_parent(member_id, parent_id)
+            update_data[key] = parent_id
     
     if update_data:
-        await db.family_members.update_one({"id": member_id}, {"$set": update_data})
+        mutation.set(member_id, update_data)
+        await mutation.commit()
     
     return {"message": "Parents updated successfully"}
 
 # ==================== WELL DONE / APPRECIATION endpoints ====================
 
 @api_router.post("/well-done")
-async def create_well_done(post_data: dict, user_id: str = Depends(get_current_user)):
+async def create_well_done(post_data: dict, user_id: str = Depends(get_current_user), user_name: str = Depends(get_current_user_name)):
     """Create a Well Done appreciation post"""
     post_id = str(uuid.uuid4())
-    user = await db.users.find_one({"id": user_id}, {"_id": 0, "name": 1})
     post_doc = {
         "id": post_id,
         "user_id": user_id,
-        "user_name": user.get("name", "Unknown") if user else "Unknown",
+        "user_name": user_name,
         "recipient_name": post_data.get("recipient_name"),
         "title": post_data.get("title"),
         "description": post_data.get("description"),
@@ -730,12 +3429,14 @@ async def create_well_done(post_data: dict, user_id: str = Depends(get_current_u
         "created_at": datetime.now(timezone.utc).isoformat()
     }
     await db.well_done.insert_one(post_doc)
+    post_doc.pop("_id", None)
+    await add_to_timeline("well_done", post_doc)
     return post_doc
 
 @api_router.get("/well-done")
-async def get_well_done_posts(user_id: str = Depends(get_current_user)):
+async def get_well_done_posts(page: Page = Depends(page_params()), user_id: str = Depends(get_current_user)):
     """Get all Well Done appreciation posts"""
-    posts = await db.well_done.find({}, {"_id": 0}).sort("created_at", -1).to_list(100)
+    posts = await page.fetch(db.well_done, {})
     return posts
 
 @api_router.delete("/well-done/{post_id}")
@@ -745,19 +3446,37 @@ async def delete_well_done(post_id: str, user_id: str = Depends(get_current_user
     if not post or post['user_id'] != user_id:
         raise HTTPException(status_code=403, detail="Not authorized")
     await db.well_done.delete_one({"id": post_id})
+    await remove_from_timeline("well_done", post_id)
     return {"message": "Post deleted"}
 
 @api_router.get("/users")
 async def search_users(query: str = Query(""), current_user: str = Depends(get_current_user)):
     if query:
-        users = await db.users.find(
-            {"name": {"$regex": query, "$options": "i"}},
+        matches = await search_entries(query, ["user"], limit=20)
+        found = await db.users.find(
+            {"id": {"$in": [match["id"] for match in matches]}},
             {"_id": 0, "password": 0, "email": 0}
         ).to_list(20)
+        by_id = {user["id"]: user for user in found}
+        users = [by_id[match["id"]] for match in matches if match["id"] in by_id]
     else:
         users = await db.users.find({}, {"_id": 0, "password": 0, "email": 0}).to_list(50)
     return {"users": users}
 
+@api_router.get("/search")
+async def search(
+    q: str = Query(..., min_length=1),
+    kinds: Optional[str] = Query(None, description="Comma-separated entry kinds"),
+    limit: int = Query(10, ge=1, le=50),
+    user_id: str = Depends(get_current_user)
+):
+    """Typeahead search over people, family members, posts and tips"""
+    kind_list = [kind for kind in (kinds or "").split(",") if kind]
+    unknown = [kind for kind in kind_list if kind not in SEARCH_SOURCES]
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown search kinds: {', '.join(unknown)}")
+    return {"results": await search_entries(q, kind_list or None, limit)}
+
 @api_router.get("/users/{user_id}", response_model=UserProfile)
 async def get_user(user_id: str, current_user: str = Depends(get_current_user)):
     user = await db.users.find_one({"id": user_id}, {"_id": 0, "password": 0})
@@ -765,6 +3484,79 @@ async def get_user(user_id: str, current_user: str = Depends(get_current_user)):
         raise HTTPException(status_code=404, detail="User not found")
     return user
 
+# ==================== IMAGE PROCESSING ====================
+
+# Longest edge in pixels for each stored rendition of an uploaded photo
+PHOTO_RENDITIONS = {"full": 1920, "medium": 960, "thumb": 256}
+PHOTO_WEBP = os.environ.get('PHOTO_WEBP', 'false').lower() in ('1', 'true', 'yes')
+IMAGE_WORKERS = int(os.environ.get('IMAGE_WORKERS', max(1, (os.cpu_count() or 2) // 2)))
+IMAGE_QUEUE_LIMIT = int(os.environ.get('IMAGE_QUEUE_LIMIT', IMAGE_WORKERS * 4))
+
+# Pillow work runs in separate processes so it never blocks the event loop.
+# Spawned workers avoid forking a process that already runs driver threads.
+image_executor = ProcessPoolExecutor(
+    max_workers=IMAGE_WORKERS,
+    mp_context=multiprocessing.get_context("spawn")
+)
+image_slots = asyncio.Semaphore(IMAGE_QUEUE_LIMIT)
+
+def render_photo(content: bytes, webp: bool = False) -> Dict[str, tuple]:
+    """Produce every rendition of an image as {variant: (bytes, content_type)}.
+
+    Runs inside the image process pool. Each smaller rendition is scaled
+    down from the previous one rather than from the original.
+    """
+    image = Image.open(BytesIO(content))
+    if image.mode not in ('RGB', 'L'):
+        image = image.convert('RGB')
+
+    renditions = {}
+    for variant, max_edge in sorted(PHOTO_RENDITIONS.items(), key=lambda item: -item[1]):
+        image.thumbnail((max_edge, max_edge), Image.Resampling.LANCZOS)
+        jpeg = BytesIO()
+        image.save(jpeg, format='JPEG', quality=85, optimize=True)
+        renditions[variant] = (jpeg.getvalue(), "image/jpeg")
+        if webp:
+            webp_bytes = BytesIO()
+            image.save(webp_bytes, format='WEBP', quality=80)
+            renditions[f"{variant}.webp"] = (webp_bytes.getvalue(), "image/webp")
+    return renditions
+
+async def process_photo(content: bytes) -> Optional[Dict[str, tuple]]:
+    """Render photo variants in the process pool, or None if Pillow can't.
+
+    Raises 503 when the pool already has IMAGE_QUEUE_LIMIT jobs in flight,
+    so a burst of uploads is pushed back to clients instead of queueing
+    without bound.
+    """
+    if image_slots.locked():
+        raise HTTPException(
+            status_code=503,
+            detail="Image processing is busy, please retry",
+            headers={"Retry-After": "2"}
+        )
+    async with image_slots:
+        try:
+            return await asyncio.get_running_loop().run_in_executor(
+                image_executor, render_photo, content, PHOTO_WEBP
+            )
+        except Exception:
+            logger.warning("Image processing failed, storing original", exc_info=True)
+            return None
+
+async def store_photo_file(filename: str, content: bytes, content_type: str, user_id: str,
+                           uploaded_at: str, parent_id: Optional[str] = None, variant: Optional[str] = None):
+    metadata = {
+        "content_type": content_type,
+        "md5": hashlib.md5(content).hexdigest(),
+        "user_id": user_id,
+        "uploaded_at": uploaded_at
+    }
+    if parent_id:
+        metadata["parent_id"] = parent_id
+        metadata["variant"] = variant
+    return await fs_bucket.upload_from_stream(filename, content, metadata=metadata)
+
 # Photo endpoints
 @api_router.post("/photos/upload")
 async def upload_photo(
@@ -786,36 +3578,24 @@ async def upload_photo(
         if not file.content_type or not file.content_type.startswith('image/'):
             raise HTTPException(status_code=400, detail="Only image files are allowed")
         
-        # Resize image for optimization
-        try:
-            image = Image.open(BytesIO(file_content))
-            
-            # Convert RGBA to RGB if needed
-            if image.mode == 'RGBA':
-                image = image.convert('RGB')
-            
-            # Resize if too large (max 1920x1920)
-            max_size = (1920, 1920)
-            image.thumbnail(max_size, Image.Resampling.LANCZOS)
-            
-            # Save optimized image
-            img_byte_arr = BytesIO()
-            image.save(img_byte_arr, format='JPEG', quality=85, optimize=True)
-            file_content = img_byte_arr.getvalue()
-        except Exception:
+        # Resize into the stored renditions off the event loop
+        renditions = await process_photo(file_content) or {}
+        if "full" in renditions:
+            file_content, content_type = renditions.pop("full")
+        else:
             # If image processing fails, use original
-            pass
+            content_type = file.content_type
         
-        # Upload to GridFS
-        file_id = await fs_bucket.upload_from_stream(
-            file.filename or f"photo_{uuid.uuid4()}.jpg",
-            file_content,
-            metadata={
-                "content_type": file.content_type,
-                "user_id": user_id,
-                "uploaded_at": datetime.now(timezone.utc).isoformat()
-            }
-        )
+        # Upload to GridFS: the full-size image first, then its renditions
+        filename = file.filename or f"photo_{uuid.uuid4()}.jpg"
+        uploaded_at = datetime.now(timezone.utc).isoformat()
+        file_id = await store_photo_file(filename, file_content, content_type, user_id, uploaded_at)
+        variants = list(renditions)
+        variant_ids = await asyncio.gather(*[
+            store_photo_file(f"{variant}_{filename}", *renditions[variant], user_id, uploaded_at,
+                             parent_id=str(file_id), variant=variant)
+            for variant in variants
+        ])
         
         # Create photo document
         photo_id = str(uuid.uuid4())
@@ -826,17 +3606,23 @@ async def upload_photo(
             "filename": file.filename,
             "caption": caption or "",
             "album_id": album_id or "",
+            "renditions": {variant: str(variant_id) for variant, variant_id in zip(variants, variant_ids)},
             "tags": [],
             "likes": [],
+            "like_count": 0,
+            "comment_count": 0,
+            "latest_comments": [],
             "created_at": datetime.now(timezone.utc).isoformat()
         }
         await db.photos.insert_one(photo_doc)
+        await add_to_timeline("photo", photo_doc)
         
         return {
             "id": photo_id,
             "file_id": str(file_id),
             "message": "Photo uploaded successfully",
-            "url": f"/api/photos/file/{file_id}"
+            "url": f"/api/photos/file/{file_id}",
+            "thumb_url": f"/api/photos/file/{file_id}?size=thumb"
         }
     
     except HTTPException:
@@ -844,31 +3630,136 @@ async def upload_photo(
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Upload failed: {str(e)}")
 
+# GridFS files are never modified after upload, so a file id names fixed content
+PHOTO_CACHE_CONTROL = "public, max-age=31536000, immutable"
+
+def parse_range(range_header: str, length: int) -> Optional[tuple]:
+    """Parse a single `bytes=` range into inclusive (start, end) offsets.
+
+    Returns None when the header should be ignored (missing, malformed or
+    multi-range) and raises 416 when the range cannot be satisfied.
+    """
+    if not range_header or not range_header.startswith("bytes=") or "," in range_header:
+        return None
+    first, _, last = range_header[len("bytes="):].strip().partition("-")
+    try:
+        if not first:
+            suffix = int(last)
+            if suffix <= 0:
+                raise ValueError
+            start, end = max(length - suffix, 0), length - 1
+        else:
+            start = int(first)
+            end = min(int(last), length - 1) if last else length - 1
+    except ValueError:
+        return None
+    if start >= length or start > end:
+        raise HTTPException(
+            status_code=416,
+            detail="Requested range not satisfiable",
+            headers={"Content-Range": f"bytes */{length}"}
+        )
+    return start, end
+
+def etag_matches(if_none_match: str, etag: str) -> bool:
+    if if_none_match.strip() == "*":
+        return True
+    candidates = [tag.strip() for tag in if_none_match.split(",")]
+    return etag in candidates or f"W/{etag}" in candidates
+
+def not_modified_since(if_modified_since: str, last_modified: datetime) -> bool:
+    try:
+        since = parsedate_to_datetime(if_modified_since)
+    except (TypeError, ValueError):
+        return False
+    if since.tzinfo is None:
+        since = since.replace(tzinfo=timezone.utc)
+    return last_modified.replace(microsecond=0) <= since
+
+async def stream_grid_out(grid_out, start: int, end: int):
+    """Yield the requested byte range one GridFS chunk at a time"""
+    grid_out.seek(start)
+    remaining = end - start + 1
+    while remaining > 0:
+        data = await grid_out.read(min(grid_out.chunk_size, remaining))
+        if not data:
+            break
+        remaining -= len(data)
+        yield data
+
+async def find_rendition(file_id: str, size: str, accept: str) -> str:
+    """GridFS id of the best stored rendition, falling back to the original"""
+    candidates = [f"{size}.webp"] if "image/webp" in accept else []
+    if size != "full":
+        candidates.append(size)
+    if not candidates:
+        return file_id
+    found = {
+        f["metadata"]["variant"]: str(f["_id"])
+        for f in await db["fs.files"].find(
+            {"metadata.parent_id": file_id, "metadata.variant": {"$in": candidates}},
+            {"_id": 1, "metadata.variant": 1}
+        ).to_list(len(candidates))
+    }
+    return next((found[variant] for variant in candidates if variant in found), file_id)
+
 @api_router.get("/photos/file/{file_id}")
-async def get_photo_file(file_id: str):
-    """Retrieve photo file from GridFS."""
+async def get_photo_file(file_id: str, request: Request, size: Optional[str] = Query(None)):
+    """Stream a photo file from GridFS with Range and conditional GET support.
+
+    `size` selects a stored rendition (thumb, medium or full); WebP is served
+    instead of JPEG when the client accepts it and one was generated.
+    """
+    if size is not None and size not in PHOTO_RENDITIONS:
+        raise HTTPException(status_code=400, detail=f"Unknown size, expected one of {', '.join(PHOTO_RENDITIONS)}")
     try:
-        from bson import ObjectId
-        
-        # Get file from GridFS
+        if size:
+            file_id = await find_rendition(file_id, size, request.headers.get("accept", ""))
         grid_out = await fs_bucket.open_download_stream(ObjectId(file_id))
-        
-        # Read file content
-        contents = await grid_out.read()
-        
-        # Get content type from metadata
-        content_type = grid_out.metadata.get("content_type", "image/jpeg") if grid_out.metadata else "image/jpeg"
-        
-        return StreamingResponse(
-            BytesIO(contents),
-            media_type=content_type,
-            headers={
-                "Content-Disposition": f"inline; filename={grid_out.filename}"
-            }
-        )
-    
-    except Exception:
+    except (InvalidId, NoFile):
         raise HTTPException(status_code=404, detail="File not found")
+    
+    metadata = grid_out.metadata or {}
+    content_type = metadata.get("content_type", "image/jpeg")
+    etag = f'"{metadata.get("md5") or f"{grid_out._id}-{grid_out.length}"}"'
+    upload_date = grid_out.upload_date.replace(tzinfo=timezone.utc)
+    headers = {
+        "ETag": etag,
+        "Last-Modified": format_datetime(upload_date, usegmt=True),
+        "Cache-Control": PHOTO_CACHE_CONTROL,
+        "Accept-Ranges": "bytes",
+        "Content-Disposition": f"inline; filename={grid_out.filename}"
+    }
+    if size:
+        headers["Vary"] = "Accept"
+    
+    if_none_match = request.headers.get("if-none-match")
+    if_modified_since = request.headers.get("if-modified-since")
+    if (if_none_match and etag_matches(if_none_match, etag)) or \
+            (not if_none_match and if_modified_since and not_modified_since(if_modified_since, upload_date)):
+        return Response(status_code=304, headers=headers)
+    
+    length = grid_out.length
+    byte_range = None
+    if_range = request.headers.get("if-range")
+    if not if_range or if_range.strip() == etag:
+        byte_range = parse_range(request.headers.get("range", ""), length)
+    
+    if byte_range:
+        start, end = byte_range
+        headers["Content-Range"] = f"bytes {start}-{end}/{length}"
+        status_code = 206
+    else:
+        start, end = 0, length - 1
+        status_code = 200
+    headers["Content-Length"] = str(end - start + 1)
+    
+    return StreamingResponse(
+        stream_grid_out(grid_out, start, end),
+        status_code=status_code,
+        media_type=content_type,
+        headers=headers
+    )
 
 @api_router.post("/photos")
 async def upload_photo_legacy(photo_data: dict, user_id: str = Depends(get_current_user)):
@@ -882,29 +3773,34 @@ async def upload_photo_legacy(photo_data: dict, user_id: str = Depends(get_curre
         "album_id": photo_data.get("album_id", ""),
         "tags": [],
         "likes": [],
+        "like_count": 0,
+        "comment_count": 0,
+        "latest_comments": [],
         "created_at": datetime.now(timezone.utc).isoformat()
     }
     await db.photos.insert_one(photo_doc)
+    await add_to_timeline("photo", photo_doc)
     return {"id": photo_id, "message": "Photo uploaded"}
 
 @api_router.get("/photos", response_model=List[Photo])
-async def get_photos(album_id: Optional[str] = None, user_id: str = Depends(get_current_user)):
+async def get_photos(album_id: Optional[str] = None, page: Page = Depends(page_params()), user_id: str = Depends(get_current_user)):
     query = {"album_id": album_id} if album_id else {}
-    photos = await db.photos.find(query, {"_id": 0}).sort("created_at", -1).to_list(100)
+    photos = await resolve_viewer_likes("photos", await page.fetch(db.photos, query, projection=viewer_projection(Photo, user_id)), user_id)
     
     # Update URLs for GridFS-stored photos
     for photo in photos:
         if photo.get("file_id"):
             photo["url"] = f"/api/photos/file/{photo['file_id']}"
+            photo["thumb_url"] = f"/api/photos/file/{photo['file_id']}?size=thumb"
     
     return photos
 
 @api_router.get("/photos/{photo_id}", response_model=Photo)
 async def get_photo(photo_id: str, user_id: str = Depends(get_current_user)):
-    photo = await db.photos.find_one({"id": photo_id}, {"_id": 0})
+    photo = await db.photos.find_one({"id": photo_id}, viewer_projection(Photo, user_id))
     if not photo:
         raise HTTPException(status_code=404, detail="Photo not found")
-    return photo
+    return (await resolve_viewer_likes("photos", [photo], user_id))[0]
 
 @api_router.put("/photos/{photo_id}")
 async def update_photo(photo_id: str, update: PhotoUpdate, user_id: str = Depends(get_current_user)):
@@ -915,6 +3811,7 @@ async def update_photo(photo_id: str, update: PhotoUpdate, user_id: str = Depend
     update_data = {k: v for k, v in update.model_dump().items() if v is not None}
     if update_data:
         await db.photos.update_one({"id": photo_id}, {"$set": update_data})
+        await add_to_timeline("photo", {**photo, **update_data})
     return {"message": "Photo updated"}
 
 @api_router.delete("/photos/{photo_id}")
@@ -925,20 +3822,15 @@ async def delete_photo(photo_id: str, user_id: str = Depends(get_current_user)):
     
     await db.photos.delete_one({"id": photo_id})
     await db.photo_comments.delete_many({"photo_id": photo_id})
+    await remove_from_timeline("photo", photo_id)
     return {"message": "Photo deleted"}
 
 @api_router.post("/photos/{photo_id}/like")
 async def like_photo(photo_id: str, user_id: str = Depends(get_current_user)):
-    photo = await db.photos.find_one({"id": photo_id}, {"_id": 0})
-    if not photo:
+    state = await toggle_like("photos", photo_id, user_id)
+    if state is None:
         raise HTTPException(status_code=404, detail="Photo not found")
-    
-    if user_id in photo.get('likes', []):
-        await db.photos.update_one({"id": photo_id}, {"$pull": {"likes": user_id}})
-        return {"message": "Unliked", "liked": False}
-    else:
-        await db.photos.update_one({"id": photo_id}, {"$push": {"likes": user_id}})
-        return {"message": "Liked", "liked": True}
+    return {"message": "Liked" if state["added"] else "Unliked", "liked": state["added"], "like_count": state["count"]}
 
 @api_router.post("/photos/{photo_id}/comments", response_model=Comment)
 async def add_comment(photo_id: str, comment: CommentCreate, user_id: str = Depends(get_current_user)):
@@ -950,6 +3842,8 @@ async def add_comment(photo_id: str, comment: CommentCreate, user_id: str = Depe
         "comment": comment.comment,
         "created_at": datetime.now(timezone.utc).isoformat()
     }
+    if not await record_comment(db.photos, photo_id, comment_doc):
+        raise HTTPException(status_code=404, detail="Photo not found")
     await db.photo_comments.insert_one(comment_doc)
     return comment_doc
 
@@ -975,12 +3869,15 @@ async def create_album(album: AlbumCreate, user_id: str = Depends(get_current_us
         "created_at": datetime.now(timezone.utc).isoformat()
     }
     await db.albums.insert_one(album_doc)
+    album_doc.pop("_id", None)
+    await response_cache.bump("albums")
     return album_doc
 
 @api_router.get("/albums", response_model=List[Album])
-async def get_albums(user_id: str = Depends(get_current_user)):
-    albums = await db.albums.find({}, {"_id": 0}).sort("created_at", -1).to_list(100)
-    return albums
+async def get_albums(request: Request, response: Response, user_id: str = Depends(get_current_user)):
+    async def build():
+        return await db.albums.find({}, {"_id": 0}).sort("created_at", -1).to_list(100)
+    return await response_cache.serve(request, response, ("albums",), build, List[Album])
 
 @api_router.get("/albums/{album_id}", response_model=Album)
 async def get_album(album_id: str, user_id: str = Depends(get_current_user)):
@@ -990,59 +3887,209 @@ async def get_album(album_id: str, user_id: str = Depends(get_current_user)):
     return album
 
 # Message endpoints
-@api_router.post("/messages", response_model=Message)
-async def send_message(msg: MessageCreate, user_id: str = Depends(get_current_user)):
-    message_id = str(uuid.uuid4())
-    message_doc = {
-        "id": message_id,
-        "sender_id": user_id,
+
+# `conversations` keeps one summary per (user, partner) pair so the inbox
+# never has to scan message history.
+def conversation_update(user_id: str, partner_id: str, message_doc: dict, unread_inc: int = 0) -> UpdateOne:
+    """Count a message into a summary. `last_message` only moves forward, so a
+    write that lands after a newer message's doesn't replace it."""
+    newer = {"$lte": [{"$ifNull": ["$last_message_at", ""]}, message_doc["created_at"]]}
+    return UpdateOne(
+        {"id": f"{user_id}:{partner_id}"},
+        [{"$set": {
+            "user_id": user_id,
+            "partner_id": partner_id,
+            "last_message": {"$cond": [
+                newer, {"$literal": {k: v for k, v in message_doc.items() if k != "_id"}}, "$last_message"
+            ]},
+            "last_message_at": {"$cond": [newer, message_doc["created_at"], "$last_message_at"]},
+            "unread_count": {"$add": [{"$ifNull": ["$unread_count", 0]}, unread_inc]}
+        }}],
+        upsert=True
+    )
+
+def conversation_read(reader_id: str, sender_id: str, message_ids: List[str]) -> list:
+    """Take read messages off the reader's unread count (never below zero) and
+    mark the pair's last message read on both summaries if it is one of them"""
+    return [
+        UpdateOne(
+            {"id": f"{reader_id}:{sender_id}"},
+            [{"$set": {"unread_count": {"$max": [0, {"$subtract": [{"$ifNull": ["$unread_count", 0]}, len(message_ids)]}]}}}]
+        ),
+        UpdateMany(
+            {"id": {"$in": [f"{reader_id}:{sender_id}", f"{sender_id}:{reader_id}"]},
+             "last_message.id": {"$in": message_ids}},
+            {"$set": {"last_message.read": True}}
+        ),
+    ]
+
+async def record_conversations(message_docs: List[dict]):
+    """Fold direct messages into both participants' summaries, in send order"""
+    updates = []
+    for message_doc in message_docs:
+        sender_id, receiver_id = message_doc["sender_id"], message_doc["receiver_id"]
+        if not receiver_id:
+            continue
+        updates.append(conversation_update(sender_id, receiver_id, message_doc))
+        if receiver_id != sender_id:
+            updates.append(conversation_update(receiver_id, sender_id, message_doc, unread_inc=1))
+    if updates:
+        await db.conversations.bulk_write(updates, ordered=True)
+
+def new_message_doc(sender_id: str, msg: MessageCreate) -> dict:
+    return {
+        "id": str(uuid.uuid4()),
+        "sender_id": sender_id,
         "receiver_id": msg.receiver_id or "",
         "group_id": msg.group_id or "",
         "message": msg.message,
         "created_at": datetime.now(timezone.utc).isoformat(),
         "read": False
     }
+
+# Every stored message is numbered from one shared sequence, so each
+# user's own messages arrive in increasing `seq` order and a reconnecting
+# socket can resume with seq > last_seq.
+MESSAGE_SEQ = "message_seq"
+
+async def number_messages(message_docs: List[dict]):
+    """Give messages consecutive `seq` numbers with one $inc, just before they are inserted"""
+    if not message_docs:
+        return
+    first = await bump_version(MESSAGE_SEQ, len(message_docs)) - len(message_docs) + 1
+    for seq, message_doc in enumerate(message_docs, first):
+        message_doc["seq"] = seq
+
+async def message_recipients(message_doc: dict) -> List[str]:
+    if message_doc["receiver_id"]:
+        return [message_doc["receiver_id"]]
+    if message_doc["group_id"]:
+        return await group_index.members(message_doc["group_id"])
+    return []
+
+async def can_send(message_doc: dict) -> bool:
+    """Group messages may only come from members of the group"""
+    if message_doc["group_id"] and not message_doc["receiver_id"]:
+        return await group_index.is_member(message_doc["group_id"], message_doc["sender_id"])
+    return True
+
+async def dispatch_message(message_doc: dict):
+    """Send a stored message to its recipients' sockets"""
+    await dispatch_messages([message_doc])
+
+async def dispatch_messages(message_docs: List[dict]):
+    """Send stored messages to their recipients' sockets in one publish"""
+    recipients = await asyncio.gather(*[message_recipients(message_doc) for message_doc in message_docs])
+    await manager.broadcast_many(list(zip(message_docs, recipients)))
+
+async def refresh_conversation(user_id: str, partner_id: str):
+    """Recompute a pair's summaries after a message between them was removed"""
+    latest = await db.messages.find(
+        {"$or": [
+            {"sender_id": user_id, "receiver_id": partner_id},
+            {"sender_id": partner_id, "receiver_id": user_id}
+        ]},
+        {"_id": 0}
+    ).sort([("created_at", DESCENDING), ("id", DESCENDING)]).limit(1).to_list(1)
+    ids = [f"{user_id}:{partner_id}", f"{partner_id}:{user_id}"]
+    if not latest:
+        await db.conversations.delete_many({"id": {"$in": ids}})
+        return
+    await db.conversations.update_many(
+        {"id": {"$in": ids}},
+        {"$set": {"last_message": latest[0], "last_message_at": latest[0]["created_at"]}}
+    )
+
+@migration("conversations_backfill")
+async def backfill_conversations():
+    """Build conversation summaries from existing direct messages"""
+    pipeline = [
+        {"$match": {"receiver_id": {"$nin": ["", None]}}},
+        {"$project": {
+            "_id": 0,
+            "message": "$$ROOT",
+            "sides": [
+                {"user_id": "$sender_id", "partner_id": "$receiver_id", "unread": 0},
+                {"user_id": "$receiver_id", "partner_id": "$sender_id", "unread": {"$cond": ["$read", 0, 1]}}
+            ]
+        }},
+        {"$unwind": "$sides"},
+        {"$sort": {"message.created_at": -1}},
+        {"$group": {
+            "_id": {"user_id": "$sides.user_id", "partner_id": "$sides.partner_id"},
+            "last_message": {"$first": "$message"},
+            "unread_count": {"$sum": "$sides.unread"}
+        }},
+        {"$project": {
+            "_id": 0,
+            "id": {"$concat": ["$_id.user_id", ":", "$_id.partner_id"]},
+            "user_id": "$_id.user_id",
+            "partner_id": "$_id.partner_id",
+            "last_message": "$last_message",
+            "last_message_at": "$last_message.created_at",
+            "unread_count": "$unread_count"
+        }},
+        {"$project": {"last_message._id": 0}},
+        {"$merge": {"into": "conversations", "on": "id", "whenMatched": "replace", "whenNotMatched": "insert"}}
+    ]
+    await db.messages.aggregate(pipeline, allowDiskUse=True).to_list(None)
+
+@api_router.post("/messages", response_model=Message)
+async def send_message(msg: MessageCreate, user_id: str = Depends(get_current_user)):
+    message_doc = new_message_doc(user_id, msg)
+    if not await can_send(message_doc):
+        raise HTTPException(status_code=403, detail="Not a member of this group")
+    await number_messages([message_doc])
     await db.messages.insert_one(message_doc)
+    await record_conversations([message_doc])
     
     # Send via WebSocket if connected
-    if msg.receiver_id:
-        await manager.send_personal_message(message_doc, msg.receiver_id)
-    elif msg.group_id:
-        group = await db.groups.find_one({"id": msg.group_id}, {"_id": 0})
-        if group:
-            await manager.broadcast(message_doc, group['members'])
+    await dispatch_message(message_doc)
     
     return message_doc
 
 @api_router.get("/messages/conversations")
-async def get_conversations(user_id: str = Depends(get_current_user)):
-    messages = await db.messages.find(
-        {"$or": [{"sender_id": user_id}, {"receiver_id": user_id}]},
-        {"_id": 0}
-    ).to_list(1000)
-    
-    conversations = {}
-    for msg in messages:
-        other_user = msg['receiver_id'] if msg['sender_id'] == user_id else msg['sender_id']
-        if other_user and other_user not in conversations:
-            conversations[other_user] = msg
-    
-    return {"conversations": list(conversations.values())}
+async def get_conversations(page: Page = Depends(page_params()), user_id: str = Depends(get_current_user)):
+    """Latest message and unread count per direct-message partner, newest first"""
+    summaries = await page.fetch(db.conversations, {"user_id": user_id}, "last_message_at")
+    conversations = [
+        {**summary["last_message"], "partner_id": summary["partner_id"], "unread_count": summary["unread_count"]}
+        for summary in summaries
+    ]
+    return {"conversations": conversations}
 
 @api_router.get("/messages/{conversation_id}", response_model=List[Message])
-async def get_messages(conversation_id: str, user_id: str = Depends(get_current_user)):
-    messages = await db.messages.find(
+async def get_messages(conversation_id: str, page: Page = Depends(page_params(MAX_PAGE_SIZE)), user_id: str = Depends(get_current_user)):
+    messages = await page.fetch(
+        db.messages,
         {"$or": [
             {"sender_id": user_id, "receiver_id": conversation_id},
             {"sender_id": conversation_id, "receiver_id": user_id}
         ]},
-        {"_id": 0}
-    ).sort("created_at", 1).to_list(1000)
+        direction=ASCENDING
+    )
+    
+    # Opening a conversation reads everything the partner sent
+    result = await db.messages.update_many(
+        {"sender_id": conversation_id, "receiver_id": user_id, "read": False},
+        {"$set": {"read": True}}
+    )
+    if result.modified_count:
+        await db.conversations.bulk_write([
+            UpdateOne({"id": f"{user_id}:{conversation_id}"}, {"$set": {"unread_count": 0}}),
+            UpdateMany(
+                {"id": {"$in": [f"{user_id}:{conversation_id}", f"{conversation_id}:{user_id}"]},
+                 "last_message.sender_id": conversation_id},
+                {"$set": {"last_message.read": True}}
+            ),
+        ], ordered=False)
     return messages
 
 @api_router.get("/messages/group/{group_id}", response_model=List[Message])
-async def get_group_messages(group_id: str, user_id: str = Depends(get_current_user)):
-    messages = await db.messages.find({"group_id": group_id}, {"_id": 0}).sort("created_at", 1).to_list(1000)
+async def get_group_messages(group_id: str, page: Page = Depends(page_params(MAX_PAGE_SIZE)), user_id: str = Depends(get_current_user)):
+    if not await group_index.is_member(group_id, user_id):
+        raise HTTPException(status_code=403, detail="Not a member of this group")
+    messages = await page.fetch(db.messages, {"group_id": group_id}, direction=ASCENDING)
     return messages
 
 @api_router.delete("/messages/{message_id}")
@@ -1053,6 +4100,13 @@ async def delete_message(message_id: str, user_id: str = Depends(get_current_use
         raise HTTPException(status_code=403, detail="Not authorized")
     
     await db.messages.delete_one({"id": message_id})
+    if message.get("receiver_id"):
+        if not message.get("read"):
+            await db.conversations.update_one(
+                {"id": f"{message['receiver_id']}:{user_id}", "unread_count": {"$gt": 0}},
+                {"$inc": {"unread_count": -1}}
+            )
+        await refresh_conversation(user_id, message["receiver_id"])
     return {"message": "Message deleted"}
 
 # Group endpoints
@@ -1067,12 +4121,14 @@ async def create_group(group: GroupCreate, user_id: str = Depends(get_current_us
         "created_at": datetime.now(timezone.utc).isoformat()
     }
     await db.groups.insert_one(group_doc)
+    group_doc.pop("_id", None)
+    await group_index.changed(group_doc)
     return group_doc
 
 @api_router.get("/groups", response_model=List[Group])
 async def get_groups(user_id: str = Depends(get_current_user)):
-    groups = await db.groups.find({"members": user_id}, {"_id": 0}).to_list(100)
-    return groups
+    groups = await group_index.for_user(user_id)
+    return groups[:100]
 
 # Event endpoints
 @api_router.post("/events", response_model=Event)
@@ -1086,28 +4142,29 @@ async def create_event(event: EventCreate, user_id: str = Depends(get_current_us
         "date": event.date,
         "location": event.location or "",
         "attendees": [user_id],
+        "attendee_count": 1,
         "created_at": datetime.now(timezone.utc).isoformat()
     }
     await db.events.insert_one(event_doc)
+    await response_cache.bump("events")
+    await add_to_timeline("event", event_doc)
     return event_doc
 
 @api_router.get("/events", response_model=List[Event])
-async def get_events(user_id: str = Depends(get_current_user)):
-    events = await db.events.find({}, {"_id": 0}).sort("date", 1).to_list(100)
-    return events
+async def get_events(request: Request, page: Page = Depends(page_params()), user_id: str = Depends(get_current_user)):
+    async def build():
+        return await page.fetch(db.events, {}, "date", ASCENDING)
+    return await response_cache.serve(request, page.response, ("events",), build, List[Event])
 
 @api_router.post("/events/{event_id}/attend")
 async def attend_event(event_id: str, user_id: str = Depends(get_current_user)):
-    event = await db.events.find_one({"id": event_id}, {"_id": 0})
-    if not event:
+    state = await toggle_membership(db.events, event_id, user_id, "attendees", "attendee_count")
+    if state is None:
         raise HTTPException(status_code=404, detail="Event not found")
-    
-    if user_id in event.get('attendees', []):
-        await db.events.update_one({"id": event_id}, {"$pull": {"attendees": user_id}})
-        return {"message": "Removed from attendees", "attending": False}
-    else:
-        await db.events.update_one({"id": event_id}, {"$push": {"attendees": user_id}})
-        return {"message": "Added to attendees", "attending": True}
+    await response_cache.bump("events")
+    if state["added"]:
+        return {"message": "Added to attendees", "attending": True, "attendee_count": state["count"]}
+    return {"message": "Removed from attendees", "attending": False, "attendee_count": state["count"]}
 
 # Post endpoints (Feed)
 @api_router.post("/posts", response_model=Post)
@@ -1119,28 +4176,35 @@ async def create_post(post: PostCreate, user_id: str = Depends(get_current_user)
         "content": post.content,
         "media": post.media or [],
         "likes": [],
+        "like_count": 0,
+        "comment_count": 0,
+        "latest_comments": [],
         "created_at": datetime.now(timezone.utc).isoformat()
     }
     await db.posts.insert_one(post_doc)
+    await add_to_timeline("post", post_doc)
+    await index_for_search("post", post_doc)
     return post_doc
 
 @api_router.get("/posts", response_model=List[Post])
-async def get_posts(user_id: str = Depends(get_current_user)):
-    posts = await db.posts.find({}, {"_id": 0}).sort("created_at", -1).to_list(100)
-    return posts
+async def get_posts(page: Page = Depends(page_params()), user_id: str = Depends(get_current_user)):
+    posts = await page.fetch(db.posts, {}, projection=viewer_projection(Post, user_id))
+    return await resolve_viewer_likes("posts", posts, user_id)
+
+@api_router.get("/feed", response_model=List[TimelineCard])
+async def get_feed(kind: Optional[str] = Query(None), page: Page = Depends(page_params()), user_id: str = Depends(get_current_user)):
+    """Home feed: newest cards across all content, optionally of one kind"""
+    if kind is not None and kind not in TIMELINE_SOURCES:
+        raise HTTPException(status_code=400, detail="Unknown feed kind")
+    cards = await page.fetch(db.timeline, {"kind": kind} if kind else {})
+    return cards
 
 @api_router.post("/posts/{post_id}/like")
 async def like_post(post_id: str, user_id: str = Depends(get_current_user)):
-    post = await db.posts.find_one({"id": post_id}, {"_id": 0})
-    if not post:
+    state = await toggle_like("posts", post_id, user_id)
+    if state is None:
         raise HTTPException(status_code=404, detail="Post not found")
-    
-    if user_id in post.get('likes', []):
-        await db.posts.update_one({"id": post_id}, {"$pull": {"likes": user_id}})
-        return {"message": "Unliked", "liked": False}
-    else:
-        await db.posts.update_one({"id": post_id}, {"$push": {"likes": user_id}})
-        return {"message": "Liked", "liked": True}
+    return {"message": "Liked" if state["added"] else "Unliked", "liked": state["added"], "like_count": state["count"]}
 
 @api_router.post("/posts/{post_id}/comments")
 async def add_post_comment(post_id: str, comment: CommentCreate, user_id: str = Depends(get_current_user)):
@@ -1152,7 +4216,10 @@ async def add_post_comment(post_id: str, comment: CommentCreate, user_id: str =
         "comment": comment.comment,
         "created_at": datetime.now(timezone.utc).isoformat()
     }
+    if not await record_comment(db.posts, post_id, comment_doc):
+        raise HTTPException(status_code=404, detail="Post not found")
     await db.post_comments.insert_one(comment_doc)
+    comment_doc.pop("_id", None)
     return comment_doc
 
 @api_router.get("/posts/{post_id}/comments")
@@ -1161,274 +4228,331 @@ async def get_post_comments(post_id: str, user_id: str = Depends(get_current_use
     return comments
 
 # WebSocket for real-time chat
+# Socket sends and read receipts are buffered briefly and written together
+WS_FLUSH_INTERVAL = float(os.environ.get('WS_FLUSH_INTERVAL', 0.05))
+WS_FLUSH_MAX = int(os.environ.get('WS_FLUSH_MAX', 200))
+
+class BatchQueue:
+    """Collects items and hands them to `flush_fn` in one call.
+
+    A batch is flushed WS_FLUSH_INTERVAL seconds after its first item, or
+    as soon as it holds WS_FLUSH_MAX items.
+    """
+    def __init__(self, flush_fn: Callable[[list], Awaitable[None]], name: str):
+        self.flush_fn = flush_fn
+        self.name = name
+        self.pending: list = []
+        self._timer: Optional[asyncio.Task] = None
+        # Running flushes, kept so they aren't collected mid-flight
+        self.tasks: Set[asyncio.Task] = set()
+
+    def add(self, item):
+        self.pending.append(item)
+        if len(self.pending) >= WS_FLUSH_MAX:
+            self._spawn(self.flush())
+        elif self._timer is None:
+            self._timer = self._spawn(self._flush_later())
+
+    def _spawn(self, coro) -> asyncio.Task:
+        task = asyncio.create_task(coro)
+        self.tasks.add(task)
+        task.add_done_callback(self.tasks.discard)
+        return task
+
+    async def _flush_later(self):
+        await asyncio.sleep(WS_FLUSH_INTERVAL)
+        self._timer = None
+        await self.flush()
+
+    async def flush(self):
+        batch, self.pending = self.pending, []
+        if not batch:
+            return
+        try:
+            await self.flush_fn(batch)
+        except Exception:
+            logger.exception("Flushing %s batch of %d failed", self.name, len(batch))
+
+def send_frame(connection: Connection, frame: dict):
+    manager.send(connection, json.dumps(frame))
+
+async def flush_socket_messages(batch: List[tuple]):
+    """Store socket-sent messages with one insert_many, then ack and deliver them"""
+    docs = [message_doc for message_doc, _, _ in batch]
+    await number_messages(docs)
+    failed = set()
+    try:
+        await db.messages.insert_many(docs, ordered=False)
+    except BulkWriteError as e:
+        failed = {error["index"] for error in e.details.get("writeErrors", [])}
+    stored = [doc for index, doc in enumerate(docs) if index not in failed]
+    await record_conversations(stored)
+
+    acks: Dict[Connection, list] = defaultdict(list)
+    for index, (message_doc, connection, client_id) in enumerate(batch):
+        acks[connection].append({
+            "client_id": client_id,
+            "id": message_doc["id"],
+            "created_at": message_doc["created_at"],
+            "seq": message_doc["seq"],
+            "ok": index not in failed
+        })
+    for connection, messages in acks.items():
+        send_frame(connection, {"type": "ack", "messages": messages})
+
+    await dispatch_messages(stored)
+
+async def flush_read_receipts(batch: List[tuple]):
+    """Mark messages read in bulk, fix unread counts and tell the senders"""
+    ids_by_reader: Dict[str, set] = defaultdict(set)
+    for reader_id, message_ids in batch:
+        ids_by_reader[reader_id].update(message_ids)
+    unread = await db.messages.find(
+        {"$or": [
+            {"id": {"$in": list(message_ids)}, "receiver_id": reader_id, "read": False}
+            for reader_id, message_ids in ids_by_reader.items()
+        ]},
+        {"_id": 0, "id": 1, "sender_id": 1, "receiver_id": 1}
+    ).to_list(None)
+    if not unread:
+        return
+
+    read_by_pair: Dict[tuple, list] = defaultdict(list)
+    for message in unread:
+        read_by_pair[(message["receiver_id"], message["sender_id"])].append(message["id"])
+    await db.messages.update_many(
+        {"id": {"$in": [message["id"] for message in unread]}},
+        {"$set": {"read": True}}
+    )
+    await db.conversations.bulk_write([
+        update
+        for (reader_id, sender_id), message_ids in read_by_pair.items()
+        for update in conversation_read(reader_id, sender_id, message_ids)
+    ], ordered=False)
+    await manager.notify_many([
+        ({"type": "read", "reader_id": reader_id, "message_ids": message_ids}, [sender_id])
+        for (reader_id, sender_id), message_ids in read_by_pair.items()
+    ])
+
+message_batch = BatchQueue(flush_socket_messages, "message")
+receipt_batch = BatchQueue(flush_read_receipts, "read receipt")
+
+async def handle_chat_frame(connection: Connection, frame: dict):
+    frame_type = frame.get("type")
+    if frame_type == "ping":
+        manager.send(connection, json.dumps({"type": "pong"}))
+    elif frame_type == "resume":
+        try:
+            last_seq = int(frame.get("last_seq", 0))
+        except (TypeError, ValueError):
+            return
+        await manager.replay(connection, last_seq)
+    elif frame_type == "send":
+        try:
+            msg = MessageCreate(**{k: frame.get(k) for k in ("receiver_id", "group_id", "message")})
+        except ValidationError:
+            send_frame(connection, {"type": "error", "client_id": frame.get("client_id"), "detail": "Invalid message"})
+            return
+        message_doc = new_message_doc(connection.user_id, msg)
+        if not await can_send(message_doc):
+            send_frame(connection, {"type": "error", "client_id": frame.get("client_id"), "detail": "Not a member of this group"})
+            return
+        message_batch.add((message_doc, connection, frame.get("client_id")))
+    elif frame_type == "typing":
+        event = {"type": "typing", "user_id": connection.user_id,
+                 "receiver_id": frame.get("receiver_id") or "", "group_id": frame.get("group_id") or ""}
+        if not await can_send({**event, "sender_id": connection.user_id}):
+            return
+        recipients = [user_id for user_id in await message_recipients(event) if user_id != connection.user_id]
+        if recipients:
+            await manager.notify(event, recipients)
+    elif frame_type == "read":
+        message_ids = frame.get("message_ids")
+        if isinstance(message_ids, list) and message_ids:
+            receipt_batch.add((connection.user_id, [str(message_id) for message_id in message_ids]))
+
 @app.websocket("/api/ws/chat/{user_id}")
-async def websocket_chat(websocket: WebSocket, user_id: str):
-    await manager.connect(user_id, websocket)
+async def websocket_chat(websocket: WebSocket, user_id: str, token: str = Query("")):
+    """Real-time chat socket, authenticated with the JWT in `token`.
+
+    Clients send {"type": "send", "client_id", "receiver_id" | "group_id",
+    "message"} and get a batched {"type": "ack"} back; {"type": "typing"}
+    and {"type": "read", "message_ids"} frames are relayed to the other
+    participants.
+
+    Messages carry a `seq`, increasing for each user. After reconnecting,
+    a client sends {"type": "resume", "last_seq": n} to receive only what
+    it missed, or gets {"type": "resync"} if it must refetch over HTTP. The server
+    pings idle sockets and closes those that stay silent past
+    WS_IDLE_TIMEOUT.
+    """
+    try:
+        authenticated = verify_token(token) == user_id
+    except HTTPException:
+        authenticated = False
+    if not authenticated:
+        # 1008: policy violation
+        await websocket.close(code=1008)
+        return
+    connection = await manager.connect(user_id, websocket)
+    manager.send(connection, json.dumps({"type": "hello", "seq": await read_version(MESSAGE_SEQ)}))
+    last_activity = time.monotonic()
     try:
         while True:
-            await websocket.receive_json()
-            # Handle incoming messages if needed
+            try:
+                frame = await asyncio.wait_for(websocket.receive_json(), timeout=WS_HEARTBEAT_INTERVAL)
+            except asyncio.TimeoutError:
+                if time.monotonic() - last_activity > WS_IDLE_TIMEOUT:
+                    break
+                manager.send(connection, json.dumps({"type": "ping"}))
+                continue
+            except ValueError:
+                # Not JSON; still proof the client is alive
+                last_activity = time.monotonic()
+                continue
+            last_activity = time.monotonic()
+            if isinstance(frame, dict):
+                await handle_chat_frame(connection, frame)
     except WebSocketDisconnect:
-        manager.disconnect(user_id)
-
-# Cooking Tips endpoints
-@api_router.post("/cooking-tips")
-async def create_cooking_tip(tip_data: dict, user_id: str = Depends(get_current_user)):
-    tip_id = str(uuid.uuid4())
-    tip_doc = {
-        "id": tip_id,
-        "user_id": user_id,
-        "user_name": (await db.users.find_one({"id": user_id}, {"_id": 0}))['name'],
-        "title": tip_data.get("title"),
-        "category": tip_data.get("category", "general"),
-        "ingredients": tip_data.get("ingredients", ""),
-        "instructions": tip_data.get("instructions"),
-        "cooking_time": tip_data.get("cooking_time", ""),
-        "created_at": datetime.now(timezone.utc).isoformat()
-    }
-    await db.cooking_tips.insert_one(tip_doc)
-    return tip_doc
-
-@api_router.get("/cooking-tips")
-async def get_cooking_tips(user_id: str = Depends(get_current_user)):
-    tips = await db.cooking_tips.find({}, {"_id": 0}).sort("created_at", -1).to_list(100)
-    return tips
-
-@api_router.delete("/cooking-tips/{tip_id}")
-async def delete_cooking_tip(tip_id: str, user_id: str = Depends(get_current_user)):
-    tip = await db.cooking_tips.find_one({"id": tip_id}, {"_id": 0})
-    if not tip or tip['user_id'] != user_id:
-        raise HTTPException(status_code=403, detail="Not authorized")
-    await db.cooking_tips.delete_one({"id": tip_id})
-    return {"message": "Tip deleted"}
-
-# Kolam Tips endpoints
-@api_router.post("/kolam-tips")
-async def create_kolam_tip(tip_data: dict, user_id: str = Depends(get_current_user)):
-    tip_id = str(uuid.uuid4())
-    tip_doc = {
-        "id": tip_id,
-        "user_id": user_id,
-        "user_name": (await db.users.find_one({"id": user_id}, {"_id": 0}))['name'],
-        "title": tip_data.get("title"),
-        "difficulty": tip_data.get("difficulty", "easy"),
-        "description": tip_data.get("description"),
-        "dots_pattern": tip_data.get("dots_pattern", ""),
-        "image_url": tip_data.get("image_url", ""),
-        "created_at": datetime.now(timezone.utc).isoformat()
-    }
-    await db.kolam_tips.insert_one(tip_doc)
-    return tip_doc
-
-@api_router.get("/kolam-tips")
-async def get_kolam_tips(user_id: str = Depends(get_current_user)):
-    tips = await db.kolam_tips.find({}, {"_id": 0}).sort("created_at", -1).to_list(100)
-    return tips
-
-@api_router.delete("/kolam-tips/{tip_id}")
-async def delete_kolam_tip(tip_id: str, user_id: str = Depends(get_current_user)):
-    tip = await db.kolam_tips.find_one({"id": tip_id}, {"_id": 0})
-    if not tip or tip['user_id'] != user_id:
-        raise HTTPException(status_code=403, detail="Not authorized")
-    await db.kolam_tips.delete_one({"id": tip_id})
-    return {"message": "Tip deleted"}
-
-# Perumal Utsavam endpoints
-@api_router.post("/perumal-utsavam")
-async def create_utsavam(utsavam_data: dict, user_id: str = Depends(get_current_user)):
-    utsavam_id = str(uuid.uuid4())
-    utsavam_doc = {
-        "id": utsavam_id,
-        "user_id": user_id,
-        "user_name": (await db.users.find_one({"id": user_id}, {"_id": 0}))['name'],
-        "name": utsavam_data.get("name"),
-        "date": utsavam_data.get("date"),
-        "place": utsavam_data.get("place"),
-        "time": utsavam_data.get("time", ""),
-        "links": utsavam_data.get("links", []),
-        "description": utsavam_data.get("description", ""),
-        "created_at": datetime.now(timezone.utc).isoformat()
-    }
-    await db.perumal_utsavam.insert_one(utsavam_doc)
-    return utsavam_doc
-
-@api_router.get("/perumal-utsavam")
-async def get_utsavam_list(user_id: str = Depends(get_current_user)):
-    utsavams = await db.perumal_utsavam.find({}, {"_id": 0}).sort("date", 1).to_list(100)
-    return utsavams
-
-@api_router.delete("/perumal-utsavam/{utsavam_id}")
-async def delete_utsavam(utsavam_id: str, user_id: str = Depends(get_current_user)):
-    utsavam = await db.perumal_utsavam.find_one({"id": utsavam_id}, {"_id": 0})
-    if not utsavam or utsavam['user_id'] != user_id:
-        raise HTTPException(status_code=403, detail="Not authorized")
-    await db.perumal_utsavam.delete_one({"id": utsavam_id})
-    return {"message": "Utsavam deleted"}
-
-# Book Review endpoints
-@api_router.post("/book-reviews")
-async def create_book_review(review_data: dict, user_id: str = Depends(get_current_user)):
-    review_id = str(uuid.uuid4())
-    review_doc = {
-        "id": review_id,
-        "user_id": user_id,
-        "user_name": (await db.users.find_one({"id": user_id}, {"_id": 0}))['name'],
-        "book_title": review_data.get("book_title"),
-        "author": review_data.get("author"),
-        "rating": review_data.get("rating", 5),
-        "review": review_data.get("review"),
-        "genre": review_data.get("genre", ""),
-        "created_at": datetime.now(timezone.utc).isoformat()
-    }
-    await db.book_reviews.insert_one(review_doc)
-    return review_doc
-
-@api_router.get("/book-reviews")
-async def get_book_reviews(user_id: str = Depends(get_current_user)):
-    reviews = await db.book_reviews.find({}, {"_id": 0}).sort("created_at", -1).to_list(100)
-    return reviews
-
-@api_router.delete("/book-reviews/{review_id}")
-async def delete_book_review(review_id: str, user_id: str = Depends(get_current_user)):
-    review = await db.book_reviews.find_one({"id": review_id}, {"_id": 0})
-    if not review or review['user_id'] != user_id:
-        raise HTTPException(status_code=403, detail="Not authorized")
-    await db.book_reviews.delete_one({"id": review_id})
-    return {"message": "Review deleted"}
-
-# Hobbies endpoints
-@api_router.post("/hobbies")
-async def create_hobby(hobby_data: dict, user_id: str = Depends(get_current_user)):
-    hobby_id = str(uuid.uuid4())
-    hobby_doc = {
-        "id": hobby_id,
-        "user_id": user_id,
-        "user_name": (await db.users.find_one({"id": user_id}, {"_id": 0}))['name'],
-        "title": hobby_data.get("title"),
-        "category": hobby_data.get("category", "general"),
-        "description": hobby_data.get("description"),
-        "skill_level": hobby_data.get("skill_level", "beginner"),
-        "created_at": datetime.now(timezone.utc).isoformat()
-    }
-    await db.hobbies.insert_one(hobby_doc)
-    return hobby_doc
-
-@api_router.get("/hobbies")
-async def get_hobbies(user_id: str = Depends(get_current_user)):
-    hobbies = await db.hobbies.find({}, {"_id": 0}).sort("created_at", -1).to_list(100)
-    return hobbies
-
-@api_router.delete("/hobbies/{hobby_id}")
-async def delete_hobby(hobby_id: str, user_id: str = Depends(get_current_user)):
-    hobby = await db.hobbies.find_one({"id": hobby_id}, {"_id": 0})
-    if not hobby or hobby['user_id'] != user_id:
-        raise HTTPException(status_code=403, detail="Not authorized")
-    await db.hobbies.delete_one({"id": hobby_id})
-    return {"message": "Hobby deleted"}
+        pass
+    finally:
+        manager.disconnect(connection)
+        await connection.close()
 
-# Gaming Space endpoints
-@api_router.post("/gaming-space")
-async def create_gaming_post(post_data: dict, user_id: str = Depends(get_current_user)):
-    post_id = str(uuid.uuid4())
-    post_doc = {
-        "id": post_id,
-        "user_id": user_id,
-        "user_name": (await db.users.find_one({"id": user_id}, {"_id": 0}))['name'],
-        "game_name": post_data.get("game_name"),
-        "content": post_data.get("content"),
-        "score": post_data.get("score", ""),
-        "game_type": post_data.get("game_type", "online"),
-        "created_at": datetime.now(timezone.utc).isoformat()
-    }
-    await db.gaming_space.insert_one(post_doc)
-    return post_doc
+@api_router.get("/ws/metrics")
+async def get_websocket_metrics(user_id: str = Depends(get_current_user)):
+    """Outbound queue depth and drop counters for this worker's sockets"""
+    return manager.metrics()
 
-@api_router.get("/gaming-space")
-async def get_gaming_posts(user_id: str = Depends(get_current_user)):
-    posts = await db.gaming_space.find({}, {"_id": 0}).sort("created_at", -1).to_list(100)
-    return posts
+# ==================== CONTENT TYPES ====================
 
-@api_router.delete("/gaming-space/{post_id}")
-async def delete_gaming_post(post_id: str, user_id: str = Depends(get_current_user)):
-    post = await db.gaming_space.find_one({"id": post_id}, {"_id": 0})
-    if not post or post['user_id'] != user_id:
-        raise HTTPException(status_code=403, detail="Not authorized")
-    await db.gaming_space.delete_one({"id": post_id})
-    return {"message": "Post deleted"}
+class ContentType:
+    """A family content section: one collection of user-owned items.
 
-# Tournaments endpoints
-@api_router.post("/tournaments")
-async def create_tournament(tournament_data: dict, user_id: str = Depends(get_current_user)):
-    tournament_id = str(uuid.uuid4())
-    tournament_doc = {
-        "id": tournament_id,
-        "user_id": user_id,
-        "user_name": (await db.users.find_one({"id": user_id}, {"_id": 0}))['name'],
-        "name": tournament_data.get("name"),
-        "game": tournament_data.get("game"),
-        "start_date": tournament_data.get("start_date"),
-        "participants": tournament_data.get("participants", []),
-        "winner": tournament_data.get("winner", ""),
-        "status": tournament_data.get("status", "upcoming"),
-        "created_at": datetime.now(timezone.utc).isoformat()
-    }
-    await db.tournaments.insert_one(tournament_doc)
-    return tournament_doc
-
-@api_router.get("/tournaments")
-async def get_tournaments(user_id: str = Depends(get_current_user)):
-    tournaments = await db.tournaments.find({}, {"_id": 0}).sort("start_date", -1).to_list(100)
-    return tournaments
-
-@api_router.put("/tournaments/{tournament_id}")
-async def update_tournament(tournament_id: str, update_data: dict, user_id: str = Depends(get_current_user)):
-    tournament = await db.tournaments.find_one({"id": tournament_id}, {"_id": 0})
-    if not tournament:
-        raise HTTPException(status_code=404, detail="Tournament not found")
-    
-    await db.tournaments.update_one(
-        {"id": tournament_id},
-        {"$set": update_data}
-    )
-    return {"message": "Tournament updated"}
+    `register()` adds the section's routes: create (typed body, author
+    name from the user cache), a cursor-paginated list sorted by
+    `sort_field` over a matching index, and owner-only delete and
+    optional update. An update of someone else's item answers 404, as
+    for a missing one. List responses only carry the declared fields.
+    Sections with a `timeline_kind` or `search_kind` keep the home feed
+    and the search index in step with their writes. `cached` sections
+    serve lists through the response cache, and their writes
+    invalidate it.
+    """
+    def __init__(self, path: str, collection: str, create_model: type, noun: str, *,
+                 sort_field: str = "created_at", direction: int = DESCENDING,
+                 update_model: Optional[type] = None, timeline_kind: Optional[str] = None,
+                 search_kind: Optional[str] = None, cached: bool = False):
+        self.path = path
+        self.collection = collection
+        self.create_model = create_model
+        self.noun = noun
+        self.sort_field = sort_field
+        self.direction = direction
+        self.update_model = update_model
+        self.timeline_kind = timeline_kind
+        self.search_kind = search_kind
+        self.cached = cached
+        fields = ["id", "user_id", "user_name", *create_model.model_fields, "created_at"]
+        self.projection = {"_id": 0, **{field: 1 for field in fields}}
 
-@api_router.delete("/tournaments/{tournament_id}")
-async def delete_tournament(tournament_id: str, user_id: str = Depends(get_current_user)):
-    tournament = await db.tournaments.find_one({"id": tournament_id}, {"_id": 0})
-    if not tournament or tournament['user_id'] != user_id:
-        raise HTTPException(status_code=403, detail="Not authorized")
-    await db.tournaments.delete_one({"id": tournament_id})
-    return {"message": "Tournament deleted"}
-
-# Achievements endpoints
-@api_router.post("/achievements")
-async def create_achievement(achievement_data: dict, user_id: str = Depends(get_current_user)):
-    achievement_id = str(uuid.uuid4())
-    achievement_doc = {
-        "id": achievement_id,
-        "user_id": user_id,
-        "user_name": (await db.users.find_one({"id": user_id}, {"_id": 0}))['name'],
-        "title": achievement_data.get("title"),
-        "description": achievement_data.get("description"),
-        "category": achievement_data.get("category", "personal"),
-        "date": achievement_data.get("date"),
-        "created_at": datetime.now(timezone.utc).isoformat()
-    }
-    await db.achievements.insert_one(achievement_doc)
-    return achievement_doc
-
-@api_router.get("/achievements")
-async def get_achievements(user_id: str = Depends(get_current_user)):
-    achievements = await db.achievements.find({}, {"_id": 0}).sort("created_at", -1).to_list(100)
-    return achievements
-
-@api_router.delete("/achievements/{achievement_id}")
-async def delete_achievement(achievement_id: str, user_id: str = Depends(get_current_user)):
-    achievement = await db.achievements.find_one({"id": achievement_id}, {"_id": 0})
-    if not achievement or achievement['user_id'] != user_id:
-        raise HTTPException(status_code=403, detail="Not authorized")
-    await db.achievements.delete_one({"id": achievement_id})
-    return {"message": "Achievement deleted"}
+    def indexes(self) -> List[IndexModel]:
+        return [
+            IndexModel([("id", ASCENDING)], name="id_unique", unique=True),
+            IndexModel([(self.sort_field, self.direction), ("id", self.direction)], name=f"{self.sort_field}_id"),
+        ]
+
+    async def create(self, body: BaseModel, user_id: str, user_name: str) -> dict:
+        doc = {
+            "id": str(uuid.uuid4()),
+            "user_id": user_id,
+            "user_name": user_name,
+            **body.model_dump(),
+            "created_at": datetime.now(timezone.utc).isoformat()
+        }
+        await db[self.collection].insert_one(doc)
+        doc.pop("_id", None)
+        await self.changed()
+        if self.timeline_kind:
+            await add_to_timeline(self.timeline_kind, doc)
+        if self.search_kind:
+            await index_for_search(self.search_kind, doc)
+        return doc
+
+    async def list(self, page: Page) -> List[dict]:
+        return await page.fetch(db[self.collection], {}, self.sort_field, self.direction, self.projection)
+
+    async def changed(self):
+        if self.cached:
+            await response_cache.bump(self.collection)
+
+    async def update(self, item_id: str, body: BaseModel, user_id: str) -> dict:
+        update_data = body.model_dump(exclude_none=True)
+        owned = {"id": item_id, "user_id": user_id}
+        if update_data:
+            result = await db[self.collection].update_one(owned, {"$set": update_data})
+            found = result.matched_count > 0
+        else:
+            found = await db[self.collection].find_one(owned, {"_id": 1}) is not None
+        if not found:
+            # Someone else's item is reported like a missing one
+            raise HTTPException(status_code=404, detail=f"{self.noun} not found")
+        await self.changed()
+        return {"message": f"{self.noun} updated"}
+
+    async def delete(self, item_id: str, user_id: str) -> dict:
+        result = await db[self.collection].delete_one({"id": item_id, "user_id": user_id})
+        if result.deleted_count == 0:
+            raise HTTPException(status_code=403, detail="Not authorized")
+        await self.changed()
+        if self.timeline_kind:
+            await remove_from_timeline(self.timeline_kind, item_id)
+        if self.search_kind:
+            await remove_from_search(self.search_kind, item_id)
+        return {"message": f"{self.noun} deleted"}
+
+    def register(self, router: APIRouter):
+        INDEX_SPECS[self.collection] = self.indexes()
+        create_model, update_model = self.create_model, self.update_model
+
+        async def create_item(body: create_model, user_id: str = Depends(get_current_user),
+                              user_name: str = Depends(get_current_user_name)):
+            return await self.create(body, user_id, user_name)
+
+        async def list_items(request: Request, page: Page = Depends(page_params()),
+                             user_id: str = Depends(get_current_user)):
+            if self.cached:
+                return await response_cache.serve(request, page.response, (self.collection,), lambda: self.list(page))
+            return await self.list(page)
+
+        async def delete_item(item_id: str, user_id: str = Depends(get_current_user)):
+            return await self.delete(item_id, user_id)
+
+        router.add_api_route(f"/{self.path}", create_item, methods=["POST"], name=f"create_{self.collection}")
+        router.add_api_route(f"/{self.path}", list_items, methods=["GET"], name=f"list_{self.collection}")
+        router.add_api_route(f"/{self.path}/{{item_id}}", delete_item, methods=["DELETE"], name=f"delete_{self.collection}")
+        if update_model:
+            async def update_item(item_id: str, body: update_model, user_id: str = Depends(get_current_user)):
+                return await self.update(item_id, body, user_id)
+            router.add_api_route(f"/{self.path}/{{item_id}}", update_item, methods=["PUT"], name=f"update_{self.collection}")
+
+CONTENT_TYPES = [
+    ContentType("cooking-tips", "cooking_tips", CookingTipCreate, "Tip",
+                timeline_kind="cooking_tip", search_kind="cooking_tip"),
+    ContentType("kolam-tips", "kolam_tips", KolamTipCreate, "Tip",
+                timeline_kind="kolam_tip", search_kind="kolam_tip"),
+    ContentType("perumal-utsavam", "perumal_utsavam", UtsavamCreate, "Utsavam",
+                sort_field="date", direction=ASCENDING, cached=True),
+    ContentType("book-reviews", "book_reviews", BookReviewCreate, "Review", timeline_kind="book_review", cached=True),
+    ContentType("hobbies", "hobbies", HobbyCreate, "Hobby", timeline_kind="hobby"),
+    ContentType("gaming-space", "gaming_space", GamingPostCreate, "Post", timeline_kind="gaming"),
+    ContentType("tournaments", "tournaments", TournamentCreate, "Tournament",
+                sort_field="start_date", update_model=TournamentUpdate),
+    ContentType("achievements", "achievements", AchievementCreate, "Achievement", timeline_kind="achievement"),
+]
+
+for _content_type in CONTENT_TYPES:
+    _content_type.register(api_router)
 
 # Include the router in the main app
 app.include_router(api_router)
@@ -1439,6 +4563,7 @@ app.add_middleware(
     allow_origins=os.environ.get('CORS_ORIGINS', '*').split(','),
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=[NEXT_CURSOR_HEADER],
 )
 
 # Configure logging
@@ -1448,6 +4573,30 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+@app.on_event("startup")
+async def startup_indexes():
+    await ensure_indexes()
+
+@app.on_event("startup")
+async def startup_websockets():
+    await manager.start()
+
+@app.on_event("startup")
+async def startup_migrations():
+    # Backfills can take a while on large collections; run them without
+    # holding up the worker.
+    app.state.migrations_task = asyncio.create_task(run_migrations())
+
+@app.on_event("startup")
+async def startup_family_check():
+    app.state.family_check_task = asyncio.create_task(family_check_loop())
+
 @app.on_event("shutdown")
 async def shutdown_db_client():
-    client.close()
\ No newline at end of file
+    await message_batch.flush()
+    await receipt_batch.flush()
+    app.state.family_check_task.cancel()
+    await manager.stop()
+    client.close()
+    image_executor.shutdown(wait=False, cancel_futures=True)
+    auth_executor.shutdown(wait=False, cancel_futures=True)
\ No newline at end of file
@@ -0,0 +1,218 @@
+import requests
+import sys
+import json
+import time
+import random
+import argparse
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
+
+def percentile(samples, pct):
+    """Nearest-rank percentile of a list of numbers"""
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    rank = max(0, min(len(ordered) - 1, int(round(pct / 100 * len(ordered) + 0.5)) - 1))
+    return ordered[rank]
+
+def summarize(latencies_ms):
+    return {
+        "count": len(latencies_ms),
+        "p50_ms": round(percentile(latencies_ms, 50), 1),
+        "p95_ms": round(percentile(latencies_ms, 95), 1),
+        "p99_ms": round(percentile(latencies_ms, 99), 1),
+        "max_ms": round(max(latencies_ms, default=0), 1)
+    }
+
+class KulikariFamilyAPIBenchmark:
+    def __init__(self, base_url="http://localhost:8001"):
+        self.base_url = base_url
+        self.api_url = f"{base_url}/api"
+        self.results = {}
+
+    def timed(self, method, url, **kwargs):
+        """Run a request and return (latency in ms, response)"""
+        start = time.perf_counter()
+        response = requests.request(method, url, timeout=60, **kwargs)
+        return (time.perf_counter() - start) * 1000, response
+
+    def benchmark_login(self, concurrency=32, requests_per_worker=10):
+        """Login latency under a concurrent burst, plus /health latency alongside it.
+
+        While bcrypt ran on the event loop, /health latency tracked login
+        latency; with hashing in the auth thread pool it should stay flat.
+        """
+        timestamp = datetime.now().strftime('%H%M%S%f')
+        credentials = {"email": f"bench_{timestamp}@kulikarai.com", "password": "bench_password"}
+        self.timed('POST', f"{self.api_url}/auth/register", json={**credentials, "name": "Bench User"})
+
+        def login_worker(_):
+            latencies = []
+            for _ in range(requests_per_worker):
+                latency, response = self.timed('POST', f"{self.api_url}/auth/login", json=credentials)
+                if response.status_code == 200:
+                    latencies.append(latency)
+            return latencies
+
+        health_latencies = []
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency + 1) as pool:
+            futures = [pool.submit(login_worker, i) for i in range(concurrency)]
+            while not all(f.done() for f in futures):
+                latency, _ = self.timed('GET', f"{self.base_url}/health")
+                health_latencies.append(latency)
+                time.sleep(0.05)
+            login_latencies = [latency for f in futures for latency in f.result()]
+        elapsed = time.perf_counter() - started
+
+        result = {
+            "concurrency": concurrency,
+            "logins_per_second": round(len(login_latencies) / elapsed, 1),
+            "login": summarize(login_latencies),
+            "health_during_burst": summarize(health_latencies)
+        }
+        self.results["login"] = result
+        print(f"🔐 Login x{concurrency}: p50 {result['login']['p50_ms']}ms, "
+              f"p99 {result['login']['p99_ms']}ms, {result['logins_per_second']} logins/s; "
+              f"/health p99 {result['health_during_burst']['p99_ms']}ms")
+        return result
+
+    def synthetic_clan(self, members, label):
+        """NDJSON for a clan where every member after the first has a father and,
+        for most, a mother from the previous generations"""
+        lines = []
+        for i in range(members):
+            record = {"id": f"m{i}", "name": f"{label} Member {i}", "gender": "male" if i % 2 == 0 else "female"}
+            if i > 0:
+                record["father_id"] = f"m{((i - 1) // 4) * 2}"
+                if ((i - 1) // 4) * 2 + 1 < i:
+                    record["mother_id"] = f"m{((i - 1) // 4) * 2 + 1}"
+            if i % 2 == 0 and i + 1 < members:
+                record["spouse_id"] = f"m{i + 1}"
+            lines.append(json.dumps(record))
+        return "\n".join(lines) + "\n"
+
+    def bench_headers(self, label):
+        """Register a fresh user and return its auth headers"""
+        timestamp = datetime.now().strftime('%H%M%S%f')
+        credentials = {"email": f"bench_{label}_{timestamp}@kulikarai.com", "password": "bench_password"}
+        self.timed('POST', f"{self.api_url}/auth/register", json={**credentials, "name": f"Bench {label}"})
+        _, response = self.timed('POST', f"{self.api_url}/auth/login", json=credentials)
+        return {"Authorization": f"Bearer {response.json()['token']}"}
+
+    def import_clan(self, headers, size, label):
+        """Import a synthetic clan and wait for the job; returns (job, upload ms)"""
+        body = self.synthetic_clan(size, label)
+        upload_ms, response = self.timed('POST', f"{self.api_url}/family-members/import?format=ndjson",
+                                         data=body.encode(), headers=headers)
+        job = response.json()
+        while job.get("status") == "running":
+            time.sleep(0.2)
+            job = requests.get(f"{self.api_url}/family-members/import/{job['id']}", headers=headers).json()
+        return job, upload_ms
+
+    def benchmark_import_export(self, sizes=(10000, 100000)):
+        """Bulk family import throughput, then full-tree export time per format.
+
+        Imports are added to the target database, so run this against a
+        throwaway deployment.
+        """
+        timestamp = datetime.now().strftime('%H%M%S%f')
+        headers = self.bench_headers("import")
+
+        results = {}
+        for size in sizes:
+            started = time.perf_counter()
+            job, upload_ms = self.import_clan(headers, size, f"Bench {timestamp} {size}")
+            import_seconds = time.perf_counter() - started
+
+            exports = {}
+            for fmt in ("ndjson", "gedcom"):
+                start = time.perf_counter()
+                size_bytes = 0
+                with requests.get(f"{self.api_url}/family-members/export?format={fmt}",
+                                  headers=headers, stream=True, timeout=600) as export:
+                    for chunk in export.iter_content(chunk_size=1 << 16):
+                        size_bytes += len(chunk)
+                exports[fmt] = {"seconds": round(time.perf_counter() - start, 2), "bytes": size_bytes}
+
+            results[size] = {
+                "status": job.get("status"),
+                "imported": job.get("imported"),
+                "upload_ms": round(upload_ms, 1),
+                "import_seconds": round(import_seconds, 2),
+                "members_per_second": round((job.get("imported") or 0) / import_seconds, 1),
+                "export": exports
+            }
+            print(f"🌳 Import {size}: {results[size]['import_seconds']}s "
+                  f"({results[size]['members_per_second']} members/s, {job.get('status')}); "
+                  f"export ndjson {exports['ndjson']['seconds']}s, gedcom {exports['gedcom']['seconds']}s")
+        self.results["import_export"] = results
+        return results
+
+    def benchmark_relations(self, size=50000, queries=500):
+        """Relation path queries between random members of a large clan.
+
+        Reports round-trip latency and the server's own compute time from
+        the Server-Timing header. Like the import benchmark, this adds a
+        clan to the target database.
+        """
+        timestamp = datetime.now().strftime('%H%M%S%f')
+        headers = self.bench_headers("relations")
+        label = f"Bench {timestamp} {size}"
+        self.import_clan(headers, size, label)
+
+        member_ids = []
+        with requests.get(f"{self.api_url}/family-members/export?format=ndjson",
+                          headers=headers, stream=True, timeout=600) as export:
+            for line in export.iter_lines():
+                member = json.loads(line)
+                if member["name"].startswith(label):
+                    member_ids.append(member["id"])
+
+        rng = random.Random(size)
+        latencies, compute = [], []
+        for _ in range(queries):
+            member_id, other_id = rng.choice(member_ids), rng.choice(member_ids)
+            latency, response = self.timed('GET', f"{self.api_url}/family-members/{member_id}/relation/{other_id}",
+                                           headers=headers)
+            if response.status_code == 200:
+                latencies.append(latency)
+                timing = response.headers.get("Server-Timing", "")
+                if "dur=" in timing:
+                    compute.append(float(timing.split("dur=")[1]))
+
+        result = {"members": len(member_ids), "request": summarize(latencies), "compute": summarize(compute)}
+        self.results["relations"] = result
+        print(f"🧬 Relations in {len(member_ids)} members: request p50 {result['request']['p50_ms']}ms, "
+              f"compute p50 {result['compute']['p50_ms']}ms, p99 {result['compute']['p99_ms']}ms")
+        return result
+
+BENCHMARKS = {
+    "login": lambda bench, args: bench.benchmark_login(args.concurrency),
+    "import": lambda bench, args: bench.benchmark_import_export(args.members),
+    "relations": lambda bench, args: bench.benchmark_relations(args.relation_members),
+}
+
+def main():
+    parser = argparse.ArgumentParser(description="Kulikarai API benchmarks")
+    parser.add_argument("--base-url", default="http://localhost:8001")
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--output", default="bench_output.json")
+    parser.add_argument("--members", type=int, nargs="+", default=[10000, 100000],
+                        help="family sizes for the import benchmark")
+    parser.add_argument("--relation-members", type=int, default=50000,
+                        help="family size for the relations benchmark")
+    parser.add_argument("benchmarks", nargs="*", default=list(BENCHMARKS), choices=list(BENCHMARKS))
+    args = parser.parse_args()
+
+    bench = KulikariFamilyAPIBenchmark(args.base_url)
+    for name in args.benchmarks:
+        BENCHMARKS[name](bench, args)
+
+    with open(args.output, 'w') as f:
+        json.dump({"timestamp": datetime.now().isoformat(), "results": bench.results}, f, indent=2)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
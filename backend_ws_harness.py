@@ -0,0 +1,126 @@
+import os
+import sys
+import json
+import time
+import argparse
+import subprocess
+from pathlib import Path
+from datetime import datetime
+
+import requests
+from websockets.sync.client import connect
+
+BACKEND_DIR = Path(__file__).parent / "backend"
+
+class MultiWorkerWebSocketHarness:
+    """Start several API workers and check that chat messages cross between them.
+
+    Each worker is a separate uvicorn process on its own port sharing one
+    MongoDB, which must be a replica set for the `mongo` pub/sub backend.
+    """
+    def __init__(self, workers=3, base_port=8101, backend="mongo"):
+        self.ports = [base_port + i for i in range(workers)]
+        self.backend = backend
+        self.processes = []
+        self.tests_run = 0
+        self.tests_passed = 0
+
+    def log_test(self, name, success, details=""):
+        self.tests_run += 1
+        if success:
+            self.tests_passed += 1
+            print(f"✅ {name}")
+        else:
+            print(f"❌ {name} - {details}")
+
+    def start_workers(self):
+        env = {**os.environ, "WS_PUBSUB_BACKEND": self.backend}
+        for port in self.ports:
+            self.processes.append(subprocess.Popen(
+                [sys.executable, "-m", "uvicorn", "server:app", "--port", str(port)],
+                cwd=BACKEND_DIR,
+                env=env,
+                stdout=subprocess.DEVNULL,
+                stderr=subprocess.DEVNULL
+            ))
+        deadline = time.time() + 30
+        for port in self.ports:
+            while True:
+                try:
+                    requests.get(f"http://127.0.0.1:{port}/health", timeout=1)
+                    break
+                except requests.ConnectionError:
+                    if time.time() > deadline:
+                        raise RuntimeError(f"Worker on port {port} did not start")
+                    time.sleep(0.2)
+
+    def stop_workers(self):
+        for process in self.processes:
+            process.terminate()
+        for process in self.processes:
+            process.wait(timeout=10)
+
+    def register(self, port, label):
+        timestamp = datetime.now().strftime('%H%M%S%f')
+        response = requests.post(f"http://127.0.0.1:{port}/api/auth/register", json={
+            "email": f"ws_{label}_{timestamp}@kulikarai.com",
+            "password": "harness_password",
+            "name": f"WS {label}"
+        })
+        response.raise_for_status()
+        return response.json()
+
+    def open_socket(self, port, user):
+        return connect(f"ws://127.0.0.1:{port}/api/ws/chat/{user['user_id']}?token={user['token']}")
+
+    def receive_message(self, websocket, text, timeout=5.0):
+        """Wait for the chat message with the given text, skipping control frames"""
+        deadline = time.time() + timeout
+        while time.time() < deadline:
+            try:
+                frame = json.loads(websocket.recv(timeout=max(deadline - time.time(), 0.01)))
+            except TimeoutError:
+                break
+            if frame.get("message") == text:
+                return frame
+        return None
+
+    def test_cross_worker_delivery(self):
+        sender = self.register(self.ports[0], "sender")
+        receiver = self.register(self.ports[0], "receiver")
+
+        # The receiver is connected twice, on workers other than the sender's
+        sockets = [self.open_socket(port, receiver) for port in self.ports[1:]]
+        time.sleep(0.5)
+        text = f"harness {time.time()}"
+        requests.post(
+            f"http://127.0.0.1:{self.ports[0]}/api/messages",
+            json={"receiver_id": receiver["user_id"], "message": text},
+            headers={"Authorization": f"Bearer {sender['token']}"}
+        ).raise_for_status()
+
+        for port, websocket in zip(self.ports[1:], sockets):
+            frame = self.receive_message(websocket, text)
+            self.log_test(f"Delivery to socket on worker :{port}", frame is not None, "no frame received")
+            websocket.close()
+
+    def run(self):
+        self.start_workers()
+        try:
+            self.test_cross_worker_delivery()
+        finally:
+            self.stop_workers()
+        print(f"\n📊 Harness Results: {self.tests_passed}/{self.tests_run} passed")
+        return self.tests_passed == self.tests_run
+
+def main():
+    parser = argparse.ArgumentParser(description="Multi-worker WebSocket delivery harness")
+    parser.add_argument("--workers", type=int, default=3)
+    parser.add_argument("--base-port", type=int, default=8101)
+    parser.add_argument("--backend", default="mongo", choices=["mongo", "memory"])
+    args = parser.parse_args()
+    harness = MultiWorkerWebSocketHarness(args.workers, args.base_port, args.backend)
+    return 0 if harness.run() else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -9,7 +9,6 @@ import ReactFlow, {
   MarkerType,
   Position
 } from 'react-flow-renderer';
-import dagre from 'dagre';
 import { AuthContext } from '../App';
 import axios from 'axios';
 import { toast } from 'sonner';
@@ -88,10 +87,12 @@ const FamilyTreeNew = () => {
 
   const fetchFamilyMembers = async () => {
     try {
-      const response = await axios.get(`${API}/family-members`);
-      const fetchedMembers = response.data.members || [];
+      // The hierarchical tree carries every member's fields and position
+      const response = await axios.get(`${API}/family-tree-hierarchical`);
+      const treeNodes = response.data.nodes || [];
+      const fetchedMembers = treeNodes.map((node) => ({ id: node.id, ...node.data }));
       setMembers(fetchedMembers);
-      buildTree(fetchedMembers);
+      buildTree(fetchedMembers, treeNodes);
     } catch (error) {
       console.error('Failed to fetch family members:', error);
       toast.error('Failed to load family tree');
@@ -100,47 +101,20 @@ const FamilyTreeNew = () => {
     }
   };
 
-  const getLayoutedElements = (nodes, edges) => {
-    const dagreGraph = new dagre.graphlib.Graph();
-    dagreGraph.setDefaultEdgeLabel(() => ({}));
-    dagreGraph.setGraph({ 
-      rankdir: 'TB', 
-      ranksep: 120, 
-      nodesep: 60,
-      edgesep: 30,
-      marginx: 40,
-      marginy: 40
-    });
-
-    nodes.forEach((node) => {
-      dagreGraph.setNode(node.id, { width: 180, height: 140 });
-    });
-
-    edges.forEach((edge) => {
-      if (edge.data?.type !== 'spouse') {
-        dagreGraph.setEdge(edge.source, edge.target);
-      }
-    });
-
-    dagre.layout(dagreGraph);
-
-    const layoutedNodes = nodes.map((node) => {
-      const nodeWithPosition = dagreGraph.node(node.id);
-      return {
-        ...node,
-        position: {
-          x: nodeWithPosition.x - 90,
-          y: nodeWithPosition.y - 70,
-        },
-        sourcePosition: Position.Bottom,
-        targetPosition: Position.Top,
-      };
-    });
+  // Node positions come from the backend layout in the hierarchical tree
+  const getLayoutedElements = (nodes, edges, treeNodes) => {
+    const positions = new Map(treeNodes.map((node) => [node.id, node.position]));
+    const layoutedNodes = nodes.map((node) => ({
+      ...node,
+      position: positions.get(node.id) || { x: 0, y: 0 },
+      sourcePosition: Position.Bottom,
+      targetPosition: Position.Top,
+    }));
 
     return { nodes: layoutedNodes, edges };
   };
 
-  const buildTree = (membersData) => {
+  const buildTree = (membersData, treeNodes) => {
     const nodesList = [];
     const edgesList = [];
     const processedSpouses = new Set();
@@ -221,7 +195,7 @@ const FamilyTreeNew = () => {
       }
     });
 
-    const layouted = getLayoutedElements(nodesList, edgesList);
+    const layouted = getLayoutedElements(nodesList, edgesList, treeNodes);
     setNodes(layouted.nodes);
     setEdges(layouted.edges);
   };
@@ -296,10 +270,17 @@ const FamilyTreeNew = () => {
     }
   };
 
-  const onNodeClick = useCallback((event, node) => {
+  const onNodeClick = useCallback(async (event, node) => {
     const member = members.find(m => m.id === node.id);
     setSelectedMember(member);
-  }, [members]);
+    // Tree nodes leave out the bio; load the full record for the details panel
+    try {
+      const response = await axios.get(`${API}/family-members/${node.id}`);
+      setSelectedMember((current) => (current?.id === node.id ? { ...current, ...response.data } : current));
+    } catch (error) {
+      console.error('Failed to fetch family member:', error);
+    }
+  }, [members, API]);
 
   const openEditModal = (member) => {
     setMemberForm({
@@ -147,11 +147,11 @@ const Home = () => {
                     className="w-5 h-5"
                     fill={post.likes.includes(user?.id) ? '#FF6B6B' : 'none'}
                   />
-                  <span className="font-nunito text-sm">{post.likes.length}</span>
+                  <span className="font-nunito text-sm">{post.like_count ?? post.likes.length}</span>
                 </button>
                 <button className="flex items-center space-x-2 text-textSecondary hover:text-coral transition-colors">
                   <MessageCircle className="w-5 h-5" />
-                  <span className="font-nunito text-sm">Comment</span>
+                  <span className="font-nunito text-sm">{post.comment_count ? post.comment_count : 'Comment'}</span>
                 </button>
               </div>
             </motion.div>
@@ -134,7 +134,7 @@ const PhotoDetail = () => {
                     className="w-6 h-6"
                     fill={photo?.likes?.includes(user?.id) ? '#FF6B6B' : 'none'}
                   />
-                  <span className="font-nunito">{photo?.likes?.length || 0}</span>
+                  <span className="font-nunito">{photo?.like_count ?? photo?.likes?.length ?? 0}</span>
                 </button>
                 <div className="flex items-center space-x-2 text-textSecondary">
                   <MessageCircle className="w-6 h-6" />
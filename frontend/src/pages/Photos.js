@@ -101,7 +101,7 @@ const Photos = () => {
               >
                 <div className="bg-white rounded-2xl overflow-hidden shadow-lg hover-lift">
                   <img
-                    src={photo.file_id ? `${API}/photos/file/${photo.file_id}` : photo.url}
+                    src={photo.file_id ? `${API}/photos/file/${photo.file_id}?size=thumb` : photo.url}
                     alt={photo.caption || 'Family photo'}
                     className="w-full h-auto"
                     onError={(e) => {
@@ -115,8 +115,8 @@ const Photos = () => {
                     </div>
                   )}
                   <div className="px-4 pb-4 flex items-center space-x-2 text-textSecondary">
-                    <Heart className="w-4 h-4" fill={photo.likes?.length > 0 ? '#FF6B6B' : 'none'} />
-                    <span className="text-sm font-nunito">{photo.likes?.length || 0}</span>
+                    <Heart className="w-4 h-4" fill={(photo.like_count ?? photo.likes?.length) > 0 ? '#FF6B6B' : 'none'} />
+                    <span className="text-sm font-nunito">{photo.like_count ?? photo.likes?.length ?? 0}</span>
                   </div>
                 </div>
               </motion.div>
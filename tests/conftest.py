@@ -0,0 +1,46 @@
+import os
+import sys
+import uuid
+from pathlib import Path
+
+import pytest
+
+# server.py reads its connection settings at import time; the client
+# connects lazily, so unit tests never reach a real MongoDB.
+os.environ.setdefault("MONGO_URL", "mongodb://localhost:27017")
+os.environ.setdefault("DB_NAME", "kulikarai_test")
+os.environ.setdefault("BCRYPT_ROUNDS", "4")
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "backend"))
+
+
+@pytest.fixture(scope="session")
+def db():
+    """The server's database, swapped for an in-memory mongomock one"""
+    mongomock_motor = pytest.importorskip("mongomock_motor")
+    import server
+    mock_client = mongomock_motor.AsyncMongoMockClient()
+    server.client = mock_client
+    server.db = mock_client[os.environ["DB_NAME"]]
+    return server.db
+
+
+@pytest.fixture(scope="session")
+def client(db):
+    """One app for the whole session: shutdown stops the auth and image pools"""
+    from fastapi.testclient import TestClient
+    import server
+    with TestClient(server.app) as test_client:
+        yield test_client
+
+
+@pytest.fixture
+def signup(client):
+    """Register a fresh user; returns (auth headers, user id)"""
+    def register(name: str = "Test User"):
+        response = client.post("/api/auth/register", json={
+            "email": f"{uuid.uuid4().hex}@example.com", "password": "secret", "name": name
+        })
+        assert response.status_code == 200, response.text
+        body = response.json()
+        return {"Authorization": f"Bearer {body['token']}"}, body["user_id"]
+    return register
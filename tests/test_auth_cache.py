@@ -0,0 +1,77 @@
+from datetime import datetime, timedelta, timezone
+
+import jwt
+import pytest
+from fastapi import HTTPException
+
+import server
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """Stand-in for time.monotonic that tests move forward by hand"""
+    now = [1000.0]
+    monkeypatch.setattr(server.time, "monotonic", lambda: now[0])
+    return now
+
+
+def test_entries_expire_after_their_ttl(clock):
+    cache = server.TTLCache(maxsize=10, ttl=60)
+    cache.set("a", 1)
+    cache.set("b", 2, ttl=5)
+    cache.set("c", 3, ttl=600)
+    clock[0] += 10
+    assert (cache.get("a"), cache.get("b", "gone")) == (1, "gone")
+    clock[0] += 60
+    assert cache.get("a") is None
+    assert cache.get("c") is None, "a longer ttl is capped at the cache's own"
+    assert len(cache) == 0
+
+
+def test_least_recently_used_entry_is_evicted_first(clock):
+    cache = server.TTLCache(maxsize=2, ttl=60)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    cache.get("a")
+    cache.set("c", 3)
+    assert (cache.get("a"), cache.get("b"), cache.get("c")) == (1, None, 3)
+    cache.pop("a")
+    cache.pop("missing")
+    assert len(cache) == 1
+    cache.clear()
+    assert cache.get("c") is None
+
+
+def test_verified_token_is_cached():
+    server.token_cache.clear()
+    token = server.create_token("user-1")
+    assert server.verify_token(token) == "user-1"
+    assert server.token_cache.get(token) == "user-1"
+
+
+def test_token_is_not_cached_past_its_expiry(clock):
+    server.token_cache.clear()
+    expires = datetime.now(timezone.utc) + timedelta(seconds=30)
+    token = jwt.encode({"user_id": "user-2", "exp": expires}, server.JWT_SECRET, algorithm=server.JWT_ALGORITHM)
+    assert server.verify_token(token) == "user-2"
+    clock[0] += 31
+    assert server.token_cache.get(token) is None
+
+
+@pytest.mark.parametrize("token", [
+    "not-a-jwt",
+    jwt.encode({"user_id": "user-3"}, "some other secret", algorithm="HS256"),
+    jwt.encode({"user_id": "user-4", "exp": datetime.now(timezone.utc) - timedelta(seconds=1)},
+               server.JWT_SECRET, algorithm=server.JWT_ALGORITHM),
+])
+def test_invalid_tokens_are_rejected_and_not_cached(token):
+    with pytest.raises(HTTPException) as raised:
+        server.verify_token(token)
+    assert raised.value.status_code == 401
+    assert server.token_cache.get(token) is None
+
+
+def test_requests_need_a_valid_token(client, signup):
+    headers, user_id = signup()
+    assert client.get("/api/auth/me", headers=headers).json()["id"] == user_id
+    assert client.get("/api/auth/me", headers={"Authorization": "Bearer nope"}).status_code == 401
@@ -0,0 +1,21 @@
+def test_only_the_owner_can_update_a_tournament(client, signup):
+    owner, _ = signup("Owner")
+    other, _ = signup("Other")
+    created = client.post("/api/tournaments", json={"name": "Carrom", "start_date": "2026-01-14"}, headers=owner)
+    assert created.status_code == 200, created.text
+    tournament_id = created.json()["id"]
+
+    response = client.put(f"/api/tournaments/{tournament_id}", json={"winner": "Other"}, headers=other)
+    assert response.status_code == 404
+    assert response.json()["detail"] == "Tournament not found"
+
+    response = client.put(f"/api/tournaments/{tournament_id}", json={"winner": "Owner"}, headers=owner)
+    assert response.status_code == 200
+    listed = client.get("/api/tournaments", headers=owner).json()
+    assert next(item for item in listed if item["id"] == tournament_id)["winner"] == "Owner"
+
+
+def test_updating_a_missing_tournament_is_not_found(client, signup):
+    headers, _ = signup()
+    response = client.put("/api/tournaments/missing", json={"status": "done"}, headers=headers)
+    assert response.status_code == 404
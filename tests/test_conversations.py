@@ -0,0 +1,69 @@
+import uuid
+
+import server
+
+
+def message(message_id, created_at, sender_id, receiver_id):
+    return {"id": message_id, "sender_id": sender_id, "receiver_id": receiver_id, "group_id": "",
+            "message": message_id, "created_at": created_at, "read": False}
+
+
+def summary_after(client, writes, summary_id):
+    async def write_and_read():
+        if writes:
+            await server.db.conversations.bulk_write(writes, ordered=True)
+        return await server.db.conversations.find_one({"id": summary_id}, {"_id": 0})
+    return client.portal.call(write_and_read)
+
+
+def test_a_late_write_of_an_older_message_keeps_the_newer_one(client):
+    a, b = uuid.uuid4().hex, uuid.uuid4().hex
+    newer = message("m2", "2026-02-01T00:00:00+00:00", a, b)
+    older = message("m1", "2026-01-01T00:00:00+00:00", a, b)
+    summary = summary_after(client, [server.conversation_update(b, a, newer, unread_inc=1),
+                                     server.conversation_update(b, a, older, unread_inc=1)], f"{b}:{a}")
+    assert summary["last_message"]["id"] == "m2"
+    assert summary["last_message_at"] == newer["created_at"]
+    assert summary["unread_count"] == 2
+    assert (summary["user_id"], summary["partner_id"]) == (b, a)
+
+
+def test_read_receipts_never_take_the_unread_count_below_zero(client):
+    a, b = uuid.uuid4().hex, uuid.uuid4().hex
+    last = message("m1", "2026-01-01T00:00:00+00:00", a, b)
+    summary_after(client, [server.conversation_update(a, b, last),
+                           server.conversation_update(b, a, last, unread_inc=1)], f"{b}:{a}")
+    summary = summary_after(client, server.conversation_read(b, a, ["m1", "m0", "gone"]), f"{b}:{a}")
+    assert summary["unread_count"] == 0
+    assert summary["last_message"]["read"] is True
+    assert summary_after(client, [], f"{a}:{b}")["last_message"]["read"] is True
+
+
+def test_read_receipts_for_older_messages_leave_the_last_one_unread(client):
+    a, b = uuid.uuid4().hex, uuid.uuid4().hex
+    first = message("m1", "2026-01-01T00:00:00+00:00", a, b)
+    second = message("m2", "2026-01-02T00:00:00+00:00", a, b)
+    summary_after(client, [server.conversation_update(b, a, first, unread_inc=1),
+                           server.conversation_update(b, a, second, unread_inc=1)], f"{b}:{a}")
+    summary = summary_after(client, server.conversation_read(b, a, ["m1"]), f"{b}:{a}")
+    assert summary["unread_count"] == 1
+    assert summary["last_message"]["read"] is False
+
+
+def test_inbox_follows_sent_and_opened_messages(client, signup):
+    alice, alice_id = signup("Alice")
+    bob, bob_id = signup("Bob")
+    for text in ("hi", "are you there?"):
+        assert client.post("/api/messages", json={"receiver_id": bob_id, "message": text},
+                           headers=alice).status_code == 200
+
+    inbox = client.get("/api/messages/conversations", headers=bob).json()["conversations"]
+    assert [(item["partner_id"], item["message"], item["unread_count"]) for item in inbox] == \
+        [(alice_id, "are you there?", 2)]
+
+    assert len(client.get(f"/api/messages/{alice_id}", headers=bob).json()) == 2
+    inbox = client.get("/api/messages/conversations", headers=bob).json()["conversations"]
+    assert inbox[0]["unread_count"] == 0
+    assert inbox[0]["read"] is True
+    sent = client.get("/api/messages/conversations", headers=alice).json()["conversations"]
+    assert [(item["partner_id"], item["unread_count"], item["read"]) for item in sent] == [(bob_id, 0, True)]
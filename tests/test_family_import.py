@@ -0,0 +1,109 @@
+import json
+import time
+import uuid
+
+import server
+
+
+def run_import(client, headers, body: str, fmt: str) -> dict:
+    job = client.post("/api/family-members/import", params={"format": fmt}, content=body.encode(), headers=headers)
+    assert job.status_code == 202, job.text
+    for _ in range(100):
+        status = client.get(f"/api/family-members/import/{job.json()['id']}", headers=headers).json()
+        if status["status"] != "running":
+            return status
+        time.sleep(0.02)
+    raise AssertionError("import did not finish")
+
+
+def exported(client, headers, fmt: str) -> str:
+    response = client.get("/api/family-members/export", params={"format": fmt}, headers=headers)
+    assert response.status_code == 200
+    return response.text
+
+
+def members_named(client, headers, tag: str) -> dict:
+    """Exported members whose name carries the test's tag, by first name"""
+    members = [json.loads(line) for line in exported(client, headers, "ndjson").splitlines()]
+    return {member["name"].split()[0]: member for member in members if tag in member.get("name", "")}
+
+
+def test_gedcom_round_trip_keeps_people_and_families(tmp_path):
+    members = [
+        {"id": "f", "name": "Raman K", "gender": "male", "birth_date": "1 JAN 1950", "spouse_id": "m"},
+        {"id": "m", "name": "Lakshmi R", "gender": "female", "spouse_id": "f", "bio": "Teacher\nGardener"},
+        {"id": "c", "name": "Selvi R", "gender": "female", "father_id": "f", "mother_id": "m",
+         "death_date": "2020", "photo_url": "https://example.com/selvi.jpg"},
+        {"id": "s", "name": "Single Parent Child", "gender": "unknown", "mother_id": "m"},
+    ]
+    path = tmp_path / "tree.ged"
+    path.write_text("".join(server.gedcom_lines(members)), encoding="utf-8")
+
+    job = server.FamilyImport("job", str(path), "gedcom", "user")
+    job.scan({})
+    docs, links = job.read_batch(server.read_import_records(str(path), "gedcom"), "now", set())
+    assert links == [] and job.errors == []
+    by_name = {doc["name"]: doc for doc in docs}
+    ids = {member["id"]: by_name[member["name"]]["id"] for member in members}
+    for member in members:
+        doc = by_name[member["name"]]
+        for field in ("gender", "birth_date", "death_date", "bio", "photo_url"):
+            assert doc[field] == member.get(field, ""), field
+        for field in ("father_id", "mother_id", "spouse_id"):
+            assert doc[field] == ids.get(member.get(field), ""), field
+
+
+def test_ndjson_import_links_lines_and_exports_them_back(client, signup):
+    headers, _ = signup()
+    tag = uuid.uuid4().hex[:8]
+    lines = [
+        {"id": "1", "name": f"Arun {tag}", "gender": "male", "spouse_id": "2"},
+        {"id": "2", "name": f"Bama {tag}", "gender": "female"},
+        {"id": "3", "name": f"Chitra {tag}", "father_id": "1", "mother_id": "2", "birth_date": "2001-02-03"},
+        "not an object",
+        {"id": "5", "name": "  "},
+    ]
+    body = "\n".join(json.dumps(line) for line in lines) + "\n{broken\n"
+    status = run_import(client, headers, body, "ndjson")
+    assert (status["status"], status["imported"], status["error_count"]) == ("done", 3, 3)
+
+    found = members_named(client, headers, tag)
+    assert set(found) == {"Arun", "Bama", "Chitra"}
+    assert found["Arun"]["spouse_id"] == found["Bama"]["id"]
+    assert found["Bama"]["spouse_id"] == found["Arun"]["id"]
+    assert (found["Chitra"]["father_id"], found["Chitra"]["mother_id"]) == (found["Arun"]["id"], found["Bama"]["id"])
+
+    # The export reads straight back in, merging into the same people
+    export = "".join(json.dumps(member) + "\n" for member in found.values())
+    again = run_import(client, headers, export, "ndjson")
+    assert (again["imported"], again["merged"], again["unresolved"]) == (0, 3, 0)
+    assert members_named(client, headers, tag) == found
+
+
+def test_imported_records_link_to_the_members_they_merge_into(client, signup):
+    headers, _ = signup()
+    tag = uuid.uuid4().hex[:8]
+    created = client.post("/api/family-members", json={"name": f"Devi {tag}", "gender": "female"}, headers=headers)
+    devi_id = created.json()["member"]["id"]
+
+    body = "".join(json.dumps(line) + "\n" for line in [
+        {"id": "a", "name": f"devi  {tag.upper()}", "spouse_id": "b"},
+        {"id": "b", "name": f"Elango {tag}", "gender": "male"},
+        {"id": "c", "name": f"Gowri {tag}", "mother_id": "a", "father_id": "b"},
+    ])
+    status = run_import(client, headers, body, "ndjson")
+    assert (status["imported"], status["merged"]) == (2, 1)
+
+    found = members_named(client, headers, tag)
+    assert found["Devi"]["id"] == devi_id
+    assert found["Devi"]["spouse_id"] == found["Elango"]["id"]
+    assert found["Elango"]["spouse_id"] == devi_id
+    assert found["Gowri"]["mother_id"] == devi_id
+
+
+def test_gedcom_export_is_a_complete_file(client, signup):
+    headers, _ = signup()
+    text = exported(client, headers, "gedcom")
+    assert text.startswith("0 HEAD\n")
+    assert text.endswith("0 TRLR\n")
+    assert client.get("/api/family-members/export", params={"format": "csv"}, headers=headers).status_code == 400
@@ -0,0 +1,130 @@
+import asyncio
+
+import server
+
+
+def clan(size):
+    """Couples (m0, m1), (m2, m3), ... where each member after the root couple is
+    a child of an earlier couple"""
+    members = []
+    for i in range(size):
+        member = {"id": f"m{i}", "name": f"Member {i}", "gender": "male" if i % 2 == 0 else "female"}
+        if i > 1:
+            couple = (i - 2) // 4
+            member["father_id"] = f"m{couple * 2}"
+            member["mother_id"] = f"m{couple * 2 + 1}"
+        if i % 2 == 0 and i + 1 < size:
+            member["spouse_id"] = f"m{i + 1}"
+        members.append(member)
+    return members
+
+
+def layout(graph, blocks=None):
+    return server.tree_layout(graph, blocks or {})
+
+
+def test_positions_are_distinct_and_children_sit_below_parents():
+    graph = server.FamilyGraph()
+    graph.load(clan(200))
+    positions = layout(graph)[0]["positions"]
+    assert len({(p["x"], p["y"]) for p in positions.values()}) == 200
+    for member in graph.members.values():
+        for parent_id in graph.parent_ids(member["id"]):
+            assert positions[member["id"]]["y"] > positions[parent_id]["y"]
+
+
+def test_spouses_share_a_row_side_by_side():
+    graph = server.FamilyGraph()
+    graph.load(clan(50))
+    positions = layout(graph)[0]["positions"]
+    husband, wife = positions["m10"], positions["m11"]
+    assert husband["y"] == wife["y"]
+    assert wife["x"] - husband["x"] == server.LAYOUT_NODE_WIDTH + server.LAYOUT_NODE_GAP
+
+
+def test_cached_blocks_give_the_same_layout_as_a_fresh_build():
+    graph = server.FamilyGraph()
+    graph.load(clan(500))
+    _, blocks = layout(graph)
+    graph.patch("m301", {"father_id": "m20"})
+    graph.patch("m7", {"name": "Renamed"})
+    assert layout(graph, blocks)[0] == layout(graph)[0]
+
+
+def test_leaf_edit_only_recomputes_blocks_on_its_path(monkeypatch):
+    graph = server.FamilyGraph()
+    graph.load(clan(2000))
+    _, blocks = layout(graph)
+    built = []
+    original = server.layout_block
+    monkeypatch.setattr(server, "layout_block", lambda *args: built.append(args) or original(*args))
+    graph.upsert({"id": "new", "name": "Newborn", "father_id": "m1500"})
+    layout(graph, blocks)
+    # The new unit, then each unit from its parent up to the root
+    assert 0 < len(built) <= 12
+
+
+def test_parent_cycles_do_not_hang_the_layout():
+    graph = server.FamilyGraph()
+    graph.load([
+        {"id": "a", "name": "A", "father_id": "b"},
+        {"id": "b", "name": "B", "father_id": "a"},
+        {"id": "c", "name": "C", "father_id": "a"},
+    ])
+    positions = layout(graph)[0]["positions"]
+    assert set(positions) == {"a", "b", "c"}
+
+
+def test_in_law_parents_start_above_the_child_they_married_into():
+    members = clan(30) + [
+        {"id": "inlaw_father", "name": "In-law", "gender": "male"},
+    ]
+    graph = server.FamilyGraph()
+    graph.load(members)
+    graph.patch("m21", {"father_id": "inlaw_father", "mother_id": ""})
+    positions = layout(graph)[0]["positions"]
+    assert positions["inlaw_father"]["y"] < positions["m21"]["y"]
+
+
+def test_snapshot_is_rebuilt_after_edits_and_reused_otherwise():
+    graph = server.FamilyGraph()
+    graph.load(clan(40), version=1)
+
+    async def run():
+        first = await graph.snapshot()
+        assert await graph.snapshot() is first
+        graph.patch("m5", {"name": "Changed"})
+        second = await graph.snapshot()
+        assert second is not first
+        assert any(node["data"]["name"] == "Changed" for node in second["nodes"])
+        body = await graph.snapshot_body()
+        assert b'"Changed"' in body
+    asyncio.run(run())
+
+
+def test_in_law_links_do_not_pass_over_siblings():
+    graph = server.FamilyGraph()
+    graph.load([
+        {"id": "p", "name": "Parent", "gender": "male", "spouse_id": "pw"},
+        {"id": "pw", "name": "Parent Wife", "gender": "female", "spouse_id": "p"},
+        {"id": "a", "name": "Elder", "gender": "male", "birth_date": "1950", "father_id": "p", "spouse_id": "s"},
+        {"id": "b", "name": "Younger", "gender": "male", "birth_date": "1960", "father_id": "p"},
+        {"id": "b1", "name": "Younger's Child", "father_id": "b"},
+        {"id": "s", "name": "Spouse", "gender": "female", "father_id": "q", "spouse_id": "a"},
+        {"id": "q", "name": "In-law", "gender": "male"},
+    ])
+    positions = layout(graph)[0]["positions"]
+    # The in-law's link to the elder child's wife doesn't pass over the
+    # younger child: the elder child is on the side of the in-law tree
+    assert (positions["q"]["x"] > positions["p"]["x"]) == (positions["a"]["x"] > positions["b"]["x"])
+
+
+def test_birth_order_is_kept_when_no_link_pulls_a_sibling():
+    graph = server.FamilyGraph()
+    graph.load([
+        {"id": "p", "name": "Parent"},
+        {"id": "a", "name": "Elder", "birth_date": "1950", "father_id": "p"},
+        {"id": "b", "name": "Younger", "birth_date": "1960", "father_id": "p"},
+    ])
+    positions = layout(graph)[0]["positions"]
+    assert positions["a"]["x"] < positions["b"]["x"]
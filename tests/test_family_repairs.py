@@ -0,0 +1,84 @@
+import uuid
+
+import server
+
+
+def member(member_id, father="", mother="", spouse=""):
+    return {"id": member_id, "name": member_id, "father_id": father, "mother_id": mother, "spouse_id": spouse}
+
+
+def test_clean_tree_needs_no_repairs():
+    members = {"a": member("a", spouse="b"), "b": member("b", spouse="a"), "c": member("c", "a", "b")}
+    assert server.find_family_repairs(members) == ({}, {"dangling": 0, "spouses": 0, "cycles": 0})
+
+
+def test_dangling_and_self_references_are_cleared():
+    members = {"a": member("a", father="gone", spouse="a"), "b": member("b", mother="b")}
+    fixes, counts = server.find_family_repairs(members)
+    assert fixes == {"a": {"father_id": "", "spouse_id": ""}, "b": {"mother_id": ""}}
+    assert counts["dangling"] == 3
+    assert members["a"]["father_id"] == ""
+
+
+def test_one_sided_spouse_is_completed_when_the_partner_is_free():
+    members = {"a": member("a", spouse="b"), "b": member("b")}
+    fixes, counts = server.find_family_repairs(members)
+    assert fixes == {"b": {"spouse_id": "a"}}
+    assert counts["spouses"] == 1
+
+
+def test_one_sided_spouse_is_dropped_when_the_partner_is_taken():
+    members = {"a": member("a", spouse="b"), "b": member("b", spouse="c"), "c": member("c", spouse="b")}
+    fixes, _ = server.find_family_repairs(members)
+    assert fixes == {"a": {"spouse_id": ""}}
+
+
+def test_parent_cycle_is_broken_once():
+    members = {"a": member("a", father="c"), "b": member("b", father="a"), "c": member("c", father="b")}
+    fixes, counts = server.find_family_repairs(members)
+    assert counts["cycles"] == 1
+    assert len(fixes) == 1
+    graph = server.FamilyGraph.frozen(list(members.values()), 0)
+    assert all(member_id not in graph.ancestry(parent_id)
+               for member_id, doc in members.items() for parent_id in (doc["father_id"],) if parent_id)
+
+
+def test_mutation_patches_its_own_graph(client):
+    prefix = uuid.uuid4().hex
+    a, b, c = (f"{prefix}-{name}" for name in "abc")
+
+    async def marry_and_release():
+        docs = [member(a, spouse=b), member(b, spouse=a), member(c)]
+        await server.db.family_members.insert_many([dict(doc) for doc in docs])
+        graph = server.FamilyGraph()
+        graph.load(docs, await server.read_version(server.FamilyGraph.COUNTER))
+        global_version = server.family_graph.version
+        mutation = server.FamilyMutation(graph)
+        mutation.marry(a, c)
+        await mutation.commit()
+        stored = {doc["id"]: doc["spouse_id"]
+                  async for doc in server.db.family_members.find({"id": {"$in": [a, b, c]}})}
+        return graph, global_version, stored
+
+    graph, global_version, stored = client.portal.call(marry_and_release)
+    assert stored == {a: c, b: "", c: a}
+    assert graph.version is not None
+    assert {key: graph.members[key]["spouse_id"] for key in (a, b, c)} == stored
+    assert server.family_graph.version == global_version
+
+
+def test_mutation_reloads_a_graph_that_missed_a_write(client):
+    prefix = uuid.uuid4().hex
+    a, b = f"{prefix}-a", f"{prefix}-b"
+
+    async def marry_behind_the_graphs_back():
+        await server.db.family_members.insert_many([member(a), member(b, spouse="elsewhere")])
+        graph = server.FamilyGraph()
+        graph.load([member(a), member(b)], await server.read_version(server.FamilyGraph.COUNTER))
+        mutation = server.FamilyMutation(graph)
+        mutation.set(b, {"spouse_id": a}, expect={"spouse_id": ""})
+        await mutation.commit()
+        return graph
+
+    graph = client.portal.call(marry_behind_the_graphs_back)
+    assert graph.version is None
@@ -0,0 +1,31 @@
+import asyncio
+
+from pymongo import ASCENDING
+
+import server
+
+
+def test_declared_indexes_leave_no_drift(db):
+    async def create_and_check():
+        # What GridFS does on the first upload, under the driver's own names,
+        # unless the index is already there
+        if "filename_1_uploadDate_1" not in await db["fs.files"].index_information():
+            await db["fs.files"].create_index([("filename", ASCENDING), ("uploadDate", ASCENDING)])
+        if "files_id_1_n_1" not in await db["fs.chunks"].index_information():
+            await db["fs.chunks"].create_index([("files_id", ASCENDING), ("n", ASCENDING)], unique=True)
+        await server.ensure_indexes()
+        return await server.check_index_drift()
+    drift = asyncio.run(create_and_check())
+    assert "fs.files" not in drift
+    assert "fs.chunks" not in drift
+    assert drift == {}
+
+
+def test_undeclared_index_is_reported_as_extra(db):
+    async def create_and_check():
+        await server.ensure_indexes()
+        await db.events.create_index([("title", ASCENDING)], name="title")
+        return await server.check_index_drift()
+    drift = asyncio.run(create_and_check())
+    assert drift["events"] == {"missing": [], "mismatched": [], "extra": ["title"]}
+    asyncio.run(db.events.drop_index("title"))
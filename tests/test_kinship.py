@@ -0,0 +1,85 @@
+import pytest
+
+import server
+
+
+def person(member_id, gender, father="", mother="", spouse=""):
+    return {"id": member_id, "name": member_id.title(), "gender": gender,
+            "father_id": father, "mother_id": mother, "spouse_id": spouse}
+
+
+@pytest.fixture
+def family():
+    graph = server.FamilyGraph()
+    graph.load([
+        person("grandpa", "male", spouse="grandma"),
+        person("grandma", "female", spouse="grandpa"),
+        person("father", "male", "grandpa", "grandma", spouse="mother"),
+        person("mother", "female", spouse="father"),
+        person("halfmother", "female"),
+        person("aunt", "female", "grandpa", "grandma", spouse="uncle"),
+        person("uncle", "male", spouse="aunt"),
+        person("me", "male", "father", "mother", spouse="wife"),
+        person("sister", "female", "father", "mother"),
+        person("halfbrother", "male", "father", "halfmother"),
+        person("cousin", "female", "uncle", "aunt"),
+        person("cousinson", "male", mother="cousin"),
+        person("wife", "female", "fatherinlaw", spouse="me"),
+        person("fatherinlaw", "male"),
+        person("stranger", "other"),
+    ])
+    return graph
+
+
+@pytest.mark.parametrize("n, word", [
+    (1, "first"), (3, "third"), (10, "tenth"), (11, "11th"), (12, "12th"), (13, "13th"),
+    (21, "21st"), (22, "22nd"), (23, "23rd"), (24, "24th"), (101, "101st"), (111, "111th"), (112, "112th"),
+])
+def test_ordinal_suffixes(n, word):
+    assert server.ordinal(n) == word
+
+
+@pytest.mark.parametrize("up, down, gender, relation", [
+    (0, 0, "male", "self"),
+    (0, 3, "female", "great-granddaughter"),
+    (4, 0, None, "great-great-grandparent"),
+    (1, 3, "male", "great-nephew"),
+    (2, 2, None, "first cousin"),
+    (3, 5, None, "second cousin twice removed"),
+    (2, 6, None, "first cousin 4 times removed"),
+    (22, 23, None, "21st cousin once removed"),
+])
+def test_blood_relation_names(up, down, gender, relation):
+    assert server.blood_relation(up, down, gender) == relation
+
+
+@pytest.mark.parametrize("other_id, relation", [
+    ("sister", "sister"),
+    ("grandpa", "grandfather"),
+    ("aunt", "aunt"),
+    ("cousin", "first cousin"),
+    ("cousinson", "first cousin once removed"),
+    ("halfbrother", "half-brother"),
+    ("wife", "wife"),
+    ("fatherinlaw", "father-in-law"),
+    ("uncle", "uncle"),
+    ("halfmother", "relative by marriage"),
+    ("stranger", "not related"),
+])
+def test_kinship_from_me(family, other_id, relation):
+    assert server.kinship(family, "me", other_id)["relation"] == relation
+
+
+def test_kinship_is_named_from_the_other_side(family):
+    assert server.kinship(family, "aunt", "me")["relation"] == "nephew"
+    assert server.kinship(family, "fatherinlaw", "me")["relation"] == "son-in-law"
+
+
+def test_kinship_describes_the_path_through_the_common_ancestor(family):
+    found = server.kinship(family, "me", "cousin")
+    assert found["description"] == "Cousin is Me's first cousin"
+    grandparent = found["common_ancestor"]["id"]
+    assert grandparent in ("grandpa", "grandma")
+    assert [step["id"] for step in found["path"]] == ["me", "father", grandparent, "aunt", "cousin"]
+    assert [step["step"] for step in found["path"]][:2] == ["self", "father"]
+    assert [step["step"] for step in found["path"]][3:] == ["daughter", "daughter"]
@@ -0,0 +1,60 @@
+import uuid
+
+import server
+
+
+def toggles(client, users, limit, start=None):
+    """Apply toggle_pipeline for each user in turn; returns the item after each"""
+    collection = server.db[f"toggles_{uuid.uuid4().hex}"]
+
+    async def run():
+        await collection.insert_one({"id": "item", **(start or {})})
+        states = []
+        for user_id in users:
+            await collection.update_one({"id": "item", "likes_overflow": {"$ne": True}},
+                                        server.toggle_pipeline("likes", "like_count", user_id, limit))
+            states.append(await collection.find_one({"id": "item"}, {"_id": 0, "id": 0}))
+        return states
+    return client.portal.call(run)
+
+
+def test_toggle_adds_then_removes(client):
+    states = toggles(client, ["a", "b", "a"], None)
+    assert states == [{"likes": ["a"], "like_count": 1},
+                      {"likes": ["a", "b"], "like_count": 2},
+                      {"likes": ["b"], "like_count": 1}]
+
+
+def test_toggle_flags_overflow_instead_of_growing_a_full_array(client):
+    states = toggles(client, ["a", "b", "c", "d"], 2)
+    assert states[1] == {"likes": ["a", "b"], "likes_overflow": False, "like_count": 2}
+    assert states[2] == {"likes": ["a", "b"], "likes_overflow": True, "like_count": 2}
+    assert states[3] == states[2], "an overflowed item is no longer toggled inline"
+
+
+def test_unlike_on_a_full_array_does_not_overflow(client):
+    states = toggles(client, ["b"], 2, start={"likes": ["a", "b"], "like_count": 2})
+    assert states == [{"likes": ["a"], "likes_overflow": False, "like_count": 1}]
+
+
+def test_overflowed_item_toggles_in_the_likes_collection(client):
+    item_id = uuid.uuid4().hex
+
+    async def like_twice():
+        await server.db.posts.insert_one({"id": item_id, "likes": ["a", "b"], "like_count": 2,
+                                          "likes_overflow": True})
+        await server.db.likes.insert_many([{"target": f"posts:{item_id}", "user_id": user_id}
+                                           for user_id in ("a", "b")])
+        states = [await server.toggle_like("posts", item_id, user_id) for user_id in ("c", "a")]
+        viewed = await server.resolve_viewer_likes("posts", [
+            {"id": item_id, "likes": ["a"], "likes_overflow": True}, {"id": "inline", "likes": ["a"]}
+        ], "a")
+        return states, viewed
+
+    states, viewed = client.portal.call(like_twice)
+    assert states == [{"added": True, "count": 3}, {"added": False, "count": 2}]
+    assert viewed == [{"id": item_id, "likes": []}, {"id": "inline", "likes": ["a"]}]
+
+
+def test_toggle_like_on_a_missing_item(client):
+    assert client.portal.call(server.toggle_like, "posts", "missing", "a") is None
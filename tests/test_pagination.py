@@ -0,0 +1,67 @@
+import uuid
+
+import pytest
+from fastapi import HTTPException, Response
+from pymongo import ASCENDING, DESCENDING
+
+import server
+
+
+def test_cursor_round_trip():
+    cursor = server.encode_cursor({"id": "a1", "date": "2026-01-14", "name": "x"}, "date")
+    assert "=" not in cursor
+    assert server.decode_cursor(cursor) == ("2026-01-14", "a1")
+    assert server.decode_cursor(server.encode_cursor({"id": "a2"}, "date")) == (None, "a2")
+
+
+@pytest.mark.parametrize("cursor", ["!!", "bm90IGpzb24", server.encode_cursor({"id": "a"}, "date")[:-2]])
+def test_bad_cursor_is_rejected(cursor):
+    with pytest.raises(HTTPException) as raised:
+        server.decode_cursor(cursor)
+    assert raised.value.status_code == 400
+
+
+def test_after_cursor_handles_null_sort_values():
+    assert server.after_cursor("date", ASCENDING, None, "b") == {
+        "$or": [{"date": None, "id": {"$gt": "b"}}, {"date": {"$ne": None}}]
+    }
+    assert server.after_cursor("date", DESCENDING, None, "b") == {"$or": [{"date": None, "id": {"$lt": "b"}}]}
+    assert server.after_cursor("date", DESCENDING, "x", "b") == {
+        "$or": [{"date": "x", "id": {"$lt": "b"}}, {"date": {"$lt": "x"}}, {"date": None}]
+    }
+
+
+@pytest.mark.parametrize("direction", [ASCENDING, DESCENDING])
+def test_pages_visit_every_document_once_in_order(client, direction):
+    collection = server.db[f"pages_{uuid.uuid4().hex}"]
+    docs = [{"id": f"{i:02}", "date": [None, "2026-01", "2026-02"][i % 3]} for i in range(20)]
+    docs[4].pop("date")
+
+    async def read_all():
+        await collection.insert_many([dict(doc) for doc in docs])
+        seen, cursor = [], None
+        while True:
+            response = Response()
+            page = server.Page(cursor, 3, response)
+            seen.append(await page.fetch(collection, {}, "date", direction))
+            cursor = response.headers.get(server.NEXT_CURSOR_HEADER)
+            if not cursor:
+                return seen
+
+    pages = client.portal.call(read_all)
+    assert all(len(page) == 3 for page in pages[:-1])
+    order = [(doc.get("date") or "", doc["id"]) for page in pages for doc in page]
+    assert order == sorted(((doc.get("date") or "", doc["id"]) for doc in docs), reverse=direction == DESCENDING)
+
+
+def test_list_endpoint_pages_through_the_cursor_header(client, signup):
+    headers, _ = signup()
+    name = uuid.uuid4().hex
+    for day in range(1, 6):
+        client.post("/api/tournaments", json={"name": name, "start_date": f"2099-01-0{day}"}, headers=headers)
+    first = client.get("/api/tournaments", params={"limit": 2}, headers=headers)
+    assert [item["start_date"] for item in first.json()] == ["2099-01-05", "2099-01-04"]
+    cursor = first.headers[server.NEXT_CURSOR_HEADER]
+    second = client.get("/api/tournaments", params={"limit": 2, "cursor": cursor}, headers=headers)
+    assert [item["start_date"] for item in second.json()] == ["2099-01-03", "2099-01-02"]
+    assert client.get("/api/tournaments", params={"cursor": "!!"}, headers=headers).status_code == 400
@@ -0,0 +1,89 @@
+import asyncio
+from datetime import datetime, timezone
+
+import pytest
+from fastapi import HTTPException
+
+import server
+
+
+class FakeGridOut:
+    """Mimics Motor's GridOut: `seek` is synchronous, `read` is a coroutine"""
+    def __init__(self, data: bytes, chunk_size: int = 4):
+        self.data = data
+        self.chunk_size = chunk_size
+        self.position = 0
+
+    def seek(self, position: int) -> int:
+        self.position = position
+        return position
+
+    async def read(self, size: int = -1) -> bytes:
+        end = len(self.data) if size < 0 else self.position + size
+        chunk = self.data[self.position:end]
+        self.position += len(chunk)
+        return chunk
+
+
+def collect(grid_out, start, end):
+    async def run():
+        return [chunk async for chunk in server.stream_grid_out(grid_out, start, end)]
+    return asyncio.run(run())
+
+
+def test_stream_grid_out_yields_requested_range_in_chunks():
+    grid_out = FakeGridOut(b"0123456789abcdef")
+    chunks = collect(grid_out, 3, 12)
+    assert b"".join(chunks) == b"3456789abc"
+    assert all(len(chunk) <= grid_out.chunk_size for chunk in chunks)
+
+
+def test_stream_grid_out_whole_file():
+    assert b"".join(collect(FakeGridOut(b"hello world"), 0, 10)) == b"hello world"
+
+
+def test_stream_grid_out_stops_at_end_of_data():
+    assert b"".join(collect(FakeGridOut(b"short"), 2, 100)) == b"ort"
+
+
+@pytest.mark.parametrize("header, expected", [
+    ("bytes=0-9", (0, 9)),
+    ("bytes=10-", (10, 99)),
+    ("bytes=-20", (80, 99)),
+    ("bytes=-500", (0, 99)),
+    ("bytes=90-500", (90, 99)),
+    ("", None),
+    ("items=0-9", None),
+    ("bytes=0-9,20-29", None),
+    ("bytes=a-b", None),
+    ("bytes=-0", None),
+])
+def test_parse_range(header, expected):
+    assert server.parse_range(header, 100) == expected
+
+
+@pytest.mark.parametrize("header", ["bytes=100-", "bytes=50-10"])
+def test_parse_range_unsatisfiable(header):
+    with pytest.raises(HTTPException) as error:
+        server.parse_range(header, 100)
+    assert error.value.status_code == 416
+    assert error.value.headers["Content-Range"] == "bytes */100"
+
+
+@pytest.mark.parametrize("header, expected", [
+    ('"abc"', True),
+    ('"xyz", "abc"', True),
+    ('W/"abc"', True),
+    ("*", True),
+    ('"xyz"', False),
+])
+def test_etag_matches(header, expected):
+    assert server.etag_matches(header, '"abc"') is expected
+
+
+def test_not_modified_since():
+    last_modified = datetime(2024, 5, 1, 12, 0, 0, 500000, tzinfo=timezone.utc)
+    assert server.not_modified_since("Wed, 01 May 2024 12:00:00 GMT", last_modified)
+    assert server.not_modified_since("Thu, 02 May 2024 00:00:00 GMT", last_modified)
+    assert not server.not_modified_since("Wed, 01 May 2024 11:59:59 GMT", last_modified)
+    assert not server.not_modified_since("not a date", last_modified)
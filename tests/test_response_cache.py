@@ -0,0 +1,60 @@
+import uuid
+
+import server
+
+
+def test_unchanged_list_answers_304_to_its_etag(client, signup):
+    headers, _ = signup()
+    client.post("/api/book-reviews", json={"book_title": uuid.uuid4().hex}, headers=headers)
+    first = client.get("/api/book-reviews", headers=headers)
+    assert first.status_code == 200
+    etag = first.headers["ETag"]
+    assert first.headers["Cache-Control"] == "private, no-cache"
+
+    hits = server.response_cache.hits
+    again = client.get("/api/book-reviews", headers={**headers, "If-None-Match": etag})
+    assert again.status_code == 304
+    assert again.content == b""
+    assert again.headers["ETag"] == etag
+    assert server.response_cache.hits == hits + 1
+    assert client.get("/api/book-reviews", headers={**headers, "If-None-Match": f"W/{etag}"}).status_code == 304
+    assert client.get("/api/book-reviews", headers={**headers, "If-None-Match": '"other"'}).status_code == 200
+
+
+def test_a_write_bumps_the_version_and_rebuilds_the_list(client, signup):
+    headers, _ = signup()
+    first = client.get("/api/book-reviews", headers=headers)
+    version = server.response_cache.versions["book_reviews"]
+
+    title = uuid.uuid4().hex
+    client.post("/api/book-reviews", json={"book_title": title}, headers=headers)
+    assert server.response_cache.versions["book_reviews"] > version
+
+    misses = server.response_cache.misses
+    after = client.get("/api/book-reviews", headers={**headers, "If-None-Match": first.headers["ETag"]})
+    assert after.status_code == 200
+    assert after.headers["ETag"] != first.headers["ETag"]
+    assert title in [review["book_title"] for review in after.json()]
+    assert server.response_cache.misses == misses + 1
+
+
+def test_another_workers_change_event_invalidates_the_entry(client, signup):
+    headers, _ = signup()
+    client.get("/api/book-reviews", headers=headers)
+    misses = server.response_cache.misses
+    server.response_cache.handle_event({"type": "collection_changed", "collection": "book_reviews"})
+    client.get("/api/book-reviews", headers=headers)
+    assert server.response_cache.misses == misses + 1
+
+
+def test_cursor_header_is_cached_with_the_body(client, signup):
+    headers, _ = signup()
+    for _ in range(3):
+        client.post("/api/book-reviews", json={"book_title": uuid.uuid4().hex}, headers=headers)
+    first = client.get("/api/book-reviews", params={"limit": 1}, headers=headers)
+    hits = server.response_cache.hits
+    again = client.get("/api/book-reviews", params={"limit": 1}, headers=headers)
+    assert server.response_cache.hits == hits + 1
+    assert again.headers[server.NEXT_CURSOR_HEADER] == first.headers[server.NEXT_CURSOR_HEADER]
+    other = client.get("/api/book-reviews", params={"limit": 2}, headers=headers)
+    assert len(other.json()) == 2
@@ -0,0 +1,37 @@
+import server
+
+
+def test_fold_strips_latin_accents_and_case():
+    assert server.fold("Sélvi RĀMAN") == "selvi raman"
+    assert server.fold("Zoë  Ångström-Núñez") == "zoe angstrom nunez"
+
+
+def test_fold_turns_punctuation_into_spaces():
+    assert server.fold("Karthik (a+b), Jr.") == "karthik a b jr"
+    assert server.fold("  ") == ""
+    assert server.fold(None) == ""
+
+
+def test_fold_keeps_tamil_words_whole():
+    assert server.fold("ராமன் கிருஷ்ணன்") == "ராமன் கிருஷ்ணன்"
+    assert server.fold("கொடி பௌர்ணமி") == "கொடி பௌர்ணமி"
+
+
+def test_tamil_prefix_matches_only_its_words():
+    terms = server.search_entry("user", {"id": "u1", "name": "ராமன் கிருஷ்ணன்"})["terms"]
+    assert terms == ["ராமன்", "கிருஷ்ணன்"]
+    prefix = server.fold("ரா")
+    assert prefix == "ரா"
+    assert [term for term in terms if term.startswith(prefix)] == ["ராமன்"]
+    assert not "ரமேஷ்".startswith(prefix)
+
+
+def test_exact_term_hits_are_ranked_before_a_crowd_of_prefix_hits(client):
+    async def index_and_search():
+        for i in range(server.SEARCH_CANDIDATES + 50):
+            await server.index_for_search("member", {"id": f"kv{i}", "name": f"Kumaravel {i}"})
+        await server.index_for_search("member", {"id": "k", "name": "Kumar"})
+        return await server.search_entries("kumar", ["member"])
+    results = client.portal.call(index_and_search)
+    assert results[0] == {"kind": "member", "id": "k", "title": "Kumar", "subtitle": ""}
+    assert len(results) == 10